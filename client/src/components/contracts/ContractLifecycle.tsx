@@ -12,7 +12,7 @@ import {
 } from '@mui/icons-material';
 import { stepConnectorClasses } from '@mui/material/StepConnector';
 import api from '../../services/api';
-import { Contract, FinancialTransaction } from '../../types/contracts';
+import { Contract, FinancialTransaction, LedgerSummary } from '../../types/contracts';
 import SectionHeader from '../common/SectionHeader';
 
 // Custom Styles for Pipeline
@@ -62,9 +62,25 @@ const ContractLifecycle = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [ledger, setLedger] = useState<FinancialTransaction[]>([]);
+  const [ledgerSummary, setLedgerSummary] = useState<LedgerSummary | null>(null);
+  const [ledgerCursor, setLedgerCursor] = useState<string | null>(null);
 
   const steps = ['Contract Signed', 'Shipping / Transit', 'Clearance & Payment'];
 
+  // The ledger is paged oldest first; each page carries its running balances
+  const fetchLedgerPage = async (cursor: string | null) => {
+    const response = await api.get(`/contracts/${id}/ledger`, { params: cursor ? { cursor } : {} });
+    const rows: FinancialTransaction[] = response.data.ledger.map((tx: any) => ({
+      ...tx,
+      debit: tx.is_credit ? 0 : tx.amount,
+      credit: tx.is_credit ? tx.amount : 0,
+      balance: tx.running_balance,
+    }));
+    setLedger(prev => (cursor ? [...prev, ...rows] : rows));
+    setLedgerSummary(response.data.accounting_summary);
+    setLedgerCursor(response.data.next_cursor);
+  };
+
   useEffect(() => {
     const fetchContract = async () => {
       try {
@@ -76,11 +92,11 @@ const ContractLifecycle = () => {
         
         // Fetch Ledger Data
         try {
-          const ledgerResponse = await api.get(`/contracts/${id}/ledger`);
-          setLedger(ledgerResponse.data);
+          await fetchLedgerPage(null);
         } catch (ledgerErr) {
           console.warn('Failed to fetch ledger, continuing without it:', ledgerErr);
           setLedger([]);
+          setLedgerSummary(null);
         }
         
         setContract(contractData);
@@ -348,10 +364,10 @@ const ContractLifecycle = () => {
                       SUMMARY TOTALS ({contract.contract_currency})
                     </TableCell>
                     <TableCell align="right" sx={{ fontWeight: '800', color: 'error.main', fontSize: '0.9rem' }}>
-                      {ledger.reduce((sum, tx) => sum + (tx.debit || 0), 0).toLocaleString(undefined, { minimumFractionDigits: 2 })}
+                      {(ledgerSummary?.total_debit || 0).toLocaleString(undefined, { minimumFractionDigits: 2 })}
                     </TableCell>
                     <TableCell align="right" sx={{ fontWeight: '800', color: 'success.main', fontSize: '0.9rem' }}>
-                      {ledger.reduce((sum, tx) => sum + (tx.credit || 0), 0).toLocaleString(undefined, { minimumFractionDigits: 2 })}
+                      {(ledgerSummary?.total_credit || 0).toLocaleString(undefined, { minimumFractionDigits: 2 })}
                     </TableCell>
                     <TableCell align="right" sx={{ 
                       fontWeight: '900', 
@@ -359,11 +375,18 @@ const ContractLifecycle = () => {
                       color: theme.palette.primary.dark,
                       fontSize: '1rem'
                     }}>
-                      {ledger.length > 0 ? (ledger[ledger.length - 1].balance || 0).toLocaleString(undefined, { minimumFractionDigits: 2 }) : '—'}
+                      {ledgerSummary ? ledgerSummary.outstanding_balance.toLocaleString(undefined, { minimumFractionDigits: 2 }) : '—'}
                     </TableCell>
                   </TableRow>
                 </TableBody>
               </Table>
+              {ledgerCursor && (
+                <Box textAlign="center" mt={2}>
+                  <Button size="small" onClick={() => fetchLedgerPage(ledgerCursor)}>
+                    Load more transactions
+                  </Button>
+                </Box>
+              )}
             </Box>
           )}
         </Box>
@@ -1,4 +1,4 @@
-import React, { useState, useMemo, useEffect } from 'react';
+import React, { useState, useMemo, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
 import api, { validateContractAccess } from '../../services/api';
@@ -50,21 +50,27 @@ const ContractList = () => {
     pages: 0
   });
 
+  // Keyset cursors returned by the API, by the page number they lead to
+  const pageCursors = useRef<Record<number, string>>({});
+
   const fetchContracts = async (page: number = 1) => {
     try {
       setLoading(true);
       setError(null);
+      const cursor = page > 1 ? pageCursors.current[page] : undefined;
       const skip = (page - 1) * pagination.per_page;
-      const response = await api.get(`/contracts/?skip=${skip}&limit=${pagination.per_page}`);
+      const response = await api.get(cursor
+        ? `/contracts/?view=summary&cursor=${encodeURIComponent(cursor)}&limit=${pagination.per_page}`
+        : `/contracts/?view=summary&skip=${skip}&limit=${pagination.per_page}`);
       
       const contractsData = response.data.contracts.map((contract: any) => ({
         id: contract.id,
         no: contract.contract_no || 'N/A',
         type: contract.direction === 'import' ? 'Import' : 'Export',
-        client: 'Pending Assignment',
-        commodity: contract.items?.[0]?.article_name || 'Multiple Items',
-        qty: contract.items?.[0]?.qty_ton || 0,
-        value: 0,
+        client: (contract.direction === 'import' ? contract.seller_name : contract.buyer_name) || 'Pending Assignment',
+        commodity: contract.article_name || 'Multiple Items',
+        qty: contract.total_qty || 0,
+        value: contract.total_value || 0,
         status: contract.status === 'draft' ? 'Draft' :
                 contract.status === 'posted' || contract.status === 'confirmed' ? 'Active' :
                 contract.status === 'completed' || contract.status === 'executed' ? 'Completed' : 'Pending',
@@ -74,6 +80,9 @@ const ContractList = () => {
       
       setContracts(contractsData);
       setPagination(response.data.pagination);
+      if (response.data.pagination.next_cursor) {
+        pageCursors.current[page + 1] = response.data.pagination.next_cursor;
+      }
     } catch (error: any) {
       console.error('Failed to fetch contracts:', error);
       if (error.response?.status === 401) {
@@ -52,14 +52,14 @@ const DeliveryNoteForm = () => {
         const [wh, art, con] = await Promise.all([
           inventoryApi.getWarehouses(),
           api.get('/articles/'),
-          api.get('/contracts/')
+          api.get('/contracts/?view=summary&limit=100')
         ]);
         
         setLists(prev => ({
           ...prev,
           warehouses: wh.data || [],
           articles: art.data || [],
-          contracts: con.data || []
+          contracts: con.data?.contracts || []
         }));
       } catch (error) {
         console.error("Failed to load master data", error);
@@ -120,7 +120,8 @@ export const NotificationProvider: React.FC<{ children: React.ReactNode }> = ({
 
       const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
       const host = window.location.host;
-      const wsUrl = `${protocol}//${host}/ws`;
+      // Browsers can't set headers on WebSocket, so the token goes in the query string
+      const wsUrl = `${protocol}//${host}/ws?token=${encodeURIComponent(token)}`;
       
       try {
         socket = new WebSocket(wsUrl);
@@ -157,7 +158,8 @@ export const NotificationProvider: React.FC<{ children: React.ReactNode }> = ({
         };
 
         socket.onclose = (event) => {
-          if (event.code !== 1000 && user?.id && localStorage.getItem('access_token')) { 
+          // 4401: token rejected by the server, wait for a new login instead of retrying
+          if (event.code !== 1000 && event.code !== 4401 && user?.id && localStorage.getItem('access_token')) { 
             reconnectTimeout = setTimeout(connectWebSocket, 5000);
           }
         };
@@ -124,6 +124,8 @@ const resources = {
       "IP Address": "IP Address",
       "Port": "Port",
       "Location": "Location",
+      "Punch Direction": "Punch Direction",
+      "Not set": "Not set",
       "Last Sync": "Last Sync",
       "Never": "Never",
       "Syncing...": "Syncing...",
@@ -429,6 +431,8 @@ const resources = {
       "IP Address": "عنوان IP",
       "Port": "المنفذ",
       "Location": "الموقع",
+      "Punch Direction": "اتجاه البصمة",
+      "Not set": "غير محدد",
       "Last Sync": "آخر مزامنة",
       "Never": "أبدًا",
       "Syncing...": "جاري المزامنة...",
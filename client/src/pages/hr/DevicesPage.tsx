@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import {
     Box, Typography, Grid, Paper, Button, TextField, Dialog, DialogTitle,
-    DialogContent, DialogActions, Chip, IconButton, Card, CardContent, Divider, Alert, LinearProgress
+    DialogContent, DialogActions, Chip, IconButton, Card, CardContent, Divider, Alert, LinearProgress, MenuItem
 } from '@mui/material';
 import { Add, Sync, Dns, Circle, Delete, Edit, CheckBox, CheckBoxOutlineBlank } from '@mui/icons-material';
 import api from '../../services/api';
@@ -14,7 +14,7 @@ const DevicesPage: React.FC = () => {
     const [openAdd, setOpenAdd] = useState(false);
     const [openEdit, setOpenEdit] = useState(false);
     const [editingDevice, setEditingDevice] = useState<any>(null);
-    const [newDevice, setNewDevice] = useState({ name: '', ip_address: '192.168.1.201', port: 4370, location: '' });
+    const [newDevice, setNewDevice] = useState({ name: '', ip_address: '192.168.1.201', port: 4370, location: '', direction: '' });
     const [syncing, setSyncing] = useState<number | null>(null);
     const [multiSyncing, setMultiSyncing] = useState(false);
     const [feedback, setFeedback] = useState<{ type: 'success' | 'error' | 'info' | 'warning', msg: string } | null>(null);
@@ -75,7 +75,7 @@ const DevicesPage: React.FC = () => {
         try {
             await api.post('/hr/devices', newDevice);
             setOpenAdd(false);
-            setNewDevice({ name: '', ip_address: '192.168.1.201', port: 4370, location: '' });
+            setNewDevice({ name: '', ip_address: '192.168.1.201', port: 4370, location: '', direction: '' });
             fetchDevices();
             setFeedback({ type: 'success', msg: 'Device added successfully' });
         } catch (error) {
@@ -112,15 +112,28 @@ const DevicesPage: React.FC = () => {
         }
     };
 
+    // Syncs run in the background on the server; poll their job rows until all have finished
+    const waitForJobs = async (jobIds: number[]) => {
+        while (true) {
+            const res = await api.get('/hr/sync-jobs', { params: { job_id: jobIds }, paramsSerializer: { indexes: null } });
+            const jobs = res.data.jobs || [];
+            if (jobs.every((j: any) => j.status !== 'queued' && j.status !== 'running')) {
+                return jobs;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    };
+
     const handleSync = async (id: number) => {
         setSyncing(id);
         setFeedback(null);
         try {
             const res = await api.post(`/hr/devices/${id}/sync`);
-            if (res.data.status === 'success' || res.data.status === 'warning') {
-                setFeedback({ type: 'success', msg: res.data.message });
+            const [job] = await waitForJobs([res.data.job_id]);
+            if (job && (job.status === 'success' || job.status === 'warning')) {
+                setFeedback({ type: 'success', msg: job.message });
             } else {
-                setFeedback({ type: 'error', msg: res.data.message });
+                setFeedback({ type: 'error', msg: job ? job.message : 'Sync failed' });
             }
             fetchDevices();
         } catch (error) {
@@ -143,10 +156,10 @@ const DevicesPage: React.FC = () => {
         
         try {
             const res = await api.post('/hr/devices/sync-multiple', { device_ids: deviceIds });
-            if (res.data.status === 'success') {
-                const total = res.data.total_new_logs;
-                const details = res.data.details || [];
-                const failedDetails = details.filter((d: any) => d.status === 'error');
+            if (res.data.status === 'queued') {
+                const details = await waitForJobs((res.data.jobs || []).map((j: any) => j.job_id));
+                const total = details.reduce((sum: number, d: any) => sum + (d.logs_count || 0), 0);
+                const failedDetails = details.filter((d: any) => d.status === 'error' || d.status === 'timeout');
                 const failed = failedDetails.length;
                 const succeeded = details.filter((d: any) => d.status === 'success' || d.status === 'warning').length;
 
@@ -341,6 +354,11 @@ const DevicesPage: React.FC = () => {
                         <TextField label="IP Address" fullWidth value={newDevice.ip_address} onChange={(e) => setNewDevice({ ...newDevice, ip_address: e.target.value })} />
                         <TextField label="Port" type="number" fullWidth value={newDevice.port} onChange={(e) => setNewDevice({ ...newDevice, port: Number(e.target.value) })} />
                         <TextField label="Location" fullWidth value={newDevice.location} onChange={(e) => setNewDevice({ ...newDevice, location: e.target.value })} />
+                        <TextField select label={t('Punch Direction')} fullWidth value={newDevice.direction} onChange={(e) => setNewDevice({ ...newDevice, direction: e.target.value })}>
+                            <MenuItem value="">{t('Not set')}</MenuItem>
+                            <MenuItem value="check_in">{t('Check In')}</MenuItem>
+                            <MenuItem value="check_out">{t('Check Out')}</MenuItem>
+                        </TextField>
                     </Box>
                 </DialogContent>
                 <DialogActions>
@@ -358,6 +376,11 @@ const DevicesPage: React.FC = () => {
                         <TextField label="IP Address" fullWidth value={editingDevice?.ip_address || ''} onChange={(e) => setEditingDevice({ ...editingDevice, ip_address: e.target.value })} />
                         <TextField label="Port" type="number" fullWidth value={editingDevice?.port || 4370} onChange={(e) => setEditingDevice({ ...editingDevice, port: Number(e.target.value) })} />
                         <TextField label="Location" fullWidth value={editingDevice?.location || ''} onChange={(e) => setEditingDevice({ ...editingDevice, location: e.target.value })} />
+                        <TextField select label={t('Punch Direction')} fullWidth value={editingDevice?.direction || ''} onChange={(e) => setEditingDevice({ ...editingDevice, direction: e.target.value || null })}>
+                            <MenuItem value="">{t('Not set')}</MenuItem>
+                            <MenuItem value="check_in">{t('Check In')}</MenuItem>
+                            <MenuItem value="check_out">{t('Check Out')}</MenuItem>
+                        </TextField>
                     </Box>
                 </DialogContent>
                 <DialogActions>
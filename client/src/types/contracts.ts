@@ -62,6 +62,12 @@ export interface FinancialTransaction {
   linked_transaction_id?: string;
 }
 
+export interface LedgerSummary {
+  total_debit: number;
+  total_credit: number;
+  outstanding_balance: number;
+}
+
 export interface ContractSummary {
   id: string;
   no: string;
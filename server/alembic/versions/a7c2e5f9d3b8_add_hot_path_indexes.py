@@ -0,0 +1,73 @@
+"""add composite indexes for ledger, inventory, notification and contract lookups
+
+Revision ID: a7c2e5f9d3b8
+Revises: f1a6d3e8b5c7
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c2e5f9d3b8'
+down_revision: Union[str, Sequence[str], None] = 'f1a6d3e8b5c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _merge_duplicate_inventory() -> None:
+    """Fold duplicate (warehouse_id, article_id) stock rows into one so the unique constraint can be added"""
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT i.id, i.warehouse_id, i.article_id, i.quantity_on_hand, i.reserved_quantity, i.min_stock, i.max_stock "
+        "FROM inventory i JOIN ("
+        "  SELECT warehouse_id, article_id FROM inventory GROUP BY warehouse_id, article_id HAVING COUNT(*) > 1"
+        ") d ON d.warehouse_id = i.warehouse_id AND d.article_id = i.article_id"
+    )).fetchall()
+
+    groups = {}
+    for row in rows:
+        groups.setdefault((row.warehouse_id, row.article_id), []).append(row)
+
+    for duplicates in groups.values():
+        keep, *extra = duplicates
+        conn.execute(sa.text(
+            "UPDATE inventory SET quantity_on_hand = :on_hand, reserved_quantity = :reserved, "
+            "min_stock = :min_stock, max_stock = :max_stock WHERE id = :id"
+        ), {
+            "id": keep.id,
+            "on_hand": sum(float(r.quantity_on_hand or 0) for r in duplicates),
+            "reserved": sum(float(r.reserved_quantity or 0) for r in duplicates),
+            "min_stock": max(float(r.min_stock or 0) for r in duplicates),
+            "max_stock": max(float(r.max_stock or 0) for r in duplicates),
+        })
+        conn.execute(sa.text("DELETE FROM inventory WHERE id = :id"), [{"id": r.id} for r in extra])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_financial_transactions_contract_type', 'financial_transactions', ['contract_id', 'type'], unique=False)
+    op.create_index('ix_financial_transactions_contract_date', 'financial_transactions', ['contract_id', 'transaction_date', 'created_at'], unique=False)
+    op.create_index('ix_stock_movements_article_warehouse_date', 'stock_movements', ['article_id', 'warehouse_id', 'date'], unique=False)
+    op.create_index('ix_notifications_user_read_created', 'notifications', ['user_id', 'is_read', 'created_at'], unique=False)
+    op.create_index('ix_contract_views_contract_viewed_at', 'contract_views', ['contract_id', 'viewed_at'], unique=False)
+    op.create_index('ix_contracts_modified_date', 'contracts', ['modified_date', 'id'], unique=False)
+
+    _merge_duplicate_inventory()
+    with op.batch_alter_table('inventory') as batch_op:
+        batch_op.create_unique_constraint('uq_inventory_warehouse_article', ['warehouse_id', 'article_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('inventory') as batch_op:
+        batch_op.drop_constraint('uq_inventory_warehouse_article', type_='unique')
+    op.drop_index('ix_contracts_modified_date', table_name='contracts')
+    op.drop_index('ix_contract_views_contract_viewed_at', table_name='contract_views')
+    op.drop_index('ix_notifications_user_read_created', table_name='notifications')
+    op.drop_index('ix_stock_movements_article_warehouse_date', table_name='stock_movements')
+    op.drop_index('ix_financial_transactions_contract_date', table_name='financial_transactions')
+    op.drop_index('ix_financial_transactions_contract_type', table_name='financial_transactions')
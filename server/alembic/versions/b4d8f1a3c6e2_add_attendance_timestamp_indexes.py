@@ -0,0 +1,31 @@
+"""add (employee, timestamp) indexes on attendance_logs
+
+Revision ID: b4d8f1a3c6e2
+Revises: a7c2e5f9d3b8
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d8f1a3c6e2'
+down_revision: Union[str, Sequence[str], None] = 'a7c2e5f9d3b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_attendance_logs_employee_timestamp', 'attendance_logs', ['employee_id', 'timestamp'], unique=False)
+    # employee_pk is stored in the user_id column
+    op.create_index('ix_attendance_logs_employee_pk_timestamp', 'attendance_logs', ['user_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_attendance_logs_employee_pk_timestamp', table_name='attendance_logs')
+    op.drop_index('ix_attendance_logs_employee_timestamp', table_name='attendance_logs')
@@ -0,0 +1,35 @@
+"""add entity_counters for cached contract totals
+
+Revision ID: c5d1e8f2a7b3
+Revises: 4e13f59ffced
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d1e8f2a7b3'
+down_revision: Union[str, Sequence[str], None] = '4e13f59ffced'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('entity_counters',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO entity_counters (name, value) SELECT 'contracts', COUNT(*) FROM contracts")
+    # Keyset pagination compares (modified_date, id); it can't page over NULLs
+    op.execute("UPDATE contracts SET modified_date = COALESCE(posted_date, CURRENT_TIMESTAMP) WHERE modified_date IS NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('entity_counters')
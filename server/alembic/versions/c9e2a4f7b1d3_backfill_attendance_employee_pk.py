@@ -0,0 +1,36 @@
+"""link existing attendance logs to employees by code
+
+Revision ID: c9e2a4f7b1d3
+Revises: b4d8f1a3c6e2
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e2a4f7b1d3'
+down_revision: Union[str, Sequence[str], None] = 'b4d8f1a3c6e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Attendance is now joined to employees on the PK alone (stored in user_id);
+    # logs that were only matched through their device code get it filled in
+    op.execute("""
+        UPDATE attendance_logs
+        SET user_id = (SELECT employees.id FROM employees WHERE employees.code = attendance_logs.employee_id)
+        WHERE user_id IS NULL
+          AND employee_id IN (SELECT code FROM employees)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Nothing to undo: the links are still correct for the OR-join
+    pass
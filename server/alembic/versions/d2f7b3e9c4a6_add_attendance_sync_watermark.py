@@ -0,0 +1,45 @@
+"""add per-device sync high-water mark and unique attendance punches
+
+Revision ID: d2f7b3e9c4a6
+Revises: c9e2a4f7b1d3
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2f7b3e9c4a6'
+down_revision: Union[str, Sequence[str], None] = 'c9e2a4f7b1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('zk_devices', sa.Column('last_synced_timestamp', sa.DateTime(), nullable=True))
+    # Carry on from the newest punch already stored for each device
+    op.execute(
+        "UPDATE zk_devices SET last_synced_timestamp = "
+        "(SELECT MAX(timestamp) FROM attendance_logs WHERE attendance_logs.device_id = zk_devices.id)"
+    )
+
+    # Keep the first copy of punches stored more than once so the constraint can be added
+    op.execute(
+        "DELETE FROM attendance_logs WHERE employee_id IS NOT NULL AND device_id IS NOT NULL AND id NOT IN ("
+        "  SELECT MIN(id) FROM attendance_logs WHERE employee_id IS NOT NULL AND device_id IS NOT NULL"
+        "  GROUP BY employee_id, timestamp, device_id"
+        ")"
+    )
+    with op.batch_alter_table('attendance_logs') as batch_op:
+        batch_op.create_unique_constraint('uq_attendance_logs_employee_timestamp_device', ['employee_id', 'timestamp', 'device_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('attendance_logs') as batch_op:
+        batch_op.drop_constraint('uq_attendance_logs_employee_timestamp_device', type_='unique')
+    op.drop_column('zk_devices', 'last_synced_timestamp')
@@ -0,0 +1,34 @@
+"""add document_sequences for contract, delivery note and payment numbers
+
+Revision ID: d8a4f6b1c2e9
+Revises: c5d1e8f2a7b3
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a4f6b1c2e9'
+down_revision: Union[str, Sequence[str], None] = 'c5d1e8f2a7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows are seeded lazily from existing document numbers on first use
+    op.create_table('document_sequences',
+    sa.Column('scope', sa.String(length=50), nullable=False),
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('next_value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'period')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('document_sequences')
@@ -0,0 +1,49 @@
+"""add contract_balances maintained from the financial ledger
+
+Revision ID: e3b7c9d2f4a1
+Revises: d8a4f6b1c2e9
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b7c9d2f4a1'
+down_revision: Union[str, Sequence[str], None] = 'd8a4f6b1c2e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('contract_balances',
+    sa.Column('contract_id', sa.UUID(), nullable=False),
+    sa.Column('total_debit', sa.DECIMAL(precision=15, scale=2), nullable=False),
+    sa.Column('total_credit', sa.DECIMAL(precision=15, scale=2), nullable=False),
+    sa.Column('booked_value', sa.DECIMAL(precision=15, scale=2), nullable=False),
+    sa.Column('last_txn_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['contract_id'], ['contracts.id'], ),
+    sa.PrimaryKeyConstraint('contract_id')
+    )
+    op.execute("""
+        INSERT INTO contract_balances (contract_id, total_debit, total_credit, booked_value, last_txn_at)
+        SELECT contract_id,
+               COALESCE(SUM(CASE WHEN is_credit THEN 0 ELSE amount END), 0),
+               COALESCE(SUM(CASE WHEN is_credit THEN amount ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN type IN ('Invoice', 'Pricing Adjustment')
+                                 THEN CASE WHEN is_credit THEN -amount ELSE amount END
+                                 ELSE 0 END), 0),
+               MAX(created_at)
+        FROM financial_transactions
+        WHERE contract_id IS NOT NULL
+        GROUP BY contract_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('contract_balances')
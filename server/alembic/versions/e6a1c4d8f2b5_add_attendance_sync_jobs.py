@@ -0,0 +1,46 @@
+"""add attendance_sync_jobs
+
+Revision ID: e6a1c4d8f2b5
+Revises: d2f7b3e9c4a6
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a1c4d8f2b5'
+down_revision: Union[str, Sequence[str], None] = 'd2f7b3e9c4a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('attendance_sync_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('trigger', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('duration_ms', sa.Float(), nullable=True),
+    sa.Column('logs_count', sa.Integer(), nullable=True),
+    sa.Column('message', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['device_id'], ['zk_devices.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_attendance_sync_jobs_id', 'attendance_sync_jobs', ['id'], unique=False)
+    op.create_index('ix_attendance_sync_jobs_started_at', 'attendance_sync_jobs', ['started_at'], unique=False)
+    op.create_index('ix_attendance_sync_jobs_device_started', 'attendance_sync_jobs', ['device_id', 'started_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_attendance_sync_jobs_device_started', table_name='attendance_sync_jobs')
+    op.drop_index('ix_attendance_sync_jobs_started_at', table_name='attendance_sync_jobs')
+    op.drop_index('ix_attendance_sync_jobs_id', table_name='attendance_sync_jobs')
+    op.drop_table('attendance_sync_jobs')
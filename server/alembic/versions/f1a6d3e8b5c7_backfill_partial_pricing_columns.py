@@ -0,0 +1,72 @@
+"""backfill item_id, qty_priced and unit_price on legacy partial pricing rows
+
+Revision ID: f1a6d3e8b5c7
+Revises: e3b7c9d2f4a1
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a6d3e8b5c7'
+down_revision: Union[str, Sequence[str], None] = 'e3b7c9d2f4a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Description written by partial pricing before the structured columns existed:
+# "Partial pricing: 5.0 MT @ $310.0/MT (Item: Wheat)"
+DESCRIPTION = re.compile(r"Partial pricing:\s*([\d.]+)\s*MT\s*@\s*\$?([\d.]+)\s*/MT")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT id, contract_id, item_id, qty_priced, unit_price, description "
+        "FROM financial_transactions "
+        "WHERE type = 'Partial Pricing' AND (item_id IS NULL OR qty_priced IS NULL OR unit_price IS NULL)"
+    )).fetchall()
+    if not rows:
+        return
+
+    # Items of the affected contracts with their article names
+    items = {}
+    for item_id, contract_id, article_name in conn.execute(sa.text(
+        "SELECT ci.id, ci.contract_id, a.article_name FROM contract_items ci "
+        "LEFT JOIN articles a ON a.id = ci.article_id "
+        "WHERE ci.contract_id IN (SELECT contract_id FROM financial_transactions "
+        "WHERE type = 'Partial Pricing' AND item_id IS NULL)"
+    )):
+        items.setdefault(contract_id, []).append((item_id, article_name))
+
+    updates = []
+    for txn_id, contract_id, item_id, qty_priced, unit_price, description in rows:
+        description = description or ""
+        if item_id is None:
+            # Only link when the article name points at exactly one item of the contract
+            matches = [iid for iid, name in items.get(contract_id, []) if name and f"(Item: {name})" in description]
+            if len(matches) == 1:
+                item_id = matches[0]
+        parsed = DESCRIPTION.search(description)
+        if parsed:
+            if qty_priced is None:
+                qty_priced = float(parsed.group(1))
+            if unit_price is None:
+                unit_price = float(parsed.group(2))
+        updates.append({"id": txn_id, "item_id": item_id, "qty_priced": qty_priced, "unit_price": unit_price})
+
+    conn.execute(sa.text(
+        "UPDATE financial_transactions SET item_id = :item_id, qty_priced = :qty_priced, unit_price = :unit_price "
+        "WHERE id = :id"
+    ), updates)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Data-only migration: the parsed values are equivalent to the descriptions they came from
+    pass
@@ -0,0 +1,31 @@
+"""add zk_devices.direction
+
+Revision ID: f4b8d2a6e1c9
+Revises: e6a1c4d8f2b5
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b8d2a6e1c9'
+down_revision: Union[str, Sequence[str], None] = 'e6a1c4d8f2b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('zk_devices', sa.Column('direction', sa.String(), nullable=True))
+    # The two terminals whose direction used to be hardcoded by IP
+    op.execute("UPDATE zk_devices SET direction = 'check_in' WHERE ip_address = '10.0.0.234'")
+    op.execute("UPDATE zk_devices SET direction = 'check_out' WHERE ip_address = '10.0.0.235'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('zk_devices', 'direction')
@@ -7,6 +7,8 @@ from crud import rbac_crud
 from datetime import datetime, timedelta
 from typing import Optional
 import os
+import uuid
+import hashlib
 import jwt
 import bcrypt
 
@@ -62,7 +64,22 @@ def authenticate_user(db: Session, email: str, password: str):
         print(f"DEBUG: Exception in authenticate_user: {e}", flush=True)
         return None
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+def permission_version(permissions, role: Optional[str] = None, is_active: bool = False) -> str:
+    """
+    Short fingerprint of a user's role, active flag and permission set,
+    embedded in access tokens as `pv`
+    """
+    parts = [str(role), "1" if is_active else "0", *sorted(permissions)]
+    digest = hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+    return digest[:12]
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, user: Optional[User] = None, permissions=None):
+    """
+    Create a signed JWT.
+    When `user` is given the token also carries compact claims (role, active
+    flag and permission-set version) so requests can be authorized without
+    loading the user row.
+    """
     try:
         to_encode = data.copy()
         if expires_delta:
@@ -71,29 +88,84 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
             expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         
         to_encode.update({"exp": expire})
+        if user is not None:
+            to_encode.update({
+                "sub": str(user.id),
+                "role": user.role,
+                "act": bool(user.is_active),
+                "pv": permission_version(permissions or (), user.role, bool(user.is_active)),
+            })
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
     except Exception as e:
         raise HTTPException(status_code=500, detail="Token creation failed")
 
-def get_user_from_raw_token(token: str, db: Session) -> User:
-    """Helper to get user from a raw JWT token string"""
+class Principal:
+    """
+    Authenticated caller resolved from an access token.
+    id, role and is_active come from the signed claims; the ORM User row is
+    loaded lazily the first time any other attribute is accessed.
+    """
+
+    def __init__(self, id: uuid.UUID, role: str, is_active: bool, permission_version: Optional[str] = None,
+                 db: Optional[Session] = None, user: Optional[User] = None):
+        self.id = id
+        self.role = role
+        self.is_active = is_active
+        self.permission_version = permission_version
+        self._db = db
+        self._user = user
+
+    @classmethod
+    def from_user(cls, user: User, db: Optional[Session] = None) -> "Principal":
+        return cls(user.id, user.role, user.is_active, db=db, user=user)
+
+    @property
+    def user(self) -> User:
+        """The ORM row for this principal, loaded on first use"""
+        if self._user is None:
+            user = self._db.query(User).filter(User.id == self.id).first()
+            if not user:
+                raise HTTPException(status_code=401, detail="User not found")
+            self._user = user
+        return self._user
+
+    def refresh(self):
+        """Reload role and active flag from the database, discarding the claims"""
+        self._user = None
+        user = self.user
+        self.role = user.role
+        self.is_active = user.is_active
+        self.permission_version = None
+
+    def __getattr__(self, name):
+        # Only reached for attributes not held by the principal itself
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+def _principal_from_token(token: str, db: Session) -> Principal:
+    """Decode a JWT into a Principal, querying the user row only for legacy tokens"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id_str: str = payload.get("sub")
         if user_id_str is None:
             raise HTTPException(status_code=401, detail="Invalid token credentials")
         
-        import uuid
+        # Security: Validate UUID format
         try:
              user_uuid = uuid.UUID(user_id_str)
         except ValueError:
              raise HTTPException(status_code=401, detail="Invalid token subject")
 
+        if "role" in payload and "act" in payload:
+            return Principal(user_uuid, payload["role"], payload["act"], payload.get("pv"), db=db)
+
+        # Tokens issued without claims need the user row
         user = db.query(User).filter(User.id == user_uuid).first()
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
-        return user
+        return Principal.from_user(user, db)
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
     except HTTPException:
@@ -101,32 +173,13 @@ def get_user_from_raw_token(token: str, db: Session) -> User:
     except Exception:
         raise HTTPException(status_code=401, detail="Authentication failed")
 
-def _get_user_from_token(credentials: HTTPAuthorizationCredentials, db: Session) -> User:
-    """Internal helper to get user from JWT token - reduces code duplication"""
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id_str: str = payload.get("sub")
-        if user_id_str is None:
-            raise HTTPException(status_code=401, detail="Invalid token credentials")
-        
-        # Security: Validate UUID format
-        import uuid
-        try:
-             user_uuid = uuid.UUID(user_id_str)
-        except ValueError:
-             raise HTTPException(status_code=401, detail="Invalid token subject")
+def get_user_from_raw_token(token: str, db: Session) -> Principal:
+    """Helper to get user from a raw JWT token string"""
+    return _principal_from_token(token, db)
 
-        user = db.query(User).filter(User.id == user_uuid).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Authentication failed")
+def _get_user_from_token(credentials: HTTPAuthorizationCredentials, db: Session) -> Principal:
+    """Internal helper to get user from JWT token - reduces code duplication"""
+    return _principal_from_token(credentials.credentials, db)
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     """Get current user object from token"""
@@ -144,22 +197,33 @@ def require_permission(permission_name: str):
     Dependency to check if the current user has the required permission.
     """
     def check_permission(
-        current_user: User = Depends(get_current_user_obj),
+        current_user: Principal = Depends(get_current_user_obj),
         db: Session = Depends(get_db)
     ):
-        logger.error(f"AUTH_DEBUG: check_permission for user: {current_user.email}, role: {current_user.role}, required: {permission_name}")
+        logger.debug(f"AUTH_DEBUG: check_permission for user: {current_user.id}, role: {current_user.role}, required: {permission_name}")
+
+        permissions = None
+        if current_user.permission_version is not None:
+            state = rbac_crud.get_user_auth_state(db, current_user.id)
+            permissions = state.permissions
+            if permission_version(permissions, state.role, state.is_active) != current_user.permission_version:
+                # Token predates a change to the user or their RBAC roles - don't trust its role/active claims
+                logger.debug(f"AUTH_DEBUG: Stale claims for user {current_user.id}, reloading")
+                current_user.refresh()
         
         if not current_user.is_active:
-             logger.error(f"AUTH_DEBUG: User {current_user.email} is inactive")
+             logger.debug(f"AUTH_DEBUG: User {current_user.id} is inactive")
              raise HTTPException(status_code=400, detail="Inactive user")
 
         if current_user.role == "admin": 
-            logger.error(f"AUTH_DEBUG: User {current_user.email} is admin, bypassing check")
+            logger.debug(f"AUTH_DEBUG: User {current_user.id} is admin, bypassing check")
             return current_user 
 
         # Check permission via RBAC Logic
-        has_perm, msg = rbac_crud.check_user_permission(db, current_user.id, permission_name)
-        logger.error(f"AUTH_DEBUG: RBAC check for {current_user.email}: {has_perm} - {msg}")
+        if permissions is None:
+            permissions = rbac_crud.get_user_permission_set(db, current_user.id)
+        has_perm = permission_name in permissions
+        logger.debug(f"AUTH_DEBUG: RBAC check for {current_user.id}: {has_perm}")
         
         if not has_perm:
             raise HTTPException(
@@ -168,4 +232,4 @@ def require_permission(permission_name: str):
             )
         return current_user
 
-    return check_permission
\ No newline at end of file
+    return check_permission
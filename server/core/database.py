@@ -1,6 +1,16 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+import threading
+import logging
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 try:
@@ -21,14 +31,208 @@ if not DATABASE_URL:
 if "password=" in DATABASE_URL.lower() and "DATABASE_URL" not in os.environ:
     raise ValueError("DATABASE_URL contains hardcoded credentials")
 
-engine = create_engine(DATABASE_URL)
+# Async drivers for the same database, used by the AsyncSession routers
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching async driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return parsed.set(drivername=_ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# --- Pool / dialect tuning (overridable through environment variables) ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Negative values are KiB, as understood by PRAGMA cache_size
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+
+# Checkouts slower than this are logged as a warning
+DB_SLOW_CHECKOUT_MS = float(os.getenv("DB_SLOW_CHECKOUT_MS", "200"))
+
+
+class PoolMetrics:
+    """Accumulates how long callers wait to check a connection out of the pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.slow_checkouts = 0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            if seconds > self.max_wait:
+                self.max_wait = seconds
+            if seconds * 1000 >= DB_SLOW_CHECKOUT_MS:
+                self.slow_checkouts += 1
+                logger.warning(f"Slow DB pool checkout: {seconds * 1000:.1f} ms")
+
+    def snapshot(self, engine=None) -> dict:
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "slow_checkouts": self.slow_checkouts,
+            }
+        if engine is not None and isinstance(engine.pool, QueuePool):
+            data.update({
+                "pool_size": engine.pool.size(),
+                "checked_out": engine.pool.checkedout(),
+                "overflow": engine.pool.overflow(),
+            })
+        return data
+
+
+pool_metrics = PoolMetrics()
+
+
+class _CheckoutTimingMixin:
+    """Reports checkout wait time to pool_metrics"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+class TimedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    finally:
+        cursor.close()
+
+
+def _engine_options(url: str, pool_class) -> dict:
+    backend = make_url(url).get_backend_name()
+    options = {}
+
+    if backend == "sqlite":
+        database = make_url(url).database
+        in_memory = not database or database == ":memory:" or "mode=memory" in url
+        options["connect_args"] = {"check_same_thread": False}
+        if not in_memory:
+            options.update(
+                poolclass=pool_class,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+            )
+    else:
+        options.update(
+            poolclass=pool_class,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+    return options
+
+
+def create_db_engine(url: str = DATABASE_URL, **overrides):
+    """
+    Build the SQLAlchemy engine for the given URL.
+    SQLite gets WAL journaling and connection pragmas; server databases get a
+    sized, pre-pinged, recycled connection pool. Keyword arguments override
+    the computed create_engine() options.
+    """
+    options = _engine_options(url, TimedQueuePool)
+    options.update(overrides)
+    db_engine = create_engine(url, **options)
+
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine, "connect", _apply_sqlite_pragmas)
+
+    return db_engine
+
+
+def create_async_db_engine(url: str = ASYNC_DATABASE_URL, **overrides):
+    """Async counterpart of create_db_engine() with the same pool and pragma settings"""
+    options = _engine_options(url, TimedAsyncQueuePool)
+    options.update(overrides)
+    db_engine = create_async_engine(url, **options)
+
+    if db_engine.dialect.name == "sqlite":
+        event.listen(db_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+    return db_engine
+
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Objects stay readable after commit: lazy refreshes are not possible outside run_sync()
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_INSERT_IGNORE = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+def insert_ignore(bind, table):
+    """
+    INSERT ... ON CONFLICT DO NOTHING into `table` (a Table or mapped class)
+    for the dialect of `bind` (Session, Connection or Engine), so rows that
+    would violate a unique constraint are skipped. None when the dialect has
+    no such clause; callers then fall back to a plain insert.
+    """
+    dialect = bind.get_bind().dialect if isinstance(bind, Session) else bind.dialect
+    dialect_insert = _INSERT_IGNORE.get(dialect.name)
+    return dialect_insert(table).on_conflict_do_nothing() if dialect_insert else None
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Run sync ORM code `fn(session, *args, **kwargs)` against either session type.
+    With an AsyncSession the work runs through run_sync() so it never blocks
+    the event loop; a plain Session is called directly.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return fn(db, *args, **kwargs)
@@ -0,0 +1,23 @@
+import json
+import base64
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def encode_cursor(payload: dict) -> str:
+    """Opaque keyset cursor: compact JSON, URL-safe base64 without padding"""
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, parse: Callable[[dict], T]) -> T:
+    """
+    Inverse of encode_cursor(); `parse` turns the payload into the caller's
+    values. Raises ValueError for anything malformed, including payloads
+    `parse` rejects.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return parse(json.loads(base64.urlsafe_b64decode(padded.encode())))
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
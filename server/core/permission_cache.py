@@ -0,0 +1,78 @@
+import os
+import time
+import threading
+import logging
+from typing import Callable, Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# مدة صلاحية الكاش بالثواني
+PERMISSION_CACHE_TTL = float(os.getenv("PERMISSION_CACHE_TTL", "60"))
+
+
+class UserAuthState(NamedTuple):
+    """What authorization needs to know about a user"""
+    role: Optional[str]
+    is_active: bool
+    permissions: FrozenSet[str]
+
+
+class PermissionCache:
+    """
+    In-process cache of each user's role, active flag and permission names.
+    Entries expire after `ttl` seconds and are dropped explicitly whenever
+    role/permission assignments change or a user's role or active flag is
+    updated (see crud.rbac_crud).
+    """
+
+    def __init__(self, ttl: float = PERMISSION_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, UserAuthState]] = {}
+        # Bumped on every invalidation so a load that raced with a change is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id) -> Optional[UserAuthState]:
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, state = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return state
+
+    def get_or_load(self, user_id, loader: Callable[[], UserAuthState]) -> UserAuthState:
+        """Return the cached state for the user, calling `loader` on a miss"""
+        state = self.get(user_id)
+        if state is not None:
+            return state
+
+        with self._lock:
+            generation = self._generation
+        state = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[str(user_id)] = (time.monotonic() + self.ttl, state)
+        return state
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(str(user_id), None)
+
+    def invalidate_all(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+        logger.info("Permission cache cleared")
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+
+# Create a single instance to use everywhere
+permission_cache = PermissionCache()
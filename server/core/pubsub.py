@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+# "memory" keeps fan-out inside one process; "database" relays it to every
+# worker through the application database (an outbox table, polled on SQLite
+# and announced with NOTIFY on Postgres)
+WS_BROKER = os.getenv("WS_BROKER", "memory").lower()
+WS_BROKER_CHANNEL = os.getenv("WS_BROKER_CHANNEL", "ws_events")
+# Outbox: how often SQLite workers poll, and how long relayed events are kept
+WS_BROKER_POLL_INTERVAL = float(os.getenv("WS_BROKER_POLL_INTERVAL", "0.2"))
+WS_BROKER_RETENTION = float(os.getenv("WS_BROKER_RETENTION", "60"))
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Broker:
+    """
+    Relays WebSocket fan-out envelopes between API worker processes.
+    Every worker delivers to its own sockets directly; the broker hands
+    each published envelope to the *other* workers' handler.
+    """
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def publish(self, envelope: dict):
+        raise NotImplementedError
+
+    async def _dispatch(self, envelope: dict):
+        if envelope.get("origin") == self.worker_id or self._handler is None:
+            return
+        try:
+            await self._handler(envelope)
+        except Exception as e:
+            logger.warning(f"Failed to deliver relayed WebSocket event: {e}")
+
+
+class InMemoryBroker(Broker):
+    """Single-process broker: there are no other workers to relay to"""
+
+    async def publish(self, envelope: dict):
+        return None
+
+
+class SQLiteBroker(Broker):
+    """
+    Outbox table in the shared SQLite file, polled by every worker.
+    Needs no extra services, which also makes it usable from tests.
+    """
+
+    def __init__(self, path: str, channel: str = WS_BROKER_CHANNEL,
+                 poll_interval: float = WS_BROKER_POLL_INTERVAL, retention: float = WS_BROKER_RETENTION):
+        super().__init__()
+        self.path = path
+        self.table = f"{channel}_outbox"
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._last_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _setup(self) -> int:
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, "
+                "payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.commit()
+            # Only relay events published after this worker started
+            return conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.table}").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _insert(self, origin: str, payload: str):
+        conn = self._connect()
+        try:
+            now = time.time()
+            conn.execute(f"INSERT INTO {self.table} (origin, payload, created_at) VALUES (?, ?, ?)", (origin, payload, now))
+            conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.retention,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _fetch(self, after_id: int):
+        conn = self._connect()
+        try:
+            return conn.execute(
+                f"SELECT id, payload FROM {self.table} WHERE id > ? AND origin != ? ORDER BY id",
+                (after_id, self.worker_id)
+            ).fetchall()
+        finally:
+            conn.close()
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self._last_id = await asyncio.to_thread(self._setup)
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await super().stop()
+
+    async def publish(self, envelope: dict):
+        await asyncio.to_thread(self._insert, self.worker_id, json.dumps(envelope))
+
+    async def _poll(self):
+        while True:
+            try:
+                rows = await asyncio.to_thread(self._fetch, self._last_id)
+                for row_id, payload in rows:
+                    self._last_id = row_id
+                    await self._dispatch(json.loads(payload))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"WebSocket broker poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+class PostgresBroker(Broker):
+    """
+    Outbox table plus LISTEN/NOTIFY over a dedicated asyncpg connection.
+    NOTIFY payloads are capped at 8000 bytes, so envelopes of any size go
+    into the outbox and only "<origin>:<row id>" is sent on the channel.
+    """
+
+    def __init__(self, dsn: str, channel: str = WS_BROKER_CHANNEL, retention: float = WS_BROKER_RETENTION):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.table = f"{channel}_outbox"
+        self.retention = retention
+        self._conn = None
+        # One asyncpg connection cannot run two commands at once
+        self._lock = asyncio.Lock()
+
+    async def start(self, handler: Handler):
+        import asyncpg
+        await super().start(handler)
+        self._conn = await asyncpg.connect(self.dsn)
+        await self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "id BIGSERIAL PRIMARY KEY, origin TEXT NOT NULL, "
+            "payload TEXT NOT NULL, created_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+        await self._conn.add_listener(self.channel, self._on_notify)
+
+    async def stop(self):
+        if self._conn is not None:
+            try:
+                await self._conn.remove_listener(self.channel, self._on_notify)
+                await self._conn.close()
+            finally:
+                self._conn = None
+        await super().stop()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        origin, _, row_id = payload.rpartition(":")
+        if origin == self.worker_id or not row_id.isdigit():
+            return
+        asyncio.get_running_loop().create_task(self._receive(int(row_id)))
+
+    async def _receive(self, row_id: int):
+        if self._conn is None:
+            return
+        try:
+            async with self._lock:
+                payload = await self._conn.fetchval(f"SELECT payload FROM {self.table} WHERE id = $1", row_id)
+        except Exception as e:
+            logger.warning(f"WebSocket broker failed to read relayed event {row_id}: {e}")
+            return
+        if payload is not None:
+            await self._dispatch(json.loads(payload))
+
+    async def publish(self, envelope: dict):
+        if self._conn is None:
+            return
+        async with self._lock:
+            async with self._conn.transaction():
+                row_id = await self._conn.fetchval(
+                    f"INSERT INTO {self.table} (origin, payload) VALUES ($1, $2) RETURNING id",
+                    self.worker_id, json.dumps(envelope)
+                )
+                await self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE created_at < now() - make_interval(secs => $1)", self.retention
+                )
+                # Delivered on commit, after the row is visible to the other workers
+                await self._conn.execute("SELECT pg_notify($1, $2)", self.channel, f"{self.worker_id}:{row_id}")
+
+
+def create_pubsub_broker(kind: str = WS_BROKER, database_url: Optional[str] = None) -> Broker:
+    """Build the broker selected by WS_BROKER for the given database"""
+    if kind == "memory":
+        return InMemoryBroker()
+    if kind != "database":
+        raise ValueError(f"Unknown WS_BROKER '{kind}' (expected 'memory' or 'database')")
+
+    if database_url is None:
+        from core.database import DATABASE_URL
+        database_url = DATABASE_URL
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        if not url.database or url.database == ":memory:":
+            raise ValueError("WS_BROKER=database needs a file-based SQLite database")
+        return SQLiteBroker(url.database)
+    if backend == "postgresql":
+        return PostgresBroker(url.set(drivername="postgresql").render_as_string(hide_password=False))
+    raise ValueError(f"No WebSocket broker available for database backend '{backend}'")
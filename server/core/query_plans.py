@@ -0,0 +1,83 @@
+import uuid
+import datetime
+from typing import List, Tuple
+from sqlalchemy import select, Select
+from sqlalchemy.orm import Session
+
+
+def _explain(connection, statement) -> List[str]:
+    """Plan lines of `statement`; the sample parameters are inlined as literals"""
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    rows = connection.exec_driver_sql(prefix + sql).fetchall()
+    # SQLite returns (id, parent, notused, detail); Postgres one text column
+    return [str(row[-1]) for row in rows]
+
+
+def _hot_queries() -> List[Tuple[str, str, Select]]:
+    """(name, table, statement) for the lookups that must stay on an index"""
+    from models.core_models import (
+        Contract, ContractView, FinancialTransaction, Inventory, Notification, StockMovement
+    )
+    from models.hr_models import AttendanceLog
+    some_id, other_id = uuid.uuid4(), uuid.uuid4()
+    day = datetime.datetime.combine(datetime.date.today(), datetime.time.min)
+    return [
+        ("ledger_by_type", "financial_transactions",
+         select(FinancialTransaction.id).where(
+             FinancialTransaction.contract_id == some_id,
+             FinancialTransaction.type.in_(["Invoice", "Pricing Adjustment"]))),
+        ("ledger_page", "financial_transactions",
+         select(FinancialTransaction.id).where(FinancialTransaction.contract_id == some_id)
+         .order_by(FinancialTransaction.transaction_date, FinancialTransaction.created_at)),
+        ("stock_level", "inventory",
+         select(Inventory.id).where(Inventory.warehouse_id == some_id, Inventory.article_id == other_id)),
+        ("stock_card", "stock_movements",
+         select(StockMovement.id).where(StockMovement.article_id == some_id, StockMovement.warehouse_id == other_id)
+         .order_by(StockMovement.date.desc())),
+        ("unread_notifications", "notifications",
+         select(Notification.id).where(Notification.user_id == some_id, Notification.is_read == False)
+         .order_by(Notification.created_at.desc())),
+        ("contract_views", "contract_views",
+         select(ContractView.id).where(ContractView.contract_id == some_id).order_by(ContractView.viewed_at.desc())),
+        ("attendance_day", "attendance_logs",
+         select(AttendanceLog.id).where(AttendanceLog.timestamp >= day, AttendanceLog.timestamp < day + datetime.timedelta(days=1))),
+        ("attendance_lookback", "attendance_logs",
+         select(AttendanceLog.id).where(
+             AttendanceLog.employee_id == "1001",
+             AttendanceLog.timestamp >= day - datetime.timedelta(days=6), AttendanceLog.timestamp < day)),
+        ("contract_page", "contracts",
+         select(Contract.id).order_by(Contract.modified_date.desc(), Contract.id.desc()).limit(50)),
+    ]
+
+
+def _is_full_scan(dialect: str, table: str, plan: List[str]) -> bool:
+    if dialect == "sqlite":
+        # "SCAN t" reads the whole table; "SEARCH t USING INDEX" / "SCAN t USING INDEX" don't
+        return any(line.startswith(f"SCAN {table}") and "USING" not in line for line in plan)
+    return any(f"Seq Scan on {table}" in line for line in plan)
+
+
+def check_query_plans(db: Session) -> List[dict]:
+    """
+    EXPLAIN every hot query and report whether it still reads its table
+    through an index. On Postgres sequential scans are disabled for the
+    check, so small tables don't hide a missing index behind a cheap scan.
+    """
+    dialect = db.get_bind().dialect.name
+    results = []
+    try:
+        connection = db.connection()
+        if dialect == "postgresql":
+            connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        for name, table, statement in _hot_queries():
+            plan = _explain(connection, statement)
+            results.append({
+                "query": name,
+                "table": table,
+                "uses_index": not _is_full_scan(dialect, table, plan),
+                "plan": plan,
+            })
+    finally:
+        db.rollback()
+    return results
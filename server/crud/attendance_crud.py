@@ -0,0 +1,69 @@
+from sqlalchemy import event, select, update, insert, inspect, tuple_
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional
+import uuid
+from models.hr_models import AttendanceLog
+from models.employee_models import Employee
+from core.database import insert_ignore
+
+def resolve_employee_pks(db: Session, codes: Iterable[str]) -> Dict[str, uuid.UUID]:
+    """{device user id: Employee.id} for the codes that belong to an employee"""
+    codes = {str(code) for code in codes if code is not None}
+    if not codes:
+        return {}
+    rows = db.query(Employee.code, Employee.id).filter(Employee.code.in_(codes)).all()
+    return {str(code): pk for code, pk in rows}
+
+def insert_attendance_logs(db: Session, rows: List[dict]) -> int:
+    """
+    Bulk insert attendance log rows, skipping punches already stored
+    (attendance_logs is unique on employee_id, timestamp, device_id).
+    Does not commit. Returns the number of rows actually inserted.
+    """
+    if not rows:
+        return 0
+    logs = AttendanceLog.__table__
+    stmt = insert_ignore(db, logs)
+    if stmt is not None:
+        return len(db.execute(stmt.returning(logs.c.id), rows).all())
+
+    keys = {(row["employee_id"], row["timestamp"], row["device_id"]) for row in rows}
+    existing = set(db.query(AttendanceLog.employee_id, AttendanceLog.timestamp, AttendanceLog.device_id).filter(
+        tuple_(AttendanceLog.employee_id, AttendanceLog.timestamp, AttendanceLog.device_id).in_(keys)
+    ).all())
+    rows = [row for row in rows if (row["employee_id"], row["timestamp"], row["device_id"]) not in existing]
+    if rows:
+        db.execute(insert(logs), rows)
+    return len(rows)
+
+def link_attendance_logs(connection, codes: Optional[Iterable[str]] = None) -> int:
+    """
+    Point unlinked attendance logs at the employee whose code matches their
+    device user id. Limited to `codes` when given, otherwise every unlinked
+    log is checked. Returns the number of logs linked.
+    """
+    logs = AttendanceLog.__table__
+    employees = Employee.__table__
+    match = select(employees.c.id).where(employees.c.code == logs.c.employee_id).scalar_subquery()
+    stmt = update(logs).where(logs.c.user_id == None).values(user_id=match)
+    if codes is not None:
+        codes = [str(code) for code in codes]
+        if not codes:
+            return 0
+        stmt = stmt.where(logs.c.employee_id.in_(codes))
+    else:
+        stmt = stmt.where(logs.c.employee_id.in_(select(employees.c.code)))
+    return connection.execute(stmt).rowcount
+
+@event.listens_for(Session, "after_flush")
+def _link_new_employee_codes(session: Session, flush_context):
+    """Logs can arrive before the employee is created or given its code; link them once it is"""
+    codes = set()
+    for obj in session.new:
+        if isinstance(obj, Employee) and obj.code:
+            codes.add(obj.code)
+    for obj in session.dirty:
+        if isinstance(obj, Employee) and obj.code and inspect(obj).attrs.code.history.has_changes():
+            codes.add(obj.code)
+    if codes:
+        link_attendance_logs(session.connection(), codes)
@@ -0,0 +1,181 @@
+from sqlalchemy import event, func, case, select, update, insert, or_, and_
+from sqlalchemy.orm import Session
+from typing import Dict, Optional
+import uuid
+from models.core_models import ContractBalance, FinancialTransaction
+from core.database import insert_ignore
+from core.pagination import encode_cursor, decode_cursor
+
+# Transaction types that make up the value booked against a contract
+BOOKED_TYPES = ("Invoice", "Pricing Adjustment")
+
+TOTALS = ("total_debit", "total_credit", "booked_value")
+
+def _transaction_delta(txn: FinancialTransaction, sign: int) -> dict:
+    amount = float(txn.amount or 0) * sign
+    return {
+        "total_debit": 0.0 if txn.is_credit else amount,
+        "total_credit": amount if txn.is_credit else 0.0,
+        "booked_value": (-amount if txn.is_credit else amount) if txn.type in BOOKED_TYPES else 0.0,
+    }
+
+def _last_txn_at(contract_id: uuid.UUID):
+    """Newest created_at among the contract's ledger rows, as a scalar subquery"""
+    t = FinancialTransaction.__table__
+    return select(func.max(t.c.created_at)).where(t.c.contract_id == contract_id).scalar_subquery()
+
+def _ledger_totals(connection, contract_id: uuid.UUID) -> dict:
+    """Totals recomputed from the contract's ledger rows"""
+    t = FinancialTransaction.__table__
+    credit = case((t.c.is_credit == True, t.c.amount), else_=0)
+    debit = case((t.c.is_credit == True, 0), else_=t.c.amount)
+    booked = case(
+        (t.c.type.in_(BOOKED_TYPES), case((t.c.is_credit == True, -t.c.amount), else_=t.c.amount)),
+        else_=0
+    )
+    row = connection.execute(
+        select(
+            func.coalesce(func.sum(debit), 0),
+            func.coalesce(func.sum(credit), 0),
+            func.coalesce(func.sum(booked), 0),
+            _last_txn_at(contract_id)
+        ).where(t.c.contract_id == contract_id)
+    ).one()
+    return {"total_debit": float(row[0]), "total_credit": float(row[1]), "booked_value": float(row[2]), "last_txn_at": row[3]}
+
+def _bump(connection, contract_id: uuid.UUID, delta: dict) -> bool:
+    """
+    Add `delta` to an existing balance row and re-read last_txn_at from the
+    ledger, so deletes move it back too; False if the contract has none yet
+    """
+    b = ContractBalance.__table__
+    values = {key: b.c[key] + delta[key] for key in TOTALS}
+    values["last_txn_at"] = _last_txn_at(contract_id)
+    return connection.execute(update(b).where(b.c.contract_id == contract_id).values(**values)).rowcount > 0
+
+def _create_if_missing(connection, contract_id: uuid.UUID, totals: dict):
+    b = ContractBalance.__table__
+    stmt = insert_ignore(connection, b)
+    if stmt is None:
+        stmt = insert(b)
+    connection.execute(stmt.values(contract_id=contract_id, **totals))
+
+def apply_balance_deltas(connection, deltas: Dict[uuid.UUID, dict]):
+    """
+    Add per-contract changes ({total_debit, total_credit, booked_value}) to
+    contract_balances on the given connection.
+    Must run after the ledger rows themselves were written: a contract without
+    a balance row is seeded from its ledger minus the changes being applied.
+    """
+    for contract_id, delta in deltas.items():
+        if _bump(connection, contract_id, delta):
+            continue
+        totals = _ledger_totals(connection, contract_id)
+        seed = {key: totals[key] - delta[key] for key in TOTALS}
+        seed["last_txn_at"] = totals["last_txn_at"]
+        _create_if_missing(connection, contract_id, seed)
+        _bump(connection, contract_id, delta)
+
+@event.listens_for(Session, "after_flush")
+def _track_ledger_writes(session: Session, flush_context):
+    """Keep contract_balances in step with FinancialTransaction rows added or deleted through the ORM"""
+    deltas: Dict[uuid.UUID, dict] = {}
+    for objects, sign in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            if not isinstance(obj, FinancialTransaction) or obj.contract_id is None:
+                continue
+            delta = deltas.setdefault(obj.contract_id, dict.fromkeys(TOTALS, 0.0))
+            for key, value in _transaction_delta(obj, sign).items():
+                delta[key] += value
+    if deltas:
+        apply_balance_deltas(session.connection(), deltas)
+
+def get_contract_balance(db: Session, contract_id: uuid.UUID) -> dict:
+    """total_debit, total_credit, booked_value, outstanding_balance and last_txn_at of one contract"""
+    # Balance rows are updated with Core statements; don't trust a copy already in the session
+    row = db.query(ContractBalance).populate_existing().filter(ContractBalance.contract_id == contract_id).first()
+    if row:
+        balance = {key: float(getattr(row, key) or 0) for key in TOTALS}
+        balance["last_txn_at"] = row.last_txn_at
+    else:
+        # Contract has no ledger rows yet (or predates the table)
+        balance = _ledger_totals(db.connection(), contract_id)
+    balance["outstanding_balance"] = balance["total_debit"] - balance["total_credit"]
+    return balance
+
+def encode_ledger_cursor(row) -> str:
+    """Opaque cursor pointing just after ledger row `row`"""
+    return encode_cursor({"i": str(row.id)})
+
+def decode_ledger_cursor(cursor: str) -> uuid.UUID:
+    """Inverse of encode_ledger_cursor(); raises ValueError for anything malformed"""
+    return decode_cursor(cursor, lambda payload: uuid.UUID(payload["i"]))
+
+def get_ledger_page(db: Session, contract_id: uuid.UUID, cursor: Optional[str] = None, limit: int = 100) -> dict:
+    """
+    One keyset page of a contract's ledger in (transaction_date, created_at, id) order.
+    Running balance and the contract-wide debit/credit totals are window
+    functions over the contract's rows, so a single query returns the page,
+    the balance carried into it (opening_balance) and the summary.
+    """
+    t = FinancialTransaction
+    credit = case((t.is_credit == True, t.amount), else_=0)
+    debit = case((t.is_credit == True, 0), else_=t.amount)
+    signed = case((t.is_credit == True, -t.amount), else_=t.amount)
+    order = (t.transaction_date, t.created_at, t.id)
+
+    ledger = db.query(
+        t.id, t.transaction_date, t.created_at, t.type, t.description, t.reference, t.amount, t.is_credit,
+        func.sum(signed).over(order_by=order, rows=(None, 0)).label("running_balance"),
+        func.sum(debit).over().label("total_debit"),
+        func.sum(credit).over().label("total_credit"),
+    ).filter(t.contract_id == contract_id).subquery()
+
+    query = db.query(ledger)
+    if cursor:
+        # Seek past the cursor row using its own stored sort values, which
+        # avoids round-tripping timestamps through the cursor
+        last_id = decode_ledger_cursor(cursor)
+        last_date = select(t.transaction_date).where(t.id == last_id).scalar_subquery()
+        last_created = select(t.created_at).where(t.id == last_id).scalar_subquery()
+        query = query.filter(or_(
+            ledger.c.transaction_date > last_date,
+            and_(ledger.c.transaction_date == last_date, ledger.c.created_at > last_created),
+            and_(ledger.c.transaction_date == last_date, ledger.c.created_at == last_created, ledger.c.id > last_id)
+        ))
+    rows = query.order_by(ledger.c.transaction_date, ledger.c.created_at, ledger.c.id).limit(limit + 1).all()
+    page = rows[:limit]
+
+    if page:
+        first = page[0]
+        opening_balance = float(first.running_balance) - (-float(first.amount) if first.is_credit else float(first.amount))
+        total_debit, total_credit = float(first.total_debit), float(first.total_credit)
+    else:
+        # Past the last row: everything is carried in
+        totals = get_contract_balance(db, contract_id)
+        total_debit, total_credit = totals["total_debit"], totals["total_credit"]
+        opening_balance = total_debit - total_credit
+
+    return {
+        "ledger": [
+            {
+                "id": str(row.id),
+                "transaction_date": row.transaction_date.isoformat(),
+                "type": row.type,
+                "description": row.description,
+                "reference": row.reference,
+                "amount": float(row.amount),
+                "is_credit": row.is_credit,
+                "running_balance": float(row.running_balance)
+            }
+            for row in page
+        ],
+        "opening_balance": opening_balance,
+        "closing_balance": float(page[-1].running_balance) if page else opening_balance,
+        "next_cursor": encode_ledger_cursor(page[-1]) if len(rows) > limit else None,
+        "accounting_summary": {
+            "total_debit": total_debit,
+            "total_credit": total_credit,
+            "outstanding_balance": total_debit - total_credit
+        }
+    }
@@ -1,15 +1,18 @@
 # server/crud/crud.py
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, or_, and_
 from datetime import datetime
 import uuid
 import logging
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 # Import models and schemas
-from models.core_models import Contract, ContractItem, Conveyor, Notification
+from models.core_models import Contract, ContractItem, Conveyor, Notification, EntityCounter
 from schemas.schemas import ContractCreate, NotificationCreate, NotificationUpdate
+from crud import sequence_crud
+from core.database import insert_ignore
+from core.pagination import encode_cursor, decode_cursor
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -18,15 +21,21 @@ logger = logging.getLogger(__name__)
 # Helper Functions
 # ---------------------------------------------------------
 
-def get_contract_by_id(db: Session, contract_id: uuid.UUID) -> Optional[Contract]:
-    """Get contract by ID with all relationships - optimized to avoid N+1 queries"""
+def get_contract_by_id(db: Session, contract_id: uuid.UUID, refresh: bool = False) -> Optional[Contract]:
+    """
+    Get contract by ID with all relationships - optimized to avoid N+1 queries.
+    refresh=True overwrites an instance already in the session so items and
+    articles are fully loaded (needed before handing it outside run_sync).
+    """
     from sqlalchemy.orm import joinedload, selectinload
-    contract = db.query(Contract)\
+    query = db.query(Contract)\
         .options(
             selectinload(Contract.items).selectinload(ContractItem.article)
         )\
-        .filter(Contract.id == contract_id)\
-        .first()
+        .filter(Contract.id == contract_id)
+    if refresh:
+        query = query.populate_existing()
+    contract = query.first()
 
     # Article names are available through the relationship property
     # No need to manually assign - the article_name property handles this
@@ -34,15 +43,15 @@ def get_contract_by_id(db: Session, contract_id: uuid.UUID) -> Optional[Contract
 
 def get_contracts(db: Session, skip: int = 0, limit: int = 50) -> tuple[List[Contract], int]:
     """Get list of contracts with pagination - optimized version"""
-    # Get total count (cached for better performance)
-    total_count = db.query(func.count(Contract.id)).scalar()
+    # Total comes from the maintained counter instead of a COUNT(*) scan
+    total_count = get_contract_count(db)
 
     # Get paginated results with ordering for consistent pagination
     # Use selectinload to avoid N+1 queries for items and articles
     from sqlalchemy.orm import selectinload
     contracts = db.query(Contract)\
         .options(selectinload(Contract.items).selectinload(ContractItem.article))\
-        .order_by(Contract.modified_date.desc())\
+        .order_by(Contract.modified_date.desc(), Contract.id.desc())\
         .offset(skip)\
         .limit(limit)\
         .all()
@@ -50,6 +59,148 @@ def get_contracts(db: Session, skip: int = 0, limit: int = 50) -> tuple[List[Con
     logger.info(f"Fetched {len(contracts)} contracts from DB. Total count: {total_count}")
     return contracts, total_count
 
+# ---------------------------------------------------------
+# Keyset pagination
+# ---------------------------------------------------------
+
+def encode_contract_cursor(contract: Contract, page: int) -> str:
+    """Opaque cursor pointing just after `contract` in (modified_date, id) DESC order"""
+    payload = {
+        "m": contract.modified_date.isoformat() if contract.modified_date else None,
+        "i": str(contract.id),
+        "p": page,
+    }
+    return encode_cursor(payload)
+
+def decode_contract_cursor(cursor: str) -> Tuple[datetime, uuid.UUID, int]:
+    """Inverse of encode_contract_cursor(); raises ValueError for anything malformed"""
+    return decode_cursor(cursor, lambda payload: (
+        datetime.fromisoformat(payload["m"]), uuid.UUID(payload["i"]), int(payload.get("p", 1))
+    ))
+
+def get_contracts_after(db: Session, cursor: Optional[str], limit: int = 50) -> Tuple[List[Contract], Optional[str], int]:
+    """
+    Keyset page of contracts ordered by (modified_date, id) DESC.
+    Returns (contracts, next_cursor, page); the cost is the same at any depth
+    because the cursor turns into an index range instead of an OFFSET.
+    """
+    from sqlalchemy.orm import selectinload
+    query = db.query(Contract)\
+        .options(selectinload(Contract.items).selectinload(ContractItem.article))
+
+    page = 1
+    if cursor:
+        modified_date, last_id, page = decode_contract_cursor(cursor)
+        query = query.filter(or_(
+            Contract.modified_date < modified_date,
+            and_(Contract.modified_date == modified_date, Contract.id < last_id)
+        ))
+
+    rows = query.order_by(Contract.modified_date.desc(), Contract.id.desc()).limit(limit + 1).all()
+    contracts = rows[:limit]
+    next_cursor = encode_contract_cursor(contracts[-1], page + 1) if len(rows) > limit else None
+    return contracts, next_cursor, page
+
+# Columns the contracts grid needs; the long Text columns are left out
+CONTRACT_SUMMARY_COLUMNS = (
+    Contract.id, Contract.contract_no, Contract.direction, Contract.status,
+    Contract.contract_type, Contract.pricing_status, Contract.contract_currency,
+    Contract.issue_date, Contract.shipment_date, Contract.modified_date,
+    Contract.seller_id, Contract.buyer_id, Contract.warehouse_id,
+)
+
+def get_contract_summaries(db: Session, skip: int = 0, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str], int]:
+    """
+    Contracts grid rows as plain dicts: summary columns, seller/buyer names
+    and item aggregates (count, quantity, value) computed in SQL.
+    Paged like get_contracts_after() when `cursor` is given, else by OFFSET.
+    Returns (rows, next_cursor, page).
+    """
+    from models.core_models import Article, Buyer, Seller
+
+    query = db.query(
+        *CONTRACT_SUMMARY_COLUMNS,
+        Seller.contact_name.label("seller_name"),
+        Buyer.contact_name.label("buyer_name"),
+    ).outerjoin(Seller, Seller.id == Contract.seller_id)\
+     .outerjoin(Buyer, Buyer.id == Contract.buyer_id)
+
+    page = (skip // limit) + 1
+    if cursor:
+        modified_date, last_id, page = decode_contract_cursor(cursor)
+        query = query.filter(or_(
+            Contract.modified_date < modified_date,
+            and_(Contract.modified_date == modified_date, Contract.id < last_id)
+        ))
+
+    query = query.order_by(Contract.modified_date.desc(), Contract.id.desc())
+    if not cursor:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_contract_cursor(rows[limit - 1], page + 1) if len(rows) > limit else None
+    summaries = [dict(row._mapping) for row in rows[:limit]]
+    if not summaries:
+        return summaries, next_cursor, page
+
+    # One grouped query for the items of this page only
+    totals = {
+        row.contract_id: row
+        for row in db.query(
+            ContractItem.contract_id,
+            func.count(ContractItem.id).label("item_count"),
+            func.sum(func.coalesce(ContractItem.qty_ton, ContractItem.quantity, 0)).label("total_qty"),
+            func.sum(func.coalesce(ContractItem.total, 0)).label("total_value"),
+            func.count(func.distinct(ContractItem.article_id)).label("article_count"),
+            func.min(Article.article_name).label("article_name"),
+        ).outerjoin(Article, Article.id == ContractItem.article_id)
+         .filter(ContractItem.contract_id.in_([row["id"] for row in summaries]))
+         .group_by(ContractItem.contract_id)
+    }
+    for row in summaries:
+        agg = totals.get(row["id"])
+        row["item_count"] = agg.item_count if agg else 0
+        row["total_qty"] = float(agg.total_qty or 0) if agg else 0.0
+        row["total_value"] = float(agg.total_value or 0) if agg else 0.0
+        # Single commodity name when the items share one article
+        row["article_name"] = agg.article_name if agg and agg.article_count == 1 else None
+
+    return summaries, next_cursor, page
+
+# ---------------------------------------------------------
+# Cached counters
+# ---------------------------------------------------------
+
+CONTRACT_COUNTER = "contracts"
+
+def adjust_counter(db: Session, name: str, delta: int):
+    """
+    Add `delta` to a counter as part of the caller's transaction (no commit).
+    A counter that hasn't been seeded yet is left alone; it is seeded with an
+    exact count on its first read.
+    """
+    db.query(EntityCounter).filter(EntityCounter.name == name)\
+        .update({EntityCounter.value: EntityCounter.value + delta}, synchronize_session=False)
+
+def _seed_counter(db: Session, name: str, value: int):
+    """Create the counter row unless another transaction already did (no commit)"""
+    stmt = insert_ignore(db, EntityCounter)
+    if stmt is None:
+        stmt = insert(EntityCounter)
+    db.execute(stmt.values(name=name, value=value))
+
+def get_contract_count(db: Session) -> int:
+    """
+    Total number of contracts from the maintained counter. The migration and
+    startup seed the row; if it is still missing it is seeded here within the
+    caller's transaction, which the caller commits or discards.
+    """
+    counter = db.query(EntityCounter.value).filter(EntityCounter.name == CONTRACT_COUNTER).scalar()
+    if counter is not None:
+        return counter
+
+    _seed_counter(db, CONTRACT_COUNTER, db.query(func.count(Contract.id)).scalar())
+    return db.query(EntityCounter.value).filter(EntityCounter.name == CONTRACT_COUNTER).scalar()
+
 def get_conveyors(db: Session, skip: int = 0, limit: int = 100) -> List[Conveyor]:
     """Get list of conveyors for dropdown lists"""
     return db.query(Conveyor).offset(skip).limit(limit).all()
@@ -57,8 +208,9 @@ def get_conveyors(db: Session, skip: int = 0, limit: int = 100) -> List[Conveyor
 def generate_contract_number(db: Session, seller_code: str = "SELL") -> str:
     """
     Generate automatic contract number in format: SELLYYMM0001
-    Based on seller code + year and month + sequence
-    Fixed SQL injection vulnerability by using parameterized queries
+    Based on seller code + year and month + sequence.
+    The serial comes from the document_sequences table, so concurrent
+    creates never get the same number and no contract scan is needed.
     """
     today = datetime.now()
     year_month = today.strftime("%y%m")  # Example: 2411
@@ -67,29 +219,15 @@ def generate_contract_number(db: Session, seller_code: str = "SELL") -> str:
     sanitized_seller_code = ''.join(c for c in seller_code if c.isalnum())
     if len(sanitized_seller_code) > 10:
         sanitized_seller_code = sanitized_seller_code[:10]
-    
-    # Create the pattern for LIKE query using proper parameterization
-    pattern = f"{sanitized_seller_code}{year_month}%"
-    
-    # Find last contract for this seller in this month using safe query
-    last_contract = db.query(Contract).filter(
-        Contract.contract_no.like(pattern)
-    ).order_by(Contract.contract_no.desc()).first()
-    
-    next_num = 1
-    if last_contract and last_contract.contract_no:
-        try:
-            # Extract serial number safely
-            contract_no = last_contract.contract_no
-            if contract_no.startswith(f"{sanitized_seller_code}{year_month}"):
-                serial_part = contract_no[len(sanitized_seller_code) + len(year_month):]
-                if len(serial_part) == 4 and serial_part.isdigit():
-                    last_num = int(serial_part)
-                    next_num = last_num + 1
-        except (ValueError, IndexError):
-            next_num = 1
-            
-    return f"{sanitized_seller_code}{year_month}{next_num:04d}"
+    prefix = f"{sanitized_seller_code}{year_month}"
+
+    def seed() -> int:
+        # First number of the month: continue after contracts numbered before the sequence existed
+        numbers = db.query(Contract.contract_no).filter(Contract.contract_no.like(f"{prefix}%")).all()
+        return sequence_crud.last_serial((n for (n,) in numbers), prefix)
+
+    next_num = sequence_crud.next_value(db, f"contract:{sanitized_seller_code}", year_month, seed)
+    return f"{prefix}{next_num:04d}"
 
 def calculate_item_total(item_data, contract_type: str) -> tuple:
     """
@@ -108,29 +246,31 @@ def calculate_item_total(item_data, contract_type: str) -> tuple:
     
     return qty, total
 
-def create_contract_item(contract_id: uuid.UUID, item_data, qty: float, total: float) -> ContractItem:
+def contract_item_row(contract_id: uuid.UUID, item_data, contract_type: str) -> dict:
     """
-    Create a ContractItem object from item data.
+    Column values of a new ContractItem, ready for a bulk insert.
     This helper reduces code duplication.
     """
-    return ContractItem(
-        contract_id=contract_id,
-        article_id=item_data.article_id,
-        qty_lot=item_data.qty_lot,
-        qty_ton=item_data.qty_ton,
-        quantity=qty,
-        premium=item_data.premium,
-        packing=item_data.packing,
-        price=item_data.price,
-        total=total
-    )
+    qty, total = calculate_item_total(item_data, contract_type)
+    return {
+        "id": uuid.uuid4(),
+        "contract_id": contract_id,
+        "article_id": item_data.article_id,
+        "qty_lot": item_data.qty_lot,
+        "qty_ton": item_data.qty_ton,
+        "quantity": qty,
+        "premium": item_data.premium,
+        "packing": item_data.packing,
+        "price": item_data.price,
+        "total": total
+    }
 
 # ---------------------------------------------------------
 # Create Operation
 # ---------------------------------------------------------
 
 def create_contract(db: Session, contract: ContractCreate, user_id: uuid.UUID) -> Contract:
-    """Create new contract with its items"""
+    """Create new contract with its items. Flushes but leaves the commit to the caller"""
     try:
         # 1. Process contract number
         contract_no = contract.contract_no
@@ -187,18 +327,16 @@ def create_contract(db: Session, contract: ContractCreate, user_id: uuid.UUID) -
         )
         
         db.add(db_contract)
-        db.commit()
-        db.refresh(db_contract)
+        adjust_counter(db, CONTRACT_COUNTER, 1)
+        db.flush()
 
-        # 3. Add contract items
+        # 3. Add contract items in one bulk insert
         if contract.items:
-            for item_data in contract.items:
-                qty, total = calculate_item_total(item_data, contract.contract_type)
-                db_item = create_contract_item(db_contract.id, item_data, qty, total)
-                db.add(db_item)
-
-            db.commit()
-            db.refresh(db_contract)
+            db.execute(insert(ContractItem), [
+                contract_item_row(db_contract.id, item_data, contract.contract_type)
+                for item_data in contract.items
+            ])
+            db.expire(db_contract, ["items"])
 
         return db_contract
         
@@ -212,7 +350,7 @@ def create_contract(db: Session, contract: ContractCreate, user_id: uuid.UUID) -
 # ---------------------------------------------------------
 
 def update_contract(db: Session, contract_id: uuid.UUID, contract: ContractCreate) -> Optional[Contract]:
-    """Update existing contract"""
+    """Update existing contract. Flushes but leaves the commit to the caller"""
     try:
         db_contract = db.query(Contract).filter(Contract.id == contract_id).first()
         if not db_contract:
@@ -236,6 +374,7 @@ def update_contract(db: Session, contract_id: uuid.UUID, contract: ContractCreat
         existing_items_dict = {str(item.id): item for item in existing_items}
         
         incoming_item_ids = set()
+        new_rows = []
         
         if contract.items:
             for item_data in contract.items:
@@ -256,16 +395,17 @@ def update_contract(db: Session, contract_id: uuid.UUID, contract: ContractCreat
                     incoming_item_ids.add(item_id_str)
                 else:
                     # Add new item
-                    db_item = create_contract_item(contract_id, item_data, qty, total)
-                    db.add(db_item)
+                    new_rows.append(contract_item_row(contract_id, item_data, contract.contract_type))
         
         # Delete items that are no longer present
-        for eid, item in existing_items_dict.items():
-            if eid not in incoming_item_ids:
-                db.delete(item)
+        removed_ids = [item.id for eid, item in existing_items_dict.items() if eid not in incoming_item_ids]
+        if removed_ids:
+            db.query(ContractItem).filter(ContractItem.id.in_(removed_ids)).delete(synchronize_session="fetch")
         
-        db.commit()
-        db.refresh(db_contract)
+        db.flush()
+        if new_rows:
+            db.execute(insert(ContractItem), new_rows)
+        db.expire(db_contract, ["items"])
         return db_contract
         
     except Exception as e:
@@ -285,11 +425,13 @@ def delete_contract(db: Session, contract_id: uuid.UUID) -> Optional[dict]:
             return None
             
         # Delete related contract views first to avoid constraint violations
-        from server.models.core_models import ContractView
+        from models.core_models import ContractView, ContractBalance
         db.query(ContractView).filter(ContractView.contract_id == contract_id).delete()
+        db.query(ContractBalance).filter(ContractBalance.contract_id == contract_id).delete()
         
         # Delete the contract
         db.delete(db_contract)
+        adjust_counter(db, CONTRACT_COUNTER, -1)
         db.commit()
         return {"message": "Contract deleted successfully"}
         
@@ -322,6 +464,34 @@ def create_notification(db: Session, notification: NotificationCreate) -> Notifi
         db.rollback()
         raise e
 
+def create_notifications_bulk(db: Session, user_ids: List[uuid.UUID], title: str, message: str,
+                              type: str, related_id: Optional[uuid.UUID] = None) -> List[dict]:
+    """Insert the same notification for many users in one statement and one commit"""
+    if not user_ids:
+        return []
+    created_at = datetime.now()
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "user_id": uid,
+            "title": title,
+            "message": message,
+            "type": type,
+            "related_id": related_id,
+            "is_read": False,
+            "created_at": created_at,
+        }
+        for uid in user_ids
+    ]
+    try:
+        db.execute(insert(Notification), rows)
+        db.commit()
+        return rows
+    except Exception as e:
+        logger.error(f"Failed to create notifications in bulk: {e}")
+        db.rollback()
+        raise e
+
 def get_notifications_by_user(db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 50) -> List[Notification]:
     """Get notifications for a specific user"""
     return db.query(Notification)\
@@ -1,19 +1,27 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, case, update, insert, bindparam
 from datetime import datetime
 import uuid
+from typing import Dict, List, Tuple
 from models import core_models
 import schemas.schemas as schemas
 from fastapi import HTTPException
+from crud import sequence_crud
+from core.database import insert_ignore
 
 def generate_note_number(db: Session, type_prefix: str):
-    """Generates: DN-OUT-2024-001, DN-IN-2024-001"""
-    year = datetime.now().year
+    """Generates: DN-OUT-2024-0001, DN-IN-2024-0001"""
+    year = str(datetime.now().year)
     prefix = f"DN-{type_prefix.upper()}-{year}"
-    count = db.query(core_models.DeliveryNote).filter(
-        core_models.DeliveryNote.note_number.like(f"{prefix}%")
-    ).count()
-    return f"{prefix}-{str(count + 1).zfill(4)}"
+
+    def seed() -> int:
+        numbers = db.query(core_models.DeliveryNote.note_number).filter(
+            core_models.DeliveryNote.note_number.like(f"{prefix}-%")
+        ).all()
+        return sequence_crud.last_serial((n for (n,) in numbers), f"{prefix}-")
+
+    serial = sequence_crud.next_value(db, f"DN-{type_prefix.upper()}", year, seed)
+    return f"{prefix}-{str(serial).zfill(4)}"
 
 def create_delivery_note(db: Session, note: schemas.DeliveryNoteCreate, user_id: uuid.UUID):
     # Generate Number
@@ -121,38 +129,66 @@ def _process_stock_movement(db: Session, note: core_models.DeliveryNote, movemen
         )
         db.add(log)
 
+def _insert_missing_stock_rows(db: Session, keys: List[Tuple[uuid.UUID, uuid.UUID]]):
+    """Create empty stock rows for the (warehouse_id, article_id) pairs that have none"""
+    inventory = core_models.Inventory.__table__
+    rows = [{"warehouse_id": wh, "article_id": art, "quantity_on_hand": 0, "reserved_quantity": 0} for wh, art in keys]
+    stmt = insert_ignore(db, inventory)
+    if stmt is not None:
+        db.execute(stmt, rows)
+    else:
+        existing = set(db.query(core_models.Inventory.warehouse_id, core_models.Inventory.article_id).filter(
+            core_models.Inventory.warehouse_id.in_({wh for wh, _ in keys}),
+            core_models.Inventory.article_id.in_({art for _, art in keys})
+        ).all())
+        rows = [row for row in rows if (row["warehouse_id"], row["article_id"]) not in existing]
+        if rows:
+            db.execute(insert(inventory), rows)
+
+def adjust_reservations(db: Session, deltas: Dict[Tuple[uuid.UUID, uuid.UUID], float]) -> int:
+    """
+    Add signed quantities to reserved_quantity, keyed by (warehouse_id, article_id).
+    Missing stock rows are created with one INSERT ... ON CONFLICT DO NOTHING
+    (inventory is unique on warehouse/article), then all deltas are applied in a
+    single executemany UPDATE; reserved_quantity never goes below zero.
+    Does not commit. Returns the number of stock rows adjusted.
+    """
+    deltas = {key: float(qty) for key, qty in deltas.items() if qty and float(qty) != 0}
+    if not deltas:
+        return 0
+
+    # Releasing stock that was never recorded has nothing to release
+    missing = [key for key, qty in deltas.items() if qty > 0]
+    if missing:
+        _insert_missing_stock_rows(db, missing)
+
+    inventory = core_models.Inventory.__table__
+    reserved = func.coalesce(inventory.c.reserved_quantity, 0) + bindparam("delta")
+    stmt = update(inventory)\
+        .where(inventory.c.warehouse_id == bindparam("wh"), inventory.c.article_id == bindparam("art"))\
+        .values(reserved_quantity=case((reserved < 0, 0), else_=reserved))
+    db.execute(stmt, [{"wh": wh, "art": art, "delta": qty} for (wh, art), qty in deltas.items()])
+    return len(deltas)
+
+def diff_reservations(old: Dict[Tuple[uuid.UUID, uuid.UUID], float],
+                      new: Dict[Tuple[uuid.UUID, uuid.UUID], float]) -> Dict[Tuple[uuid.UUID, uuid.UUID], float]:
+    """Net change per (warehouse_id, article_id) going from `old` to `new` reservations; unchanged keys are left out"""
+    deltas = {}
+    for key in old.keys() | new.keys():
+        delta = round(float(new.get(key, 0)) - float(old.get(key, 0)), 6)
+        if delta:
+            deltas[key] = delta
+    return deltas
+
 def reserve_stock(db: Session, article_id: uuid.UUID, warehouse_id: uuid.UUID, quantity: float):
     """Adds to reserved_quantity without changing quantity_on_hand"""
-    inventory = db.query(core_models.Inventory).filter(
-        core_models.Inventory.warehouse_id == warehouse_id,
-        core_models.Inventory.article_id == article_id
-    ).first()
-
-    if not inventory:
-        inventory = core_models.Inventory(
-            warehouse_id=warehouse_id,
-            article_id=article_id,
-            quantity_on_hand=0,
-            reserved_quantity=0
-        )
-        db.add(inventory)
-        db.flush()
-
-    inventory.reserved_quantity = float(inventory.reserved_quantity or 0) + float(quantity)
+    adjust_reservations(db, {(warehouse_id, article_id): quantity})
     db.commit()
-    return inventory
 
 def release_stock(db: Session, article_id: uuid.UUID, warehouse_id: uuid.UUID, quantity: float):
     """Subtracts from reserved_quantity"""
-    inventory = db.query(core_models.Inventory).filter(
-        core_models.Inventory.warehouse_id == warehouse_id,
-        core_models.Inventory.article_id == article_id
-    ).first()
-
-    if inventory:
-        inventory.reserved_quantity = max(0, float(inventory.reserved_quantity or 0) - float(quantity))
-        db.commit()
-    return inventory
+    adjust_reservations(db, {(warehouse_id, article_id): -float(quantity)})
+    db.commit()
 
 def get_stock_card(db: Session, article_id: uuid.UUID, warehouse_id: uuid.UUID = None):
     """Trace specific article movements"""
@@ -1,8 +1,10 @@
 import uuid
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+from sqlalchemy import select, func, event, inspect
 from fastapi import HTTPException
 from models.rbac_models import Role, Permission, role_permissions, user_roles
+from models.core_models import User
+from core.permission_cache import permission_cache, UserAuthState
 
 def get_role_by_name(db: Session, name: str):
     return db.query(Role).filter(Role.name == name).first()
@@ -40,6 +42,8 @@ def assign_permission_to_role(db: Session, role_id, permission_id):
         stmt = role_permissions.insert().values(role_id=role_id, permission_id=permission_id)
         db.execute(stmt)
         db.commit()
+        # A role can be shared by many users - drop every cached permission set
+        permission_cache.invalidate_all()
 
 def assign_role_to_user(db: Session, user_id, role_id):
     # Ensure UUIDs
@@ -55,6 +59,31 @@ def assign_role_to_user(db: Session, user_id, role_id):
         stmt = user_roles.insert().values(user_id=user_id, role_id=role_id)
         db.execute(stmt)
         db.commit()
+        permission_cache.invalidate_user(user_id)
+
+def update_role_permissions(db: Session, role_id, permission_ids: list):
+    """Replace the permission set of a role with the given permission ids"""
+    # Ensure UUIDs
+    if isinstance(role_id, str): role_id = uuid.UUID(role_id)
+    permission_ids = [uuid.UUID(pid) if isinstance(pid, str) else pid for pid in permission_ids]
+
+    role = db.query(Role).filter(Role.id == role_id).first()
+    if not role:
+        raise HTTPException(status_code=404, detail="Role not found")
+
+    try:
+        db.execute(role_permissions.delete().where(role_permissions.c.role_id == role_id))
+        if permission_ids:
+            db.execute(role_permissions.insert(), [
+                {"role_id": role_id, "permission_id": pid} for pid in dict.fromkeys(permission_ids)
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        permission_cache.invalidate_all()
+    return True
 
 def get_user_permissions(db: Session, user_id):
     # Ensure UUID
@@ -73,6 +102,51 @@ def get_user_permissions(db: Session, user_id):
     result = db.execute(stmt).scalars().all()
     return result
 
+def get_user_auth_state(db: Session, user_id) -> UserAuthState:
+    """Cached role, active flag and permission names of a user, used by the auth dependencies"""
+    def load():
+        uid = user_id
+        if isinstance(uid, str):
+            try:
+                uid = uuid.UUID(uid)
+            except ValueError:
+                pass
+        row = db.query(User.role, User.is_active).filter(User.id == uid).first()
+        role, is_active = row if row else (None, False)
+        return UserAuthState(role, bool(is_active), frozenset(get_user_permissions(db, uid)))
+    return permission_cache.get_or_load(user_id, load)
+
+def get_user_permission_set(db: Session, user_id) -> frozenset:
+    """Cached variant of get_user_permissions used by the auth dependencies"""
+    return get_user_auth_state(db, user_id).permissions
+
+# Users whose role or active flag changed in a session, invalidated once it commits
+_AUTH_CHANGED_KEY = "rbac_auth_changed_users"
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_auth_changes(session: Session, flush_context):
+    changed = set()
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            attrs = inspect(obj).attrs
+            if attrs.role.history.has_changes() or attrs.is_active.history.has_changes():
+                changed.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+    if changed:
+        session.info.setdefault(_AUTH_CHANGED_KEY, set()).update(changed)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_user_auth_changes(session: Session):
+    # After commit, so a concurrent load can't cache the pre-change row again
+    for user_id in session.info.pop(_AUTH_CHANGED_KEY, ()):
+        permission_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_auth_changes(session: Session):
+    session.info.pop(_AUTH_CHANGED_KEY, None)
+
 def get_user_roles(db: Session, user_id):
     # Ensure UUID
     if isinstance(user_id, str):
@@ -93,8 +167,8 @@ def check_user_permission(db: Session, user_id, permission_name: str):
     Check if a user has a specific permission.
     Returns: (bool, message)
     """
-    # 1. Get user permissions
-    permissions = get_user_permissions(db, user_id)
+    # 1. Get user permissions (served from the in-process cache when warm)
+    permissions = get_user_permission_set(db, user_id)
     
     if permission_name in permissions:
         return True, "Permission granted"
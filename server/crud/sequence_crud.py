@@ -0,0 +1,51 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import update, insert
+from typing import Callable, Optional
+from models.core_models import DocumentSequence
+from core.database import insert_ignore
+
+def _increment(db: Session, scope: str, period: str) -> Optional[int]:
+    """Bump the counter and return the value it held, or None if the row doesn't exist"""
+    stmt = update(DocumentSequence)\
+        .where(DocumentSequence.scope == scope, DocumentSequence.period == period)\
+        .values(next_value=DocumentSequence.next_value + 1)\
+        .returning(DocumentSequence.next_value)\
+        .execution_options(synchronize_session=False)
+    new_value = db.execute(stmt).scalar()
+    return new_value - 1 if new_value is not None else None
+
+def _create_if_missing(db: Session, scope: str, period: str, next_value: int):
+    values = {"scope": scope, "period": period, "next_value": next_value}
+    stmt = insert_ignore(db, DocumentSequence)
+    if stmt is None:
+        stmt = insert(DocumentSequence)
+    db.execute(stmt.values(**values))
+
+def next_value(db: Session, scope: str, period: str, seed: Optional[Callable[[], int]] = None) -> int:
+    """
+    Allocate the next number of a (scope, period) sequence.
+
+    Runs in the caller's transaction: the UPDATE ... RETURNING holds the row
+    (or, on SQLite, the write lock) until commit, so concurrent callers get
+    distinct numbers and a rolled-back document gives its number back.
+    `seed` returns the highest number already used; it is only called the
+    first time a period is seen, to carry on from pre-existing documents.
+    """
+    value = _increment(db, scope, period)
+    if value is not None:
+        return value
+
+    start = seed() if seed else 0
+    _create_if_missing(db, scope, period, start + 1)
+    return _increment(db, scope, period)
+
+def last_serial(numbers, prefix: str, width: int = 4) -> int:
+    """Highest trailing serial among document numbers that start with `prefix`"""
+    best = 0
+    for number in numbers:
+        if not number or not number.startswith(prefix):
+            continue
+        serial = number[len(prefix):]
+        if len(serial) == width and serial.isdigit():
+            best = max(best, int(serial))
+    return best
@@ -2,6 +2,7 @@
 import os
 import logging
 import uuid
+import json
 try:
     from dotenv import load_dotenv
     # Load .env from the server directory
@@ -28,15 +29,19 @@ from sqlalchemy import text
 from pydantic import BaseModel
 
 # Import core modules
-from core.database import get_db, Base, engine, SessionLocal
+from core.database import get_db, Base, engine, SessionLocal, pool_metrics
 import models
 core_models = models
 rbac_models = models
 department_models = models
 hr_models = models
 import schemas.schemas as schemas
-from crud import rbac_crud
-from core.auth import authenticate_user, create_access_token, get_current_user_obj, get_password_hash, require_permission
+from crud import crud, rbac_crud
+# Registers the flush hook that keeps contract_balances in step with the ledger
+from crud import balance_crud
+# Registers the flush hook that links attendance logs to newly created employee codes
+from crud import attendance_crud
+from core.auth import authenticate_user, create_access_token, get_current_user_obj, get_password_hash, require_permission, get_user_from_raw_token
 
 # Import routers
 from routers import contracts, conveyors, agents, financial_transactions, departments, hr, notifications, dashboard, inventory, payments, bank_accounts, documents, archive
@@ -44,7 +49,12 @@ from rbac.rbac_main import router as rbac_router
 
 # استيراد مدير الويب سوكيت
 from fastapi import WebSocket, WebSocketDisconnect
-from ws_manager import manager
+from fastapi.concurrency import run_in_threadpool
+from ws_manager import manager, contract_events
+from core.pubsub import create_pubsub_broker
+from core.query_plans import check_query_plans
+from services.zk_service import ZK_AVAILABLE
+from services.sync_scheduler import sync_scheduler, ZK_SYNC_SCHEDULER
 
 app = FastAPI(title="JANDALISYS")
 
@@ -127,15 +137,46 @@ app.include_router(bank_accounts.router, prefix="/api", tags=["bank_accounts"])
 app.include_router(archive.router, prefix="/api", tags=["archive"])
 
 # --- WebSocket Endpoint ---
+def _ws_user_id(token: str):
+    db = SessionLocal()
+    try:
+        return get_user_from_raw_token(token, db).id
+    finally:
+        db.close()
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, token: str = None, topics: str = None):
+    """
+    Authenticated push channel.
+    ?token=<access token> is required; ?topics=contracts,inventory limits the
+    subscribed topics (default: all). Clients may later send
+    {"action": "subscribe" | "unsubscribe", "topics": [...]}.
+    """
     logger.info(f"Incoming WebSocket connection from {websocket.client}")
     try:
-        await manager.connect(websocket)
-        logger.info(f"WebSocket connection accepted for {websocket.client}")
+        user_id = await run_in_threadpool(_ws_user_id, token) if token else None
+    except HTTPException:
+        user_id = None
+    if user_id is None:
+        logger.warning(f"Rejected unauthenticated WebSocket from {websocket.client}")
+        await websocket.close(code=4401)
+        return
+
+    try:
+        await manager.connect(websocket, user_id, topics.split(",") if topics else None)
+        logger.info(f"WebSocket connection accepted for {websocket.client} (user {user_id})")
         while True:
             data = await websocket.receive_text()
-            # Handle messages if needed
+            try:
+                request = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(request, dict):
+                continue
+            if request.get("action") == "subscribe":
+                await manager.subscribe(websocket, request.get("topics") or [])
+            elif request.get("action") == "unsubscribe":
+                await manager.unsubscribe(websocket, request.get("topics") or [])
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for {websocket.client}")
         await manager.disconnect(websocket)
@@ -170,6 +211,10 @@ def startup_event():
         # Ensure archive storage is initialized
         from routers.archive import ensure_storage
         ensure_storage(db)
+
+        # Databases built by create_all above skip the migration that seeds the contract counter
+        crud.get_contract_count(db)
+        db.commit()
         
         logger.info("Initializing default roles and permissions...")
         # Define default roles and their permissions
@@ -332,6 +377,25 @@ def startup_event():
     finally:
         db.close()
 
+    # Poll attendance devices in the background; mock mode (no zk library) is left to manual syncs
+    if ZK_SYNC_SCHEDULER and ZK_AVAILABLE:
+        sync_scheduler.start()
+
+@app.on_event("startup")
+async def start_ws_broker():
+    # Relay WebSocket fan-out between uvicorn workers (WS_BROKER=database)
+    await manager.start_broker(create_pubsub_broker())
+    logger.info(f"WebSocket broker: {type(manager.broker).__name__}")
+
+@app.on_event("shutdown")
+async def stop_ws_broker():
+    await contract_events.flush()
+    await manager.stop_broker()
+
+@app.on_event("shutdown")
+async def stop_sync_scheduler():
+    await sync_scheduler.stop()
+
 # --- Root Endpoint ---
 @app.get("/")
 def read_root():
@@ -352,7 +416,11 @@ def login_auth(user_credentials: schemas.UserLogin, db: Session = Depends(get_db
     
     print(f"DEBUG: User authenticated successfully: {user.email}", flush=True)
     
-    token = create_access_token({"sub": str(user.id)})
+    token = create_access_token(
+        {"sub": str(user.id)},
+        user=user,
+        permissions=rbac_crud.get_user_permission_set(db, user.id)
+    )
     print(f"DEBUG: Token created successfully", flush=True)
     
     # Fetch permissions for the user's role
@@ -885,6 +953,20 @@ def read_parties(db: Session = Depends(get_db), current_user = Depends(get_curre
 def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/health/db")
+def database_health(current_user = Depends(require_permission("manage_system"))):
+    """Connection pool statistics, including checkout wait time"""
+    return {"dialect": engine.dialect.name, "pool": pool_metrics.snapshot(engine)}
+
+@app.get("/health/db/plans")
+def database_query_plans(
+    db: Session = Depends(get_db),
+    current_user = Depends(require_permission("manage_system"))
+):
+    """EXPLAIN the hot lookups; any entry with uses_index false has fallen back to a full table scan"""
+    plans = check_query_plans(db)
+    return {"dialect": engine.dialect.name, "ok": all(p["uses_index"] for p in plans), "queries": plans}
+
 # Simple test endpoint for debugging
 @app.post("/api/auth/test-login")
 def test_login_endpoint(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
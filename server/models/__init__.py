@@ -1,7 +1,7 @@
-from .core_models import User, Conveyor, Broker, Agent, Buyer, Seller, Shipper, Article, Contract, ContractItem, PaymentTerm, Incoterm, DocumentType, Warehouse, Inventory, DeliveryNote, DeliveryNoteItem, StockMovement, FinancialTransaction, Notification
+from .core_models import User, Conveyor, Broker, Agent, Buyer, Seller, Shipper, Article, Contract, ContractItem, PaymentTerm, Incoterm, DocumentType, Warehouse, Inventory, DeliveryNote, DeliveryNoteItem, StockMovement, FinancialTransaction, ContractBalance, Notification, EntityCounter, DocumentSequence
 from .department_models import Department, Position
 from .rbac_models import Role, Permission, role_permissions, user_roles
-from .hr_models import ZkDevice, AttendanceLog, WorkShift, EmployeeShiftAssignment
+from .hr_models import ZkDevice, AttendanceLog, WorkShift, EmployeeShiftAssignment, AttendanceSyncJob
 from .archive_models import ArchiveFolder, ArchiveFile
 from .company_models import Company
 from .employee_models import EmployeeBank, EmployeeEmergencyContact, EmployeeDocument, EmployeeSalary, EmployeeLeave, EmployeePerformance, EmployeeTraining, EmployeeWorkHistory, EmployeeSystemAccess, EmployeePersonalInfo
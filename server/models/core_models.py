@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Boolean, ForeignKey, DECIMAL, Enum as SqlEnum
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Boolean, ForeignKey, DECIMAL, Index, UniqueConstraint, Enum as SqlEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -113,7 +113,10 @@ class Article(Base):
 
 class Contract(Base):
     __tablename__ = "contracts"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_contracts_modified_date', 'modified_date', 'id'),
+        {'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     contract_no = Column(String(255), unique=True)
@@ -258,7 +261,10 @@ class Inventory(Base):
     (Snapshot Table)
     """
     __tablename__ = "inventory"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        UniqueConstraint('warehouse_id', 'article_id', name='uq_inventory_warehouse_article'),
+        {'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     warehouse_id = Column(UUID(as_uuid=True), ForeignKey("warehouses.id"), nullable=False)
@@ -326,7 +332,10 @@ class StockMovement(Base):
     Immutable table.
     """
     __tablename__ = "stock_movements"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_stock_movements_article_warehouse_date', 'article_id', 'warehouse_id', 'date'),
+        {'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     date = Column(DateTime, default=func.now())
@@ -348,7 +357,10 @@ class StockMovement(Base):
 
 class ContractView(Base):
     __tablename__ = "contract_views"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_contract_views_contract_viewed_at', 'contract_id', 'viewed_at'),
+        {'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     contract_id = Column(UUID(as_uuid=True), ForeignKey("contracts.id"), nullable=False)
@@ -361,7 +373,11 @@ class ContractView(Base):
 
 class FinancialTransaction(Base):
     __tablename__ = "financial_transactions"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_financial_transactions_contract_type', 'contract_id', 'type'),
+        Index('ix_financial_transactions_contract_date', 'contract_id', 'transaction_date', 'created_at'),
+        {'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     contract_id = Column(UUID(as_uuid=True), ForeignKey("contracts.id"), nullable=False)
@@ -388,6 +404,21 @@ class FinancialTransaction(Base):
     item = relationship("ContractItem", backref="pricing_history")
     linked_transaction = relationship("FinancialTransaction", remote_side=[id], backref="linked_payments")
 
+class ContractBalance(Base):
+    """
+    Running totals of a contract's financial ledger, kept in step with every
+    FinancialTransaction insert/delete by crud.balance_crud in the same flush.
+    booked_value is the signed sum of Invoice and Pricing Adjustment rows.
+    """
+    __tablename__ = "contract_balances"
+    __table_args__ = {'extend_existing': True}
+
+    contract_id = Column(UUID(as_uuid=True), ForeignKey("contracts.id"), primary_key=True)
+    total_debit = Column(DECIMAL(15, 2), nullable=False, default=0)
+    total_credit = Column(DECIMAL(15, 2), nullable=False, default=0)
+    booked_value = Column(DECIMAL(15, 2), nullable=False, default=0)
+    last_txn_at = Column(DateTime, nullable=True)
+
 class BankAccount(Base):
     __tablename__ = "bank_accounts"
     __table_args__ = {'extend_existing': True}
@@ -405,7 +436,10 @@ class BankAccount(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        {'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -454,4 +488,30 @@ class ContractDocument(Base):
     contract = relationship("Contract")
     document_type = relationship("DocumentType")
     uploader = relationship("User", foreign_keys=[uploaded_by])
-    verifier = relationship("User", foreign_keys=[verified_by])
\ No newline at end of file
+    verifier = relationship("User", foreign_keys=[verified_by])
+
+
+class EntityCounter(Base):
+    """
+    Row counts maintained by the crud layer in the same transaction as the
+    inserts/deletes they track, so totals don't need a COUNT(*) scan.
+    """
+    __tablename__ = "entity_counters"
+    __table_args__ = {'extend_existing': True}
+
+    name = Column(String(50), primary_key=True)  # e.g. "contracts"
+    value = Column(Integer, nullable=False, default=0)
+
+
+class DocumentSequence(Base):
+    """
+    Next serial number per document scope and period, e.g.
+    ("contract:CNT", "2411") or ("PAY", "2024"). Allocated by
+    crud.sequence_crud.next_value() with an atomic increment.
+    """
+    __tablename__ = "document_sequences"
+    __table_args__ = {'extend_existing': True}
+
+    scope = Column(String(50), primary_key=True)
+    period = Column(String(10), primary_key=True)
+    next_value = Column(Integer, nullable=False, default=1)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Enum, Float, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Enum, Float, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from core.database import Base
 from sqlalchemy.dialects.postgresql import UUID
@@ -24,12 +24,19 @@ class ZkDevice(Base):
     port = Column(Integer, default=4370)
     is_active = Column(Boolean, default=True)
     last_sync = Column(DateTime, nullable=True)
+    last_synced_timestamp = Column(DateTime, nullable=True) # Newest punch already ingested from this device
     location = Column(String, nullable=True)
+    direction = Column(String, nullable=True) # check_in, check_out; punches from other devices are "unknown"
     status = Column(String, default="offline") # online, offline, error
 
 class AttendanceLog(Base):
     __tablename__ = "attendance_logs"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_attendance_logs_employee_timestamp', 'employee_id', 'timestamp'),
+        Index('ix_attendance_logs_employee_pk_timestamp', 'user_id', 'timestamp'),
+        UniqueConstraint('employee_id', 'timestamp', 'device_id', name='uq_attendance_logs_employee_timestamp_device'),
+        {'extend_existing': True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     employee_pk = Column("user_id", UUID(as_uuid=True), ForeignKey("employees.id"), nullable=True) # Linked to internal Employee ID
@@ -46,6 +53,26 @@ class AttendanceLog(Base):
     employee = relationship("Employee", backref="attendance_logs")
     device = relationship("ZkDevice", backref="logs")
 
+class AttendanceSyncJob(Base):
+    """One sync run of one device, scheduled or started by a user"""
+    __tablename__ = "attendance_sync_jobs"
+    __table_args__ = (
+        Index('ix_attendance_sync_jobs_device_started', 'device_id', 'started_at'),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(Integer, ForeignKey("zk_devices.id", ondelete="CASCADE"), nullable=False)
+    trigger = Column(String, default="scheduled") # scheduled, manual
+    status = Column(String, default="running") # queued, running, success, warning, error, timeout, skipped
+    started_at = Column(DateTime, default=datetime.datetime.now, index=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_ms = Column(Float, nullable=True)
+    logs_count = Column(Integer, default=0)
+    message = Column(String, nullable=True)
+
+    device = relationship("ZkDevice")
+
 class ShiftType(str, enum.Enum):
     FIXED = "fixed"
     ROTATIONAL = "rotational"
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Form
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import or_, func
 from pydantic import BaseModel
-from core.database import get_db
+from core.database import get_db, get_async_db, run_db
 from models import archive_models, core_models
 import schemas.schemas as schemas
 from core.auth import get_current_user_obj, require_permission, get_user_from_raw_token
@@ -128,7 +130,7 @@ def view_file(
         has_perm, _ = rbac_crud.check_user_permission(db, str(current_user.id), "archive_read")
         if not has_perm:
             raise HTTPException(status_code=403, detail="Permission archive_read required")
-        print(f"DEBUG: Auth success for {current_user.email}")
+        print(f"DEBUG: Auth success for {current_user.id}")
     except Exception as e:
         print(f"DEBUG: Auth failed: {str(e)}")
         raise HTTPException(status_code=401, detail=f"Auth failed: {str(e)}")
@@ -317,11 +319,11 @@ async def upload_file(
     name: Optional[str] = Form(None), 
     description: Optional[str] = Form(None),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(require_permission("archive_upload"))
 ):
-    ensure_storage(db)
-    folder = db.query(archive_models.ArchiveFolder).get(folder_id)
+    await run_db(db, ensure_storage)
+    folder = await db.get(archive_models.ArchiveFolder, folder_id)
     if not folder:
         raise HTTPException(status_code=404, detail="Folder not found")
         
@@ -360,8 +362,10 @@ async def upload_file(
         counter += 1
     
     # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    def _save():
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+    await run_in_threadpool(_save)
         
     new_file = archive_models.ArchiveFile(
         folder_id=folder_id,
@@ -374,8 +378,8 @@ async def upload_file(
         created_by=current_user.id
     )
     db.add(new_file)
-    db.commit()
-    db.refresh(new_file)
+    await db.commit()
+    await db.refresh(new_file)
     return new_file
 
 @router.delete("/files/{file_id}")
@@ -660,14 +664,14 @@ async def perform_scan(
     folder_id: int = Form(...),
     filename: str = Form(...),
     description: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(require_permission("archive_upload"))
 ):
-    scanner = db.query(archive_models.ScannerDevice).get(scanner_id)
+    scanner = await db.get(archive_models.ScannerDevice, scanner_id)
     if not scanner:
         raise HTTPException(status_code=404, detail="Scanner not found")
         
-    folder = db.query(archive_models.ArchiveFolder).get(folder_id)
+    folder = await db.get(archive_models.ArchiveFolder, folder_id)
     if not folder:
         raise HTTPException(status_code=404, detail="Folder not found")
 
@@ -719,6 +723,6 @@ async def perform_scan(
         created_by=current_user.id
     )
     db.add(new_file)
-    db.commit()
-    db.refresh(new_file)
+    await db.commit()
+    await db.refresh(new_file)
     return new_file
@@ -1,10 +1,10 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
 import uuid
 
-from core.database import get_db
+from core.database import get_async_db, run_db
 from schemas import schemas
 from core.auth import get_current_user, require_permission
 from services.contract_service import ContractService
@@ -25,7 +25,7 @@ def validate_uuid(contract_id: str) -> uuid.UUID:
 @router.post("/", response_model=schemas.Contract)
 async def create_contract(
     contract: schemas.ContractCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(require_permission("write_contracts"))
 ):
     """
@@ -41,36 +41,53 @@ async def create_contract(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/")
-def read_contracts(
+async def read_contracts(
     skip: int = 0, 
     limit: int = 50, 
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    view: str = "full",
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(require_permission("read_contracts"))
 ):
-    """Get paginated contracts with metadata"""
+    """
+    Get paginated contracts with metadata.
+    Pass `cursor` (pagination.next_cursor of the previous page) for keyset
+    paging, which costs the same at any depth; `skip` still works.
+    view=summary returns only grid columns plus item totals as plain rows.
+    """
+    if view not in ("full", "summary"):
+        raise HTTPException(status_code=400, detail="view must be 'full' or 'summary'")
     # Validate pagination parameters
     if limit > 100:  # Prevent excessive loads
         limit = 100
+    if limit < 1:
+        limit = 1
     if skip < 0:
         skip = 0
         
-    result = ContractService.get_contracts(db, skip, limit)
+    try:
+        if view == "summary":
+            result = await run_db(db, ContractService.get_contract_summaries, skip, limit, cursor)
+        else:
+            result = await run_db(db, ContractService.get_contracts, skip, limit, None, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return result
 
 @router.get("/{contract_id}", response_model=schemas.Contract)
-def read_contract(
+async def read_contract(
     contract_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(require_permission("read_contracts"))
 ):
     uuid_obj = validate_uuid(contract_id)
 
-    db_contract = ContractService.get_contract(db, uuid_obj)
+    db_contract = await run_db(db, ContractService.get_contract, uuid_obj)
     if db_contract is None:
         raise HTTPException(status_code=404, detail="Contract not found")
 
     # Record the view
-    ContractService.record_contract_view(db, uuid_obj, current_user.id)
+    await run_db(db, ContractService.record_contract_view, uuid_obj, current_user.id)
 
     return db_contract
 
@@ -78,7 +95,7 @@ def read_contract(
 async def update_contract(
     contract_id: str,
     contract: schemas.ContractCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(require_permission("write_contracts"))
 ):
     uuid_obj = validate_uuid(contract_id)
@@ -91,7 +108,7 @@ async def update_contract(
 @router.delete("/{contract_id}")
 async def delete_contract(
     contract_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(require_permission("delete_contracts"))
 ):
     uuid_obj = validate_uuid(contract_id)
@@ -101,48 +118,29 @@ async def delete_contract(
         raise HTTPException(status_code=404, detail="Contract not found")
     return {"message": "Contract deleted successfully"}
 
-@router.get("/{contract_id}/ledger", response_model=List[schemas.FinancialTransaction])
-def get_contract_ledger(
-    contract_id: str,
-    skip: int = 0,
-    limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_user)
-):
-    """Get financial ledger for a contract - requires authentication"""
-    uuid_obj = validate_uuid(contract_id)
-
-    # Validate pagination parameters
-    if limit > 100:  # Prevent excessive loads
-        limit = 100
-    if skip < 0:
-        skip = 0
-
-    return ContractService.get_contract_ledger(db, uuid_obj, skip, limit)
-
 @router.post("/{contract_id}/price", response_model=schemas.PricingResponse)
 async def price_contract(
     contract_id: str,
     pricing_data: schemas.ContractPricingRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(require_permission("price_contracts"))
 ):
     uuid_obj = validate_uuid(contract_id)
     return await ContractService.price_contract(db, uuid_obj, pricing_data, current_user.id)
 
 @router.get("/{contract_id}/pricing-tree")
-def get_pricing_tree(
+async def get_pricing_tree(
     contract_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(require_permission("read_contracts"))
 ):
     uuid_obj = validate_uuid(contract_id)
-    return ContractService.get_pricing_tree(db, uuid_obj)
+    return await run_db(db, ContractService.get_pricing_tree, uuid_obj)
 
 @router.post("/{contract_id}/approve-pricing")
 async def approve_pricing(
     contract_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(require_permission("approve_pricing"))
 ):
     uuid_obj = validate_uuid(contract_id)
@@ -152,43 +150,43 @@ async def approve_pricing(
 async def partial_price(
     contract_id: str,
     pricing_data: schemas.ContractPartialPricingRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(require_permission("price_contracts"))
 ):
     uuid_obj = validate_uuid(contract_id)
     return await ContractService.partial_price(db, uuid_obj, pricing_data, current_user.id)
 
 @router.get("/{contract_id}/views", response_model=List[schemas.ContractView])
-def get_contract_views(
+async def get_contract_views(
     contract_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Get viewing history for a specific contract"""
     uuid_obj = validate_uuid(contract_id)
 
-    return ContractService.get_contract_views(db, uuid_obj)
+    return await run_db(db, ContractService.get_contract_views, uuid_obj)
 
 @router.get("/views/my-history")
-def get_user_contract_views(
+async def get_user_contract_views(
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Get viewing history for the current user"""
-    return ContractService.get_user_contract_views(db, current_user.id, skip, limit)
+    return await run_db(db, ContractService.get_user_contract_views, current_user.id, skip, limit)
 
 
 @router.get("/search/", response_model=List[schemas.Contract])
-def search_contracts(
+async def search_contracts(
     status: str = None,
     start_date: str = None,
     end_date: str = None,
     user_id: str = None,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Search contracts based on criteria like status, date, or user"""
@@ -198,6 +196,6 @@ def search_contracts(
     if skip < 0:
         skip = 0
 
-    return ContractService.search_contracts(
-        db, status, start_date, end_date, user_id, skip, limit
+    return await run_db(
+        db, ContractService.search_contracts, status, start_date, end_date, user_id, skip, limit
     )
\ No newline at end of file
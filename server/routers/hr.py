@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File, Query
 from sqlalchemy.orm import Session, aliased
-from sqlalchemy import func, or_
+from sqlalchemy import or_
 from core.database import get_db
 from models import hr_models, core_models, employee_models
 from core.auth import get_current_user_obj, require_permission
 from services.zk_service import ZkTecoService
+from services.sync_scheduler import sync_scheduler
 from services.import_service import EmployeeImportService
+from services.attendance_service import AttendanceSessionEngine
 import datetime
 import uuid
+from typing import List
 
 # Define permissions
 PERM_HR_READ = "hr_read"
@@ -15,6 +18,25 @@ PERM_HR_WRITE = "hr_write"
 
 router = APIRouter(prefix="/hr", tags=["HR Management"])
 
+def _timestamp_range(start: datetime.date = None, end: datetime.date = None):
+    """
+    Filters for logs on days start..end (inclusive), as a half-open timestamp
+    range so the (employee_id, timestamp) indexes can be used; wrapping the
+    column in DATE() would force a scan of the whole log table.
+    """
+    filters = []
+    if start:
+        filters.append(hr_models.AttendanceLog.timestamp >= datetime.datetime.combine(start, datetime.time.min))
+    if end:
+        filters.append(hr_models.AttendanceLog.timestamp < datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min))
+    return filters
+
+def _parse_day(value: str, name: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(value[:10])
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}, expected YYYY-MM-DD")
+
 @router.get("/dashboard")
 def get_hr_dashboard(db: Session = Depends(get_db), current_user = Depends(get_current_user_obj)):
     # Simple stats
@@ -23,7 +45,7 @@ def get_hr_dashboard(db: Session = Depends(get_db), current_user = Depends(get_c
     
     # Attendance today
     today_logs = db.query(hr_models.AttendanceLog).filter(
-        func.date(hr_models.AttendanceLog.timestamp) == today
+        *_timestamp_range(today, today)
     ).all()
     
     present_ids = set(log.employee_id for log in today_logs)
@@ -71,8 +93,7 @@ def get_hr_dashboard(db: Session = Depends(get_db), current_user = Depends(get_c
                     recent_checkins = db.query(hr_models.AttendanceLog).filter(
                         hr_models.AttendanceLog.employee_id == emp.code,
                         hr_models.AttendanceLog.type == 'check_in',
-                        func.date(hr_models.AttendanceLog.timestamp) >= seven_days_ago,
-                        func.date(hr_models.AttendanceLog.timestamp) < today
+                        *_timestamp_range(seven_days_ago, today - datetime.timedelta(days=1))
                     ).count()
                     
                     min_required = shift.min_days_for_paid_holiday or 4
@@ -303,58 +324,69 @@ def get_devices(db: Session = Depends(get_db)):
         "name": d.name,
         "ip_address": d.ip_address,
         "port": d.port,
+        "location": d.location,
+        "direction": d.direction,
         "status": d.status,
         "last_sync": d.last_sync.isoformat() if d.last_sync else None
     } for d in devices]
 
-@router.post("/devices/sync-multiple")
-def sync_multiple_devices(
+@router.post("/devices/sync-multiple", status_code=202)
+async def sync_multiple_devices(
     payload: dict,
-    db: Session = Depends(get_db),
     current_user = Depends(require_permission(PERM_HR_WRITE))
 ):
-    """Sync multiple devices at once"""
-    device_ids = payload.get("device_ids", [])
-    if not device_ids:
-        # If no IDs provided, sync all online/active devices
-        devices = db.query(hr_models.ZkDevice).all()
-        device_ids = [d.id for d in devices]
-    
-    service = ZkTecoService(db)
-    results = []
-    total_new_logs = 0
-    
-    for d_id in device_ids:
-        try:
-            res = service.sync_device(d_id)
-            results.append({
-                "device_id": d_id,
-                "status": res.get("status"),
-                "message": res.get("message"),
-                "logs_count": res.get("logs_count", 0)
-            })
-            total_new_logs += res.get("logs_count", 0)
-        except Exception as e:
-            results.append({
-                "device_id": d_id,
-                "status": "error",
-                "message": str(e)
-            })
-            
+    """Queue a sync of several devices (all of them when no ids are given); poll /hr/sync-jobs for the outcome"""
+    device_ids = payload.get("device_ids") or None
+    job_ids = await sync_scheduler.enqueue(device_ids, "manual")
     return {
-        "status": "success",
-        "total_new_logs": total_new_logs,
-        "details": results
+        "status": "queued",
+        "jobs": [{"device_id": d_id, "job_id": job_id} for d_id, job_id in job_ids.items()]
     }
 
-@router.post("/devices/{device_id}/sync")
-def sync_device(
-    device_id: int, 
-    db: Session = Depends(get_db),
+@router.post("/devices/{device_id}/sync", status_code=202)
+async def sync_device(
+    device_id: int,
     current_user = Depends(require_permission(PERM_HR_WRITE))
 ):
-    service = ZkTecoService(db)
-    return service.sync_device(device_id)
+    """Queue a sync of one device; poll /hr/sync-jobs for the outcome"""
+    job_ids = await sync_scheduler.enqueue([device_id], "manual")
+    if device_id not in job_ids:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return {"status": "queued", "device_id": device_id, "job_id": job_ids[device_id]}
+
+@router.get("/sync-jobs")
+def get_sync_jobs(
+    device_id: int = Query(None),
+    job_id: List[int] = Query(None),
+    limit: int = Query(50),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user_obj)
+):
+    """Recent device sync runs (or the given job ids), newest first, and the background scheduler's state"""
+    limit = max(1, min(limit, 500))
+    query = db.query(hr_models.AttendanceSyncJob, hr_models.ZkDevice.name).join(
+        hr_models.ZkDevice, hr_models.AttendanceSyncJob.device_id == hr_models.ZkDevice.id
+    )
+    if device_id is not None:
+        query = query.filter(hr_models.AttendanceSyncJob.device_id == device_id)
+    if job_id:
+        query = query.filter(hr_models.AttendanceSyncJob.id.in_(job_id))
+    jobs = query.order_by(hr_models.AttendanceSyncJob.started_at.desc(), hr_models.AttendanceSyncJob.id.desc()).limit(limit).all()
+    return {
+        "scheduler": sync_scheduler.status(),
+        "jobs": [{
+            "id": job.id,
+            "device_id": job.device_id,
+            "device_name": device_name,
+            "trigger": job.trigger,
+            "status": job.status,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "duration_ms": job.duration_ms,
+            "logs_count": job.logs_count,
+            "message": job.message
+        } for job, device_name in jobs]
+    }
 
 # --- ATTENDANCE (Updated for new schema) ---
 
@@ -371,25 +403,20 @@ def get_attendance(
         hr_models.AttendanceLog,
         employee_models.Employee
     ).outerjoin(
-        employee_models.Employee, 
-        or_(
-            hr_models.AttendanceLog.employee_pk == employee_models.Employee.id,
-            hr_models.AttendanceLog.employee_id == employee_models.Employee.code
-        )
+        employee_models.Employee,
+        hr_models.AttendanceLog.employee_pk == employee_models.Employee.id
     )
 
-    if start_date:
-        query = query.filter(func.date(hr_models.AttendanceLog.timestamp) >= start_date)
-    if end_date:
-        query = query.filter(func.date(hr_models.AttendanceLog.timestamp) <= end_date)
+    query = query.filter(*_timestamp_range(
+        _parse_day(start_date, "start_date") if start_date else None,
+        _parse_day(end_date, "end_date") if end_date else None
+    ))
     if employee_id:
-        # Check both UUID and Code for flexibility
-        query = query.filter(
-            or_(
-                employee_models.Employee.id == employee_id,
-                employee_models.Employee.code == employee_id
-            )
-        )
+        # Accept either the employee UUID or their code
+        try:
+            query = query.filter(hr_models.AttendanceLog.employee_pk == uuid.UUID(employee_id))
+        except ValueError:
+            query = query.filter(employee_models.Employee.code == employee_id)
     if department:
         query = query.filter(employee_models.Employee.department_name == department)
 
@@ -412,247 +439,8 @@ def get_attendance(
 
     # Sort logs by employee and then timestamp
     raw_results.sort(key=lambda x: (x["employee_id"], x["timestamp"]))
-    
-    processed_sessions = []
-    
-    # Process each employee's logs
-    current_emp = None
-    emp_logs = []
-    
-    for log in raw_results:
-        if current_emp != log["employee_id"]:
-            if current_emp:
-                processed_sessions.extend(process_employee_sessions(current_emp, emp_logs, db))
-            current_emp = log["employee_id"]
-            emp_logs = [log]
-        else:
-            emp_logs.append(log)
-            
-    if current_emp:
-        processed_sessions.extend(process_employee_sessions(current_emp, emp_logs, db))
-
-    return processed_sessions
-
-def process_employee_sessions(emp_id, logs, db):
-    sessions = []
-    i = 0
-    while i < len(logs):
-        log = logs[i]
-        if log["type"] != "check_in":
-            i += 1
-            continue
-            
-        # Start a new session
-        start_log = log
-        end_log = None
-        session_logs = [log]
-        
-        # Look for the matching check_out or the next check_in
-        j = i + 1
-        while j < len(logs):
-            next_log = logs[j]
-            if next_log["type"] == "check_out":
-                end_log = next_log
-                session_logs.append(next_log)
-                i = j # Move pointer to this check_out
-                break
-            if next_log["type"] == "check_in":
-                # New session started without check_out
-                break
-            session_logs.append(next_log)
-            j += 1
-        
-        # Process the session
-        sessions.append(calculate_session_metrics(emp_id, session_logs, db))
-        i += 1
-        
-    return sessions
 
-def calculate_session_metrics(emp_id, session_logs, db):
-    first_in = session_logs[0]
-    last_out = next((l for l in reversed(session_logs) if l["type"] == "check_out"), None)
-    
-    emp_pk = first_in["employee_pk"]
-    emp_name = first_in["employee_name"]
-    check_in_dt = datetime.datetime.fromisoformat(first_in["timestamp"])
-    date_str = first_in["timestamp"][:10]
-    
-    # Fetch Shift Policy
-    try:
-        emp_pk = uuid.UUID(first_in["employee_pk"])
-        assignment = db.query(hr_models.EmployeeShiftAssignment).filter(
-            hr_models.EmployeeShiftAssignment.employee_id == emp_pk,
-            hr_models.EmployeeShiftAssignment.start_date <= check_in_dt,
-            or_(hr_models.EmployeeShiftAssignment.end_date == None, hr_models.EmployeeShiftAssignment.end_date >= check_in_dt)
-        ).order_by(hr_models.EmployeeShiftAssignment.start_date.desc()).first()
-    except (ValueError, TypeError):
-        assignment = None
-    shift = assignment.shift if assignment else None
-    
-    # Break Calculation
-    break_duration = 0
-    for k in range(len(session_logs) - 1):
-        if session_logs[k]["type"] in ["check_out", "break_out"] and session_logs[k+1]["type"] in ["check_in", "break_in"]:
-            t1 = datetime.datetime.fromisoformat(session_logs[k]["timestamp"])
-            t2 = datetime.datetime.fromisoformat(session_logs[k+1]["timestamp"])
-            diff = (t2 - t1).total_seconds() / 3600
-            if diff < 4: # Assume breaks are less than 4h, otherwise might be separate shifts
-                break_duration += diff
-                
-    total_hours = 0
-    if last_out:
-        check_out_dt = datetime.datetime.fromisoformat(last_out["timestamp"])
-        total_hours = round((check_out_dt - check_in_dt).total_seconds() / 3600, 2)
-        
-    capacity = shift.expected_hours if shift else 8.0
-    
-    # Handle Rotational Capacity (Advanced)
-    if shift and shift.shift_type == "rotational" and shift.rotation_pattern:
-        try:
-            seq = shift.rotation_pattern.get("sequence", [])
-            if seq and len(seq) > 0:
-                # Find which step this is based on start_date of assignment
-                assignment_start = assignment.start_date
-                days_since_start = (check_in_dt.date() - assignment_start.date()).days
-                step_index = days_since_start % len(seq)
-                current_step = seq[step_index]
-                
-                if isinstance(current_step, dict):
-                    capacity = current_step.get("hours", capacity)
-                elif str(current_step).upper() == "OFF":
-                    capacity = 0 # It's an OFF day, but if they worked, all is OT
-        except Exception as e:
-            print(f"Error calculating rotational capacity: {e}")
-
-    actual_work = max(0, total_hours - break_duration)
-    
-    # Multiplier Logic
-    day_name = check_in_dt.strftime('%A')
-    
-    # Check if holiday is paid based on 4/7 rule
-    is_holiday = False
-    distribute_bonus = getattr(shift, 'distribute_holiday_bonus', False)
-
-    if shift and not distribute_bonus and day_name in shift.holiday_days:
-        if shift.is_holiday_paid:
-            # Look back 7 days
-            seven_days_ago = check_in_dt.date() - datetime.timedelta(days=6)
-            recent_logs = db.query(hr_models.AttendanceLog).filter(
-                hr_models.AttendanceLog.employee_id == emp_id,
-                func.date(hr_models.AttendanceLog.timestamp) >= seven_days_ago,
-                func.date(hr_models.AttendanceLog.timestamp) < check_in_dt.date()
-            ).all()
-            work_days_count = len(set(log.timestamp.date() for log in recent_logs))
-            if work_days_count >= (shift.min_days_for_paid_holiday or 4):
-                is_holiday = True
-        else:
-            is_holiday = True
-
-    multiplier = (shift.multiplier_holiday if is_holiday else shift.multiplier_normal) if shift else 1.0
-    
-    # Distributed Holiday Credit
-    holiday_credit = 0
-    if distribute_bonus and shift.shift_type == "rotational" and actual_work > 0:
-        try:
-            seq = shift.rotation_pattern.get("sequence", [])
-            total_work_hours = sum(s.get("hours", 0) for s in seq if isinstance(s, dict))
-            if total_work_hours > 0:
-                # 1 holiday day = 8 hours credit
-                holiday_factor = 8.0 / total_work_hours
-                holiday_credit = round(actual_work * holiday_factor, 2)
-        except: pass
-
-    overtime = 0
-    ot_threshold = (shift.ot_threshold if shift else 30) / 60.0
-    if actual_work > (capacity + ot_threshold):
-        overtime = round((actual_work - capacity) * multiplier, 2)
-        
-    # Final pay hours (work + overtime + holiday_credit)
-    # We add holiday_credit to overtime for reporting or keep it separate
-    if holiday_credit > 0:
-        overtime = round(overtime + holiday_credit, 2)
-        
-    # Status calculation
-    status = "present"
-    
-    # Custom Logic for Rotational Step Timing
-    target_start_time = shift.start_time if shift else "08:00"
-    target_end_time = shift.end_time if shift else "17:00"
-    target_offset = getattr(shift, 'end_day_offset', 0)
-    
-    if shift and shift.shift_type == "rotational" and shift.rotation_pattern:
-        try:
-            seq = shift.rotation_pattern.get("sequence", [])
-            if seq and len(seq) > 0:
-                assignment_start = assignment.start_date
-                days_since_start = (check_in_dt.date() - assignment_start.date()).days
-                step_index = days_since_start % len(seq)
-                current_step = seq[step_index]
-                
-                if isinstance(current_step, dict):
-                    # Check for slot-based times
-                    slots = shift.rotation_pattern.get("slots", {})
-                    step_slots = current_step.get("slots", [])
-                    if step_slots and slots:
-                        # Use first slot for start, last for end
-                        first_slot = slots.get(step_slots[0], {})
-                        last_slot = slots.get(step_slots[-1], {})
-                        if "start" in first_slot: target_start_time = first_slot["start"]
-                        if "end" in last_slot: target_end_time = last_slot["end"]
-                    else:
-                        # Legacy/Direct dict fields
-                        if "start" in current_step: target_start_time = current_step["start"]
-                        if "end" in current_step: target_end_time = current_step["end"]
-                    
-                    if "offset" in current_step: target_offset = current_step["offset"]
-                elif str(current_step).upper() == "OFF":
-                    status = "overtime" # Working on OFF day
-        except: pass
-
-    if target_start_time:
-        shift_start_hour, shift_start_min = map(int, target_start_time.split(':'))
-        shift_in_dt = check_in_dt.replace(hour=shift_start_hour, minute=shift_start_min, second=0, microsecond=0)
-        
-        # Late check-in
-        if status != "overtime" and check_in_dt > shift_in_dt + datetime.timedelta(minutes=shift.grace_period_in or 0):
-            status = "late"
-            
-    if last_out and target_end_time:
-        check_out_dt = datetime.datetime.fromisoformat(last_out["timestamp"])
-        shift_out_hour, shift_out_min = map(int, target_end_time.split(':'))
-        
-        shift_out_dt = shift_in_dt.replace(hour=shift_out_hour, minute=shift_out_min, second=0, microsecond=0)
-        
-        if target_offset > 0:
-            shift_out_dt += datetime.timedelta(days=target_offset)
-        elif target_end_time < target_start_time:
-            shift_out_dt += datetime.timedelta(days=1)
-        
-        # Early leave
-        if status != "overtime" and check_out_dt < shift_out_dt - datetime.timedelta(minutes=shift.grace_period_out or 0):
-            if status == "present": 
-                status = "early_leave"
-            elif status == "late":
-                status = "late & early_leave"
-    elif not last_out:
-        status = "ongoing"
-            
-    return {
-        "employee_id": emp_id,
-        "employee_pk": emp_pk,
-        "employee_name": emp_name,
-        "check_in": first_in["timestamp"],
-        "check_out": last_out["timestamp"] if last_out else None,
-        "check_in_date": date_str,
-        "total_hours": total_hours,
-        "break_hours": round(break_duration, 2),
-        "actual_work": round(actual_work, 2),
-        "capacity": capacity,
-        "overtime": overtime,
-        "status": status,
-        "shift_name": shift.name if shift else "Standard",
-        "is_holiday": is_holiday
-    }
+    return AttendanceSessionEngine(db).build(raw_results)
 
 # --- SHIFT MANAGEMENT ---
 
@@ -722,7 +510,7 @@ def create_device(device: dict, db: Session = Depends(get_db), current_user = De
     db.add(db_device)
     db.commit()
     db.refresh(db_device)
-    return {"id": db_device.id, "name": db_device.name, "ip_address": db_device.ip_address, "port": db_device.port, "location": db_device.location, "status": "offline", "last_sync": None}
+    return {"id": db_device.id, "name": db_device.name, "ip_address": db_device.ip_address, "port": db_device.port, "location": db_device.location, "direction": db_device.direction, "status": "offline", "last_sync": None}
 
 @router.put("/devices/{device_id}")
 def update_device(device_id: int, device_data: dict, db: Session = Depends(get_db), current_user = Depends(require_permission(PERM_HR_WRITE))):
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List
 import uuid
-from core.database import get_db
+from core.database import get_async_db, run_db
 from schemas import schemas
 from crud import inventory_crud
 from core.auth import get_current_user, require_permission
@@ -17,40 +19,48 @@ logger = logging.getLogger(__name__)
 
 # --- Warehouses ---
 @router.post("/warehouses/", response_model=schemas.Warehouse)
-def create_warehouse(wh: schemas.WarehouseCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
+async def create_warehouse(wh: schemas.WarehouseCreate, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)):
     if user.role not in ['admin', 'manager']:
         raise HTTPException(status_code=403, detail="Not authorized")
     try:
         db_wh = core_models.Warehouse(**wh.dict())
         db.add(db_wh)
-        db.commit()
-        db.refresh(db_wh)
+        await db.commit()
+        await db.refresh(db_wh)
         return db_wh
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to create warehouse")
 
 @router.get("/warehouses/", response_model=List[schemas.Warehouse])
-def get_warehouses(db: Session = Depends(get_db), current_user=Depends(require_permission("view_inventory"))):
-    logger.error(f"DEBUG: get_warehouses called by {current_user.email}")
-    return db.query(core_models.Warehouse).filter(core_models.Warehouse.is_active.is_(True)).all()
+async def get_warehouses(db: AsyncSession = Depends(get_async_db), current_user=Depends(require_permission("view_inventory"))):
+    logger.debug(f"DEBUG: get_warehouses called by {current_user.id}")
+    result = await db.execute(select(core_models.Warehouse).filter(core_models.Warehouse.is_active.is_(True)))
+    return result.scalars().all()
 
 # --- Stock/Inventory ---
+def _warehouse_stock(db: Session, warehouse_id: uuid.UUID):
+    stock = db.query(core_models.Inventory).filter(core_models.Inventory.warehouse_id == warehouse_id).all()
+    # Enrich with article names for UI
+    for s in stock:
+        s.article_name = s.article.article_name
+    return stock
+
 @router.get("/stock/{warehouse_id}", response_model=List[schemas.Inventory])
-def get_warehouse_stock(warehouse_id: uuid.UUID, db: Session = Depends(get_db)):
+async def get_warehouse_stock(warehouse_id: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
     try:
-        stock = db.query(core_models.Inventory).filter(core_models.Inventory.warehouse_id == warehouse_id).all()
-        # Enrich with article names for UI
-        for s in stock:
-            s.article_name = s.article.article_name
-        return stock
+        return await run_db(db, _warehouse_stock, warehouse_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to retrieve warehouse stock")
 
 # --- Delivery Notes (Operations) ---
+def _create_note(db: Session, note: schemas.DeliveryNoteCreate, user_id: uuid.UUID) -> schemas.DeliveryNote:
+    db_note = inventory_crud.create_delivery_note(db, note, user_id)
+    return schemas.DeliveryNote.model_validate(db_note)
+
 @router.post("/delivery-notes", response_model=schemas.DeliveryNote)
-async def create_note(note: schemas.DeliveryNoteCreate, db: Session = Depends(get_db), user=Depends(get_current_user)):
-    db_note = inventory_crud.create_delivery_note(db, note, user.id)
+async def create_note(note: schemas.DeliveryNoteCreate, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)):
+    db_note = await run_db(db, _create_note, note, user.id)
     
     # Create notification
     await NotificationService.create_inventory_notification(
@@ -60,12 +70,12 @@ async def create_note(note: schemas.DeliveryNoteCreate, db: Session = Depends(ge
     return db_note
 
 @router.post("/delivery-notes/{id}/approve")
-async def approve_note(id: uuid.UUID, db: Session = Depends(get_db), user=Depends(get_current_user)):
+async def approve_note(id: uuid.UUID, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user)):
     # RBAC Check
     if user.role not in ['admin', 'warehouse_manager']:
         raise HTTPException(status_code=403, detail="Only Warehouse Managers can approve stock movements")
     
-    db_note = inventory_crud.approve_delivery_note(db, id, user.id)
+    db_note = await run_db(db, inventory_crud.approve_delivery_note, id, user.id)
     
     # Create notification
     await NotificationService.create_inventory_notification(
@@ -75,8 +85,8 @@ async def approve_note(id: uuid.UUID, db: Session = Depends(get_db), user=Depend
     return db_note
 
 @router.get("/stock-card/{article_id}")
-def get_article_history(article_id: uuid.UUID, warehouse_id: uuid.UUID = None, db: Session = Depends(get_db)):
+async def get_article_history(article_id: uuid.UUID, warehouse_id: uuid.UUID = None, db: AsyncSession = Depends(get_async_db)):
     try:
-        return inventory_crud.get_stock_card(db, article_id, warehouse_id)
+        return await run_db(db, inventory_crud.get_stock_card, article_id, warehouse_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail="Failed to retrieve stock card")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to retrieve stock card")
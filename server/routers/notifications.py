@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import uuid
 
-from core.database import get_db
+from core.database import get_async_db, run_db
 from schemas import schemas
 from core.auth import get_current_user
 from services.notification_service import NotificationService
@@ -13,7 +13,7 @@ router = APIRouter()
 @router.post("/", response_model=schemas.Notification)
 async def create_notification(
     notification: schemas.NotificationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """
@@ -23,10 +23,10 @@ async def create_notification(
     return await NotificationService.create_notification(db, notification)
 
 @router.get("/", response_model=List[schemas.Notification])
-def get_user_notifications(
+async def get_user_notifications(
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Get notifications for the current user"""
@@ -35,21 +35,21 @@ def get_user_notifications(
     if skip < 0:
         skip = 0
 
-    return NotificationService.get_user_notifications(db, current_user.id, skip, limit)
+    return await run_db(db, NotificationService.get_user_notifications, current_user.id, skip, limit)
 
 @router.get("/unread-count")
-def get_unread_notifications_count(
-    db: Session = Depends(get_db),
+async def get_unread_notifications_count(
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Get count of unread notifications for the current user"""
-    count = NotificationService.get_unread_count(db, current_user.id)
+    count = await run_db(db, NotificationService.get_unread_count, current_user.id)
     return {"unread_count": count}
 
 @router.put("/{notification_id}", response_model=schemas.Notification)
-def mark_notification_as_read(
+async def mark_notification_as_read(
     notification_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Mark a specific notification as read"""
@@ -58,24 +58,24 @@ def mark_notification_as_read(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid UUID format")
 
-    notification = NotificationService.mark_as_read(db, uuid_obj)
+    notification = await run_db(db, NotificationService.mark_as_read, uuid_obj)
     if notification is None:
         raise HTTPException(status_code=404, detail="Notification not found")
     return notification
 
 @router.post("/mark-all-read")
-def mark_all_notifications_read(
-    db: Session = Depends(get_db),
+async def mark_all_notifications_read(
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Mark all notifications as read for the current user"""
-    count = NotificationService.mark_all_read(db, current_user.id)
+    count = await run_db(db, NotificationService.mark_all_read, current_user.id)
     return {"message": f"Marked {count} notifications as read"}
 
 @router.delete("/{notification_id}")
-def delete_notification(
+async def delete_notification(
     notification_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Delete a notification"""
@@ -84,7 +84,7 @@ def delete_notification(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid UUID format")
 
-    success = NotificationService.delete_notification(db, uuid_obj)
+    success = await run_db(db, NotificationService.delete_notification, uuid_obj)
     if not success:
         raise HTTPException(status_code=404, detail="Notification not found")
     return {"message": "Notification deleted successfully"}
\ No newline at end of file
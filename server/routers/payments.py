@@ -2,10 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 import uuid
 from datetime import date
+from typing import Optional
 
 from core.database import get_db
 from models.core_models import FinancialTransaction, Contract
 from core.auth import get_current_user
+from crud import sequence_crud, balance_crud
 
 router = APIRouter()
 
@@ -41,13 +43,17 @@ def create_payment(
         if not payment_ref or len(payment_ref) < 3:
             # Generate professional reference: PAY-YYYY-NNNN
             import datetime
-            year = datetime.datetime.now().year
-            # Find next sequential number for this year
-            existing_payments = db.query(FinancialTransaction).filter(
-                FinancialTransaction.type == "Payment",
-                FinancialTransaction.reference.like(f"PAY-{year}-%")
-            ).all()
-            next_num = len(existing_payments) + 1
+            year = str(datetime.datetime.now().year)
+
+            def seed() -> int:
+                # First payment of the year: continue after references issued before the sequence existed
+                refs = db.query(FinancialTransaction.reference).filter(
+                    FinancialTransaction.type == "Payment",
+                    FinancialTransaction.reference.like(f"PAY-{year}-%")
+                ).all()
+                return sequence_crud.last_serial((r for (r,) in refs), f"PAY-{year}-")
+
+            next_num = sequence_crud.next_value(db, "PAY", year, seed)
             payment_ref = f"PAY-{year}-{next_num:04d}"
 
         # For import contracts: payment is credit (buyer pays, reduces amount owed)
@@ -89,63 +95,41 @@ def create_payment(
 @router.get("/contracts/{contract_id}/ledger")
 def get_contract_ledger(
     contract_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 100,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
-    Get all financial transactions for a contract (ledger view).
-    Returns both invoices and payments.
+    Financial transactions of a contract (ledger view), oldest first.
+    Returns invoices and payments with their running balance, one page at a
+    time: pass the previous response's next_cursor to continue. opening_balance
+    is the balance carried into the page; the accounting summary always
+    covers the whole contract.
     """
+    try:
+        contract_uuid = uuid.UUID(contract_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid contract ID format")
+    limit = max(1, min(limit, 500))
+
     try:
         # Validate contract exists
-        contract = db.query(Contract).filter(Contract.id == uuid.UUID(contract_id)).first()
+        contract = db.query(Contract).filter(Contract.id == contract_uuid).first()
         if not contract:
             raise HTTPException(status_code=404, detail="Contract not found")
-        
-        # Get all transactions for this contract
-        transactions = db.query(FinancialTransaction).filter(
-            FinancialTransaction.contract_id == uuid.UUID(contract_id)
-        ).order_by(FinancialTransaction.transaction_date, FinancialTransaction.created_at).all()
-
-        # Calculate accounting summaries
-        total_debit = sum(t.amount for t in transactions if not t.is_credit)
-        total_credit = sum(t.amount for t in transactions if t.is_credit)
-        outstanding_balance = total_debit - total_credit
-
-        # Calculate running balance (starting from 0)
-        balance = 0
-        ledger = []
-
-        for transaction in transactions:
-            if transaction.is_credit:
-                balance -= transaction.amount  # Credits reduce balance
-            else:
-                balance += transaction.amount  # Debits increase balance
-
-            ledger.append({
-                "id": str(transaction.id),
-                "transaction_date": transaction.transaction_date.isoformat(),
-                "type": transaction.type,
-                "description": transaction.description,
-                "reference": transaction.reference,
-                "amount": float(transaction.amount),
-                "is_credit": transaction.is_credit,
-                "running_balance": float(balance)
-            })
 
+        page = balance_crud.get_ledger_page(db, contract_uuid, cursor, limit)
         return {
             "contract_id": contract_id,
             "contract_no": contract.contract_no,
-            "ledger": ledger,
-            "accounting_summary": {
-                "total_debit": float(total_debit),
-                "total_credit": float(total_credit),
-                "outstanding_balance": float(outstanding_balance)
-            },
-            "current_balance": float(balance)
+            **page,
+            "current_balance": page["accounting_summary"]["outstanding_balance"]
         }
-        
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid contract ID format")
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to retrieve ledger: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve ledger: {str(e)}")
@@ -0,0 +1,103 @@
+import datetime
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from models import hr_models
+
+# Punch directions a device can be configured with; anything else is "unknown"
+DIRECTIONS = ("check_in", "check_out")
+
+# Minute of the day after which a check-in is late / before which a check-out
+# is early, for employees without a fixed shift (09:15 and 16:00)
+DEFAULT_LATE_AFTER = 9 * 60 + 15
+DEFAULT_EARLY_BEFORE = 16 * 60
+
+def _minute_of_day(value: Optional[str]) -> Optional[int]:
+    """"HH:mm" -> minutes since midnight; None if missing or malformed"""
+    try:
+        hour, minute = map(int, value.split(":")[:2])
+        return hour * 60 + minute
+    except (AttributeError, ValueError):
+        return None
+
+def shift_thresholds(shift) -> Optional[Tuple[int, int]]:
+    """
+    (late_after, early_before) minutes of the day for a fixed shift: its start
+    plus the check-in grace period and its end minus the check-out grace.
+    Rotational shifts have no fixed times and use the defaults.
+    """
+    if shift.shift_type == "rotational":
+        return None
+    start, end = _minute_of_day(shift.start_time), _minute_of_day(shift.end_time)
+    if start is None or end is None:
+        return None
+    return start + (shift.grace_period_in or 0), end - (shift.grace_period_out or 0)
+
+class AttendanceRules:
+    """
+    Compiled punch classification for one device sync.
+
+    Built once per sync from the database: the device's configured direction
+    and the late/early-leave thresholds of every fixed shift. Employees' shift
+    assignments are loaded as batches of punches arrive, then each punch is
+    classified with a lookup and two integer comparisons.
+    """
+
+    def __init__(self, direction: Optional[str], thresholds: Dict[int, Tuple[int, int]]):
+        self.direction = direction if direction in DIRECTIONS else "unknown"
+        self._thresholds = thresholds
+        # employee PK -> (assignment start dates, [(end date, shift id)]), sorted by start
+        self._assignments: Dict[object, Tuple[List[datetime.datetime], List[Tuple[Optional[datetime.datetime], int]]]] = {}
+
+    @classmethod
+    def load(cls, db: Session, device) -> "AttendanceRules":
+        shifts = db.query(hr_models.WorkShift).all()
+        thresholds = {shift.id: t for shift in shifts if (t := shift_thresholds(shift)) is not None}
+        return cls(device.direction, thresholds)
+
+    def load_assignments(self, db: Session, employee_pks: Iterable):
+        """Fetch shift assignments of employees not seen earlier in this sync, in one query"""
+        pks = {pk for pk in employee_pks if pk is not None and pk not in self._assignments}
+        if not pks or not self._thresholds:
+            return
+        Assignment = hr_models.EmployeeShiftAssignment
+        rows = db.query(Assignment.employee_id, Assignment.start_date, Assignment.end_date, Assignment.shift_id).filter(
+            Assignment.employee_id.in_(pks)
+        ).order_by(Assignment.employee_id, Assignment.start_date).all()
+        for pk in pks:
+            self._assignments[pk] = ([], [])
+        for pk, start, end, shift_id in rows:
+            starts, rest = self._assignments[pk]
+            starts.append(start)
+            rest.append((end, shift_id))
+
+    def _thresholds_at(self, employee_pk, moment: datetime.datetime) -> Tuple[int, int]:
+        assigned = self._assignments.get(employee_pk)
+        if assigned:
+            starts, rest = assigned
+            # Latest assignment that started by `moment` and hasn't ended
+            for i in range(bisect_right(starts, moment) - 1, -1, -1):
+                end, shift_id = rest[i]
+                if end is None or end >= moment:
+                    if shift_id in self._thresholds:
+                        return self._thresholds[shift_id]
+                    break
+        return DEFAULT_LATE_AFTER, DEFAULT_EARLY_BEFORE
+
+    def classify(self, rows: List[dict]):
+        """Set "type" and "status" on attendance log rows (keys user_id, timestamp) in place"""
+        direction = self.direction
+        if direction not in DIRECTIONS:
+            for row in rows:
+                row["type"], row["status"] = direction, "present"
+            return
+        late = direction == "check_in"
+        for row in rows:
+            timestamp = row["timestamp"]
+            minute = timestamp.hour * 60 + timestamp.minute
+            late_after, early_before = self._thresholds_at(row["user_id"], timestamp)
+            if late:
+                status = "late" if minute > late_after else "present"
+            else:
+                status = "early_leave" if minute < early_before else "present"
+            row["type"], row["status"] = direction, status
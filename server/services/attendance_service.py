@@ -0,0 +1,324 @@
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import or_
+from typing import Dict, List, Optional, Set, Tuple
+import datetime
+import logging
+import uuid
+
+from models import hr_models
+
+logger = logging.getLogger(__name__)
+
+# What a malformed rotation_pattern (wrong JSON shapes or values) raises when read
+_PATTERN_ERRORS = (AttributeError, TypeError, ValueError, KeyError, IndexError)
+
+def split_sessions(logs: List[dict]) -> List[List[dict]]:
+    """
+    Cut one employee's logs (sorted by timestamp) into sessions: each starts at
+    a check_in and runs to the next check_out, or up to the next check_in.
+    """
+    sessions = []
+    i = 0
+    while i < len(logs):
+        log = logs[i]
+        if log["type"] != "check_in":
+            i += 1
+            continue
+
+        # Start a new session
+        session_logs = [log]
+
+        # Look for the matching check_out or the next check_in
+        j = i + 1
+        while j < len(logs):
+            next_log = logs[j]
+            if next_log["type"] == "check_out":
+                session_logs.append(next_log)
+                i = j # Move pointer to this check_out
+                break
+            if next_log["type"] == "check_in":
+                # New session started without check_out
+                break
+            session_logs.append(next_log)
+            j += 1
+
+        sessions.append(session_logs)
+        i += 1
+
+    return sessions
+
+def _employee_pk(session_logs: List[dict]) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(session_logs[0]["employee_pk"])
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+def _check_in(session_logs: List[dict]) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(session_logs[0]["timestamp"])
+
+class AttendanceSessionEngine:
+    """
+    Turns attendance logs into work sessions with hours, overtime and status.
+
+    Everything a session needs from the database is loaded up front for the
+    whole batch: the shift assignments (with their shifts) overlapping the
+    period, and for paid-holiday checks the days each employee worked in the
+    preceding week. The metrics themselves are computed in memory, so the
+    number of queries doesn't grow with the number of sessions.
+    """
+
+    # Days before a holiday that count towards the paid-holiday rule
+    LOOKBACK_DAYS = 6
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._assignments: Dict[uuid.UUID, List[hr_models.EmployeeShiftAssignment]] = {}
+        self._work_days: Dict[str, Set[datetime.date]] = {}
+
+    def build(self, logs: List[dict]) -> List[dict]:
+        """Sessions of `logs`, which must be sorted by (employee_id, timestamp)"""
+        sessions: List[Tuple[str, List[dict]]] = []
+        current_emp = None
+        emp_logs: List[dict] = []
+        for log in logs:
+            if current_emp != log["employee_id"]:
+                if current_emp:
+                    sessions.extend((current_emp, s) for s in split_sessions(emp_logs))
+                current_emp = log["employee_id"]
+                emp_logs = [log]
+            else:
+                emp_logs.append(log)
+        if current_emp:
+            sessions.extend((current_emp, s) for s in split_sessions(emp_logs))
+
+        self._load_assignments(sessions)
+        assignments = [self._assignment_at(_employee_pk(s), _check_in(s)) for _, s in sessions]
+        self._load_work_days([
+            (emp_id, _check_in(s).date())
+            for (emp_id, s), assignment in zip(sessions, assignments)
+            if assignment is not None and self._needs_lookback(assignment.shift, _check_in(s))
+        ])
+
+        return [
+            self._session_metrics(emp_id, session_logs, assignment)
+            for (emp_id, session_logs), assignment in zip(sessions, assignments)
+        ]
+
+    def _load_assignments(self, sessions: List[Tuple[str, List[dict]]]):
+        """All assignments of the batch's employees that overlap its check-in range, in one query"""
+        pks = {pk for pk in (_employee_pk(s) for _, s in sessions) if pk is not None}
+        if not pks:
+            return
+        check_ins = [_check_in(s) for _, s in sessions]
+        Assignment = hr_models.EmployeeShiftAssignment
+        rows = self.db.query(Assignment).options(joinedload(Assignment.shift)).filter(
+            Assignment.employee_id.in_(pks),
+            Assignment.start_date <= max(check_ins),
+            or_(Assignment.end_date == None, Assignment.end_date >= min(check_ins))
+        ).order_by(Assignment.start_date.desc()).all()
+        for row in rows:
+            self._assignments.setdefault(row.employee_id, []).append(row)
+
+    def _assignment_at(self, emp_pk: Optional[uuid.UUID], moment: datetime.datetime):
+        """Latest assignment of the employee in effect at `moment`"""
+        for assignment in self._assignments.get(emp_pk, ()):
+            if assignment.start_date <= moment and (assignment.end_date is None or assignment.end_date >= moment):
+                return assignment
+        return None
+
+    @staticmethod
+    def _needs_lookback(shift, check_in_dt: datetime.datetime) -> bool:
+        return bool(
+            shift and not getattr(shift, 'distribute_holiday_bonus', False)
+            and check_in_dt.strftime('%A') in shift.holiday_days and shift.is_holiday_paid
+        )
+
+    def _load_work_days(self, holidays: List[Tuple[str, datetime.date]]):
+        """Dates with any log in the week before each (employee_id, holiday), in one query"""
+        if not holidays:
+            return
+        emp_ids = {emp_id for emp_id, _ in holidays}
+        days = [day for _, day in holidays]
+        start = datetime.datetime.combine(min(days) - datetime.timedelta(days=self.LOOKBACK_DAYS), datetime.time.min)
+        end = datetime.datetime.combine(max(days), datetime.time.min)
+        rows = self.db.query(hr_models.AttendanceLog.employee_id, hr_models.AttendanceLog.timestamp).filter(
+            hr_models.AttendanceLog.employee_id.in_(emp_ids),
+            hr_models.AttendanceLog.timestamp >= start,
+            hr_models.AttendanceLog.timestamp < end
+        ).all()
+        for emp_id, timestamp in rows:
+            self._work_days.setdefault(emp_id, set()).add(timestamp.date())
+
+    def _recent_work_days(self, emp_id: str, day: datetime.date) -> int:
+        """Distinct days with logs in [day - LOOKBACK_DAYS, day)"""
+        start = day - datetime.timedelta(days=self.LOOKBACK_DAYS)
+        return sum(1 for d in self._work_days.get(emp_id, ()) if start <= d < day)
+
+    def _session_metrics(self, emp_id, session_logs, assignment):
+        first_in = session_logs[0]
+        last_out = next((l for l in reversed(session_logs) if l["type"] == "check_out"), None)
+
+        emp_pk = _employee_pk(session_logs)
+        if emp_pk is None:
+            emp_pk = first_in["employee_pk"]
+        emp_name = first_in["employee_name"]
+        check_in_dt = datetime.datetime.fromisoformat(first_in["timestamp"])
+        date_str = first_in["timestamp"][:10]
+
+        shift = assignment.shift if assignment else None
+
+        # Break Calculation
+        break_duration = 0
+        for k in range(len(session_logs) - 1):
+            if session_logs[k]["type"] in ["check_out", "break_out"] and session_logs[k+1]["type"] in ["check_in", "break_in"]:
+                t1 = datetime.datetime.fromisoformat(session_logs[k]["timestamp"])
+                t2 = datetime.datetime.fromisoformat(session_logs[k+1]["timestamp"])
+                diff = (t2 - t1).total_seconds() / 3600
+                if diff < 4: # Assume breaks are less than 4h, otherwise might be separate shifts
+                    break_duration += diff
+
+        total_hours = 0
+        if last_out:
+            check_out_dt = datetime.datetime.fromisoformat(last_out["timestamp"])
+            total_hours = round((check_out_dt - check_in_dt).total_seconds() / 3600, 2)
+
+        capacity = shift.expected_hours if shift else 8.0
+
+        # Handle Rotational Capacity (Advanced)
+        if shift and shift.shift_type == "rotational" and shift.rotation_pattern:
+            try:
+                seq = shift.rotation_pattern.get("sequence", [])
+                if seq and len(seq) > 0:
+                    # Find which step this is based on start_date of assignment
+                    assignment_start = assignment.start_date
+                    days_since_start = (check_in_dt.date() - assignment_start.date()).days
+                    step_index = days_since_start % len(seq)
+                    current_step = seq[step_index]
+
+                    if isinstance(current_step, dict):
+                        capacity = current_step.get("hours", capacity)
+                    elif str(current_step).upper() == "OFF":
+                        capacity = 0 # It's an OFF day, but if they worked, all is OT
+            except _PATTERN_ERRORS:
+                logger.warning(f"Invalid rotation pattern on shift {shift.id}; using default capacity", exc_info=True)
+
+        actual_work = max(0, total_hours - break_duration)
+
+        # Check if holiday is paid based on 4/7 rule
+        is_holiday = False
+        distribute_bonus = getattr(shift, 'distribute_holiday_bonus', False)
+
+        if shift and not distribute_bonus and check_in_dt.strftime('%A') in shift.holiday_days:
+            if shift.is_holiday_paid:
+                # Look back 7 days
+                if self._recent_work_days(emp_id, check_in_dt.date()) >= (shift.min_days_for_paid_holiday or 4):
+                    is_holiday = True
+            else:
+                is_holiday = True
+
+        multiplier = (shift.multiplier_holiday if is_holiday else shift.multiplier_normal) if shift else 1.0
+
+        # Distributed Holiday Credit
+        holiday_credit = 0
+        if distribute_bonus and shift.shift_type == "rotational" and actual_work > 0:
+            try:
+                seq = shift.rotation_pattern.get("sequence", [])
+                total_work_hours = sum(s.get("hours", 0) for s in seq if isinstance(s, dict))
+                if total_work_hours > 0:
+                    # 1 holiday day = 8 hours credit
+                    holiday_factor = 8.0 / total_work_hours
+                    holiday_credit = round(actual_work * holiday_factor, 2)
+            except _PATTERN_ERRORS:
+                logger.warning(f"Invalid rotation pattern on shift {shift.id}; no holiday credit", exc_info=True)
+
+        overtime = 0
+        ot_threshold = (shift.ot_threshold if shift else 30) / 60.0
+        if actual_work > (capacity + ot_threshold):
+            overtime = round((actual_work - capacity) * multiplier, 2)
+
+        # Final pay hours (work + overtime + holiday_credit)
+        if holiday_credit > 0:
+            overtime = round(overtime + holiday_credit, 2)
+
+        # Status calculation
+        status = "present"
+
+        # Custom Logic for Rotational Step Timing
+        target_start_time = shift.start_time if shift else "08:00"
+        target_end_time = shift.end_time if shift else "17:00"
+        target_offset = getattr(shift, 'end_day_offset', 0)
+
+        if shift and shift.shift_type == "rotational" and shift.rotation_pattern:
+            try:
+                seq = shift.rotation_pattern.get("sequence", [])
+                if seq and len(seq) > 0:
+                    assignment_start = assignment.start_date
+                    days_since_start = (check_in_dt.date() - assignment_start.date()).days
+                    step_index = days_since_start % len(seq)
+                    current_step = seq[step_index]
+
+                    if isinstance(current_step, dict):
+                        # Check for slot-based times
+                        slots = shift.rotation_pattern.get("slots", {})
+                        step_slots = current_step.get("slots", [])
+                        if step_slots and slots:
+                            # Use first slot for start, last for end
+                            first_slot = slots.get(step_slots[0], {})
+                            last_slot = slots.get(step_slots[-1], {})
+                            if "start" in first_slot: target_start_time = first_slot["start"]
+                            if "end" in last_slot: target_end_time = last_slot["end"]
+                        else:
+                            # Legacy/Direct dict fields
+                            if "start" in current_step: target_start_time = current_step["start"]
+                            if "end" in current_step: target_end_time = current_step["end"]
+
+                        if "offset" in current_step: target_offset = current_step["offset"]
+                    elif str(current_step).upper() == "OFF":
+                        status = "overtime" # Working on OFF day
+            except _PATTERN_ERRORS:
+                logger.warning(f"Invalid rotation pattern on shift {shift.id}; using shift times", exc_info=True)
+
+        if target_start_time:
+            shift_start_hour, shift_start_min = map(int, target_start_time.split(':'))
+            shift_in_dt = check_in_dt.replace(hour=shift_start_hour, minute=shift_start_min, second=0, microsecond=0)
+
+            # Late check-in
+            if status != "overtime" and check_in_dt > shift_in_dt + datetime.timedelta(minutes=getattr(shift, 'grace_period_in', 0) or 0):
+                status = "late"
+
+        if last_out and target_end_time:
+            check_out_dt = datetime.datetime.fromisoformat(last_out["timestamp"])
+            shift_out_hour, shift_out_min = map(int, target_end_time.split(':'))
+
+            shift_out_dt = shift_in_dt.replace(hour=shift_out_hour, minute=shift_out_min, second=0, microsecond=0)
+
+            if target_offset > 0:
+                shift_out_dt += datetime.timedelta(days=target_offset)
+            elif target_end_time < target_start_time:
+                shift_out_dt += datetime.timedelta(days=1)
+
+            # Early leave
+            if status != "overtime" and check_out_dt < shift_out_dt - datetime.timedelta(minutes=getattr(shift, 'grace_period_out', 0) or 0):
+                if status == "present":
+                    status = "early_leave"
+                elif status == "late":
+                    status = "late & early_leave"
+        elif not last_out:
+            status = "ongoing"
+
+        return {
+            "employee_id": emp_id,
+            "employee_pk": emp_pk,
+            "employee_name": emp_name,
+            "check_in": first_in["timestamp"],
+            "check_out": last_out["timestamp"] if last_out else None,
+            "check_in_date": date_str,
+            "total_hours": total_hours,
+            "break_hours": round(break_duration, 2),
+            "actual_work": round(actual_work, 2),
+            "capacity": capacity,
+            "overtime": overtime,
+            "status": status,
+            "shift_name": shift.name if shift else "Standard",
+            "is_holiday": is_holiday
+        }
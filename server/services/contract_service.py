@@ -2,58 +2,81 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from typing import List, Optional, Dict, Any
-from sqlalchemy import func
+from sqlalchemy import func, and_
 from datetime import datetime as dt
 import uuid
 import logging
 
-from crud import crud, inventory_crud
+from crud import crud, inventory_crud, balance_crud
 from schemas import schemas
 from models import core_models
-from ws_manager import manager
+from core.database import run_db
+from ws_manager import contract_events
 from services.notification_service import NotificationService
 
 logger = logging.getLogger(__name__)
 
 class ContractService:
     @staticmethod
-    async def create_contract(db: Session, contract_data: schemas.ContractCreate, user_id: uuid.UUID) -> core_models.Contract:
+    def _reserved_lines(warehouse_id, items, sign: float = 1) -> Dict[tuple, float]:
+        """Quantity each item line holds in reservation, summed per (warehouse, article)"""
+        lines: Dict[tuple, float] = {}
+        if not warehouse_id:
+            return lines
+        for item in items:
+            key = (warehouse_id, item.article_id)
+            lines[key] = lines.get(key, 0) + sign * float(item.quantity or 0)
+        return lines
+
+    @staticmethod
+    def _create_contract_tx(db: Session, contract_data: schemas.ContractCreate, user_id: uuid.UUID):
+        """DB work for create_contract: header, items, invoice and stock reservation"""
+        new_contract = crud.create_contract(db=db, contract=contract_data, user_id=user_id)
+
+        # --- Accounting Logic: Create Invoice when contract is posted/confirmed ---
+        if new_contract.status in ["posted", "confirmed"]:
+            # Calculate contract total value
+            contract_total = sum(item.total for item in new_contract.items)
+
+            if contract_total > 0:
+                # For import contracts: invoice is debit (buyer owes money)
+                # For export contracts: invoice is credit (seller is owed money)
+                is_credit = new_contract.direction == "export"
+                invoice_ref = f"INV-{new_contract.contract_no}-{uuid.uuid4().hex[:4].upper()}"
+                invoice = core_models.FinancialTransaction(
+                    contract_id=new_contract.id,
+                    transaction_date=new_contract.issue_date or func.current_date(),
+                    type="Invoice",
+                    description=f"Invoice for contract {new_contract.contract_no}",
+                    reference=invoice_ref,
+                    amount=contract_total,
+                    is_credit=is_credit
+                )
+                db.add(invoice)
+
+        # --- Inventory Reservation Logic ---
+        reserved = False
+        if new_contract.status in ["posted", "confirmed"] and new_contract.warehouse_id:
+            inventory_crud.adjust_reservations(
+                db, ContractService._reserved_lines(new_contract.warehouse_id, new_contract.items)
+            )
+            reserved = True
+
+        db.commit()
+        return crud.get_contract_by_id(db, new_contract.id, refresh=True), reserved
+
+    @staticmethod
+    async def create_contract(db, contract_data: schemas.ContractCreate, user_id: uuid.UUID) -> core_models.Contract:
         try:
-            new_contract = crud.create_contract(db=db, contract=contract_data, user_id=user_id)
-            await manager.broadcast("CONTRACT_CREATED")
+            new_contract, reserved = await run_db(db, ContractService._create_contract_tx, contract_data, user_id)
+            await contract_events.add("created", new_contract.id)
 
             # Create notification for contract creation
             await NotificationService.create_contract_notification(
                 db, user_id, new_contract.id, "contract_created", new_contract.contract_no
             )
 
-            # --- Accounting Logic: Create Invoice when contract is posted/confirmed ---
-            if new_contract.status in ["posted", "confirmed"]:
-                # Calculate contract total value
-                contract_total = sum(item.total for item in new_contract.items)
-
-                if contract_total > 0:
-                    # For import contracts: invoice is debit (buyer owes money)
-                    # For export contracts: invoice is credit (seller is owed money)
-                    is_credit = new_contract.direction == "export"
-                    invoice_ref = f"INV-{new_contract.contract_no}-{uuid.uuid4().hex[:4].upper()}"
-                    invoice = core_models.FinancialTransaction(
-                        contract_id=new_contract.id,
-                        transaction_date=new_contract.issue_date or func.current_date(),
-                        type="Invoice",
-                        description=f"Invoice for contract {new_contract.contract_no}",
-                        reference=invoice_ref,
-                        amount=contract_total,
-                        is_credit=is_credit
-                    )
-                    db.add(invoice)
-
-            # --- Inventory Reservation Logic ---
-            if new_contract.status in ["posted", "confirmed"] and new_contract.warehouse_id:
-                for item in new_contract.items:
-                    inventory_crud.reserve_stock(
-                        db, item.article_id, new_contract.warehouse_id, item.quantity
-                    )
+            if reserved:
                 # Create notification for stock reservation
                 await NotificationService.create_contract_notification(
                     db, user_id, new_contract.id, "stock_reserved", new_contract.contract_no
@@ -65,11 +88,15 @@ class ContractService:
             raise e
 
     @staticmethod
-    async def update_contract(db: Session, contract_id: uuid.UUID, contract_data: schemas.ContractCreate, user_id: uuid.UUID) -> core_models.Contract:
+    def _update_contract_tx(db: Session, contract_id: uuid.UUID, contract_data: schemas.ContractCreate, user_id: uuid.UUID):
+        """
+        DB work for update_contract. Returns (contract, released, reserved);
+        the flags say whether any reserved quantity actually went down or up.
+        """
         # Get current contract to check permissions for draft reversion
         current_contract = crud.get_contract_by_id(db, contract_id)
         if not current_contract:
-            return None
+            return None, False, False
 
         # Check permission for draft reversion: only contract creator can revert to draft
         if (contract_data.status and
@@ -84,59 +111,74 @@ class ContractService:
         # Store old state for inventory logic
         old_status = current_contract.status
         old_warehouse_id = current_contract.warehouse_id
-        old_items = [(item.article_id, item.quantity) for item in current_contract.items]
+        old_lines = {}
+        if old_status in ["posted", "confirmed"]:
+            old_lines = ContractService._reserved_lines(old_warehouse_id, current_contract.items)
 
         updated_contract = crud.update_contract(db=db, contract_id=contract_id, contract=contract_data)
+        if not updated_contract:
+            return None, False, False
+
+        # --- Accounting Logic: Create Invoice when status changes to posted/confirmed ---
+        if (updated_contract.status in ["posted", "confirmed"] and
+            old_status not in ["posted", "confirmed"]):
+            # Calculate contract total value
+            contract_total = sum(item.total for item in updated_contract.items)
+
+            if contract_total > 0:
+                # Check if invoice already exists
+                existing_invoice = db.query(core_models.FinancialTransaction).filter(
+                    core_models.FinancialTransaction.contract_id == contract_id,
+                    core_models.FinancialTransaction.type == "Invoice"
+                ).first()
+
+                if not existing_invoice:
+                    # Create invoice transaction (debit - increases amount owed)
+                    invoice_ref = f"INV-{updated_contract.contract_no}-{uuid.uuid4().hex[:4].upper()}"
+                    invoice = core_models.FinancialTransaction(
+                        contract_id=updated_contract.id,
+                        transaction_date=updated_contract.issue_date or func.current_date(),
+                        type="Invoice",
+                        description=f"Invoice for contract {updated_contract.contract_no}",
+                        reference=invoice_ref,
+                        amount=contract_total,
+                        is_credit=False  # Debit - increases balance owed
+                    )
+                    db.add(invoice)
+
+        # --- Inventory Reservation Logic ---
+        # Apply only the net change between the old and new reservation, so
+        # edits that don't touch article, quantity or warehouse cost nothing
+        new_lines = {}
+        if updated_contract.status in ["posted", "confirmed"]:
+            new_lines = ContractService._reserved_lines(updated_contract.warehouse_id, updated_contract.items)
+        deltas = inventory_crud.diff_reservations(old_lines, new_lines)
+        inventory_crud.adjust_reservations(db, deltas)
+        released = any(qty < 0 for qty in deltas.values())
+        reserved = any(qty > 0 for qty in deltas.values())
+
+        db.commit()
+        return crud.get_contract_by_id(db, contract_id, refresh=True), released, reserved
+
+    @staticmethod
+    async def update_contract(db, contract_id: uuid.UUID, contract_data: schemas.ContractCreate, user_id: uuid.UUID) -> core_models.Contract:
+        updated_contract, released, reserved = await run_db(
+            db, ContractService._update_contract_tx, contract_id, contract_data, user_id
+        )
         if updated_contract:
-            await manager.broadcast("CONTRACT_UPDATED")
+            await contract_events.add("updated", contract_id)
             # Create notification for contract update
             await NotificationService.create_contract_notification(
                 db, user_id, contract_id, "contract_updated", updated_contract.contract_no
             )
 
-            # --- Accounting Logic: Create Invoice when status changes to posted/confirmed ---
-            if (updated_contract.status in ["posted", "confirmed"] and
-                old_status not in ["posted", "confirmed"]):
-                # Calculate contract total value
-                contract_total = sum(item.total for item in updated_contract.items)
-
-                if contract_total > 0:
-                    # Check if invoice already exists
-                    existing_invoice = db.query(core_models.FinancialTransaction).filter(
-                        core_models.FinancialTransaction.contract_id == contract_id,
-                        core_models.FinancialTransaction.type == "Invoice"
-                    ).first()
-
-                    if not existing_invoice:
-                        # Create invoice transaction (debit - increases amount owed)
-                        invoice_ref = f"INV-{updated_contract.contract_no}-{uuid.uuid4().hex[:4].upper()}"
-                        invoice = core_models.FinancialTransaction(
-                            contract_id=updated_contract.id,
-                            transaction_date=updated_contract.issue_date or func.current_date(),
-                            type="Invoice",
-                            description=f"Invoice for contract {updated_contract.contract_no}",
-                            reference=invoice_ref,
-                            amount=contract_total,
-                            is_credit=False  # Debit - increases balance owed
-                        )
-                        db.add(invoice)
-
-            # --- Inventory Reservation Logic ---
-            # 1. Release old reservation if it was active
-            if old_status in ["posted", "confirmed"] and old_warehouse_id:
-                for art_id, qty in old_items:
-                    inventory_crud.release_stock(db, art_id, old_warehouse_id, qty)
+            if released:
                 # Notification for stock release
                 await NotificationService.create_contract_notification(
                     db, user_id, contract_id, "stock_released", updated_contract.contract_no
                 )
 
-            # 2. Add new reservation if new status is active
-            if updated_contract.status in ["posted", "confirmed"] and updated_contract.warehouse_id:
-                for item in updated_contract.items:
-                    inventory_crud.reserve_stock(
-                        db, item.article_id, updated_contract.warehouse_id, item.quantity
-                    )
+            if reserved:
                 # Notification for stock reservation
                 await NotificationService.create_contract_notification(
                     db, user_id, contract_id, "stock_reserved", updated_contract.contract_no
@@ -145,7 +187,7 @@ class ContractService:
         return updated_contract
 
     @staticmethod
-    async def delete_contract(db: Session, contract_id: uuid.UUID, user_id: uuid.UUID):
+    def _delete_contract_tx(db: Session, contract_id: uuid.UUID):
         # Get contract for inventory release
         contract = crud.get_contract_by_id(db, contract_id)
         if not contract:
@@ -153,12 +195,17 @@ class ContractService:
 
         # Release stock if it was reserved
         if contract.status in ["posted", "confirmed"] and contract.warehouse_id:
-            for item in contract.items:
-                inventory_crud.release_stock(db, item.article_id, contract.warehouse_id, item.quantity)
+            inventory_crud.adjust_reservations(
+                db, ContractService._reserved_lines(contract.warehouse_id, contract.items, sign=-1)
+            )
+
+        return crud.delete_contract(db=db, contract_id=contract_id)
 
-        result = crud.delete_contract(db=db, contract_id=contract_id)
+    @staticmethod
+    async def delete_contract(db, contract_id: uuid.UUID, user_id: uuid.UUID):
+        result = await run_db(db, ContractService._delete_contract_tx, contract_id)
         if result:
-            await manager.broadcast("CONTRACT_DELETED")
+            await contract_events.add("deleted", contract_id)
             # Create notification for contract deletion
             await NotificationService.create_contract_notification(
                 db, user_id, contract_id, "contract_deleted"
@@ -166,10 +213,21 @@ class ContractService:
         return result
 
     @staticmethod
-    def get_contracts(db: Session, skip: int = 0, limit: int = 50, current_user_id: uuid.UUID = None):
-        """Get paginated contracts with total count and view information"""
+    def get_contracts(db: Session, skip: int = 0, limit: int = 50, current_user_id: uuid.UUID = None, cursor: str = None):
+        """
+        Get paginated contracts with total count and view information.
+        With `cursor` (the `next_cursor` of a previous page) the page is read by
+        keyset instead of OFFSET; skip is ignored then.
+        """
         try:
-            contracts, total_count = crud.get_contracts(db, skip=skip, limit=limit)
+            if cursor:
+                contracts, next_cursor, page = crud.get_contracts_after(db, cursor, limit)
+                total_count = crud.get_contract_count(db)
+            else:
+                contracts, total_count = crud.get_contracts(db, skip=skip, limit=limit)
+                page = (skip // limit) + 1
+                has_more = skip + len(contracts) < total_count
+                next_cursor = crud.encode_contract_cursor(contracts[-1], page + 1) if contracts and has_more else None
 
             # Add view information to each contract (simplified to avoid errors)
             for contract in contracts:
@@ -180,9 +238,10 @@ class ContractService:
             # Add pagination metadata
             pagination_info = {
                 'total': total_count,
-                'page': (skip // limit) + 1,
+                'page': page,
                 'per_page': limit,
-                'pages': (total_count + limit - 1) // limit  # Ceiling division
+                'pages': (total_count + limit - 1) // limit,  # Ceiling division
+                'next_cursor': next_cursor
             }
 
             return {
@@ -193,6 +252,22 @@ class ContractService:
             logger.error(f"Error in get_contracts: {e}")
             raise e
 
+    @staticmethod
+    def get_contract_summaries(db: Session, skip: int = 0, limit: int = 50, cursor: str = None):
+        """Contracts grid page as plain dicts, with the same pagination metadata as get_contracts"""
+        contracts, next_cursor, page = crud.get_contract_summaries(db, skip=skip, limit=limit, cursor=cursor)
+        total_count = crud.get_contract_count(db)
+        return {
+            'contracts': contracts,
+            'pagination': {
+                'total': total_count,
+                'page': page,
+                'per_page': limit,
+                'pages': (total_count + limit - 1) // limit,
+                'next_cursor': next_cursor
+            }
+        }
+
     @staticmethod
     def get_contract(db: Session, contract_id: uuid.UUID):
         return crud.get_contract_by_id(db, contract_id)
@@ -239,7 +314,7 @@ class ContractService:
             .all()
 
     @staticmethod
-    async def price_contract(db: Session, contract_id: uuid.UUID, pricing_data: schemas.ContractPricingRequest, user_id: uuid.UUID):
+    def _price_contract_tx(db: Session, contract_id: uuid.UUID, pricing_data: schemas.ContractPricingRequest):
         contract = db.query(core_models.Contract).filter(core_models.Contract.id == contract_id).first()
         if not contract:
             raise HTTPException(status_code=404, detail="Contract not found")
@@ -271,15 +346,8 @@ class ContractService:
         # Calculate new contract total after modification
         new_contract_total = sum(item.total for item in contract.items)
 
-        # Calculate previously booked value (invoices + previous adjustments)
-        previous_transactions = db.query(core_models.FinancialTransaction).filter(
-            core_models.FinancialTransaction.contract_id == contract.id,
-            core_models.FinancialTransaction.type.in_(['Invoice', 'Pricing Adjustment'])
-        ).all()
-
-        current_booked_value = sum(
-            (t.amount if not t.is_credit else -t.amount) for t in previous_transactions
-        )
+        # Previously booked value (invoices + previous adjustments), maintained in contract_balances
+        current_booked_value = balance_crud.get_contract_balance(db, contract.id)["booked_value"]
 
         # Calculate difference
         difference = float(new_contract_total) - float(current_booked_value)
@@ -300,36 +368,45 @@ class ContractService:
             db.add(adjustment)
 
         db.commit()
-        db.refresh(contract)
+        return contract.contract_no
+
+    @staticmethod
+    async def price_contract(db, contract_id: uuid.UUID, pricing_data: schemas.ContractPricingRequest, user_id: uuid.UUID):
+        contract_no = await run_db(db, ContractService._price_contract_tx, contract_id, pricing_data)
 
-        await manager.broadcast("CONTRACT_UPDATED")
+        await contract_events.add("updated", contract_id)
 
         # Create notification for contract pricing
         await NotificationService.create_contract_notification(
-            db, user_id, contract.id, "contract_priced", contract.contract_no
+            db, user_id, contract_id, "contract_priced", contract_no
         )
 
         return {"message": "Pricing updated and financial adjustment recorded"}
 
     @staticmethod
-    async def approve_pricing(db: Session, contract_id: uuid.UUID, user_id: uuid.UUID):
+    def _approve_pricing_tx(db: Session, contract_id: uuid.UUID):
         contract = db.query(core_models.Contract).filter(core_models.Contract.id == contract_id).first()
         if not contract:
             raise HTTPException(status_code=404, detail="Contract not found")
 
         contract.pricing_status = "approved"
         db.commit()
+        return contract.contract_no
+
+    @staticmethod
+    async def approve_pricing(db, contract_id: uuid.UUID, user_id: uuid.UUID):
+        contract_no = await run_db(db, ContractService._approve_pricing_tx, contract_id)
 
         # Create notification for pricing approval
         await NotificationService.create_contract_notification(
-            db, user_id, contract_id, "pricing_approved", contract.contract_no
+            db, user_id, contract_id, "pricing_approved", contract_no
         )
 
-        await manager.broadcast("CONTRACT_UPDATED")
+        await contract_events.add("updated", contract_id)
         return {"message": "Pricing approved successfully"}
 
     @staticmethod
-    async def partial_price(db: Session, contract_id: uuid.UUID, pricing_data: schemas.ContractPartialPricingRequest, user_id: uuid.UUID):
+    def _partial_price_tx(db: Session, contract_id: uuid.UUID, pricing_data: schemas.ContractPartialPricingRequest):
         try:
             item_id = uuid.UUID(pricing_data.item_id)
         except ValueError:
@@ -372,26 +449,20 @@ class ContractService:
         )
         db.add(transaction)
         db.commit()
+        return contract.contract_no
+
+    @staticmethod
+    async def partial_price(db, contract_id: uuid.UUID, pricing_data: schemas.ContractPartialPricingRequest, user_id: uuid.UUID):
+        contract_no = await run_db(db, ContractService._partial_price_tx, contract_id, pricing_data)
 
         # Create notification for partial pricing
         await NotificationService.create_contract_notification(
-            db, user_id, contract.id, "contract_priced", contract.contract_no
+            db, user_id, contract_id, "contract_priced", contract_no
         )
 
-        await manager.broadcast("CONTRACT_UPDATED")
+        await contract_events.add("updated", contract_id)
         return {"message": "Partial pricing recorded"}
 
-    @staticmethod
-    def get_contract_ledger(db: Session, contract_id: uuid.UUID, skip: int = 0, limit: int = 50):
-        """Get financial ledger for a contract with pagination"""
-        # Add index hint and limit the query for better performance
-        return db.query(core_models.FinancialTransaction)\
-            .filter(core_models.FinancialTransaction.contract_id == contract_id)\
-            .order_by(core_models.FinancialTransaction.transaction_date.desc(), core_models.FinancialTransaction.created_at.desc())\
-            .offset(skip)\
-            .limit(limit)\
-            .all()
-
     @staticmethod
     def search_contracts(db: Session, status: str = None, start_date: str = None, end_date: str = None, user_id: str = None, skip: int = 0, limit: int = 50):
         """Search contracts based on criteria like status, date, or user"""
@@ -426,43 +497,32 @@ class ContractService:
 
     @staticmethod
     def get_pricing_tree(db: Session, contract_id: uuid.UUID):
-        contract = db.query(core_models.Contract).filter(core_models.Contract.id == contract_id).first()
-        if not contract:
+        if not db.query(core_models.Contract.id).filter(core_models.Contract.id == contract_id).first():
             raise HTTPException(status_code=404, detail="Contract not found")
 
+        # Every item with its Partial Pricing rows in one query; legacy rows
+        # got item_id/qty_priced/unit_price from the backfill migration
+        Item = core_models.ContractItem
+        Txn = core_models.FinancialTransaction
+        rows = db.query(
+            Item.id.label("item_id"), Txn.id, Txn.transaction_date, Txn.qty_priced,
+            Txn.unit_price, Txn.amount, Txn.reference
+        ).outerjoin(Txn, and_(Txn.item_id == Item.id, Txn.type == 'Partial Pricing'))\
+            .filter(Item.contract_id == contract_id)\
+            .order_by(Item.id, Txn.transaction_date, Txn.created_at)\
+            .all()
+
         tree = {}
-        
-        for item in contract.items:
-            # 1. Get transactions for this item (Partial Pricing) - Using new item_id column
-            item_transactions = db.query(core_models.FinancialTransaction).filter(
-                core_models.FinancialTransaction.contract_id == contract_id,
-                core_models.FinancialTransaction.item_id == item.id,
-                core_models.FinancialTransaction.type == 'Partial Pricing'
-            ).all()
-
-            # Fallback for old transactions (string parsing) if item_id is null
-            if not item_transactions:
-                 # Standardize article name for search
-                article_name_part = f"(Item: {item.article.article_name})" if item.article else ""
-                
-                # Loose fallback search
-                item_transactions = db.query(core_models.FinancialTransaction).filter(
-                    core_models.FinancialTransaction.contract_id == contract_id,
-                    core_models.FinancialTransaction.type == 'Partial Pricing',
-                    core_models.FinancialTransaction.description.contains(article_name_part),
-                    core_models.FinancialTransaction.item_id == None
-                ).all()
-
-            tree[str(item.id)] = [
-                {
-                    "id": str(t.id),
-                    "date": str(t.transaction_date),
-                    # Prefer structured columns, fallback to parsing
-                    "qty_priced": float(t.qty_priced) if t.qty_priced is not None else (float(t.description.split()[2]) if len(t.description.split()) > 2 else 0),
-                    "price": float(t.unit_price) if t.unit_price is not None else (float(t.description.split('@')[1].split('/')[0].strip().replace('$', '')) if '@' in t.description else 0),
-                    "total_value": float(t.amount),
-                    "reference": t.reference
-                }
-                for t in item_transactions
-            ]
+        for row in rows:
+            entries = tree.setdefault(str(row.item_id), [])
+            if row.id is None:
+                continue
+            entries.append({
+                "id": str(row.id),
+                "date": str(row.transaction_date),
+                "qty_priced": float(row.qty_priced or 0),
+                "price": float(row.unit_price or 0),
+                "total_value": float(row.amount),
+                "reference": row.reference
+            })
         return tree
@@ -7,6 +7,7 @@ import json
 from crud import crud
 from schemas import schemas
 from models import core_models
+from core.database import run_db
 from ws_manager import manager
 
 logger = logging.getLogger(__name__)
@@ -16,30 +17,71 @@ class NotificationService:
     async def create_notification(db: Session, notification_data: schemas.NotificationCreate) -> core_models.Notification:
         """Create a new notification"""
         try:
-            notification = crud.create_notification(db, notification_data)
+            notification = await run_db(db, crud.create_notification, notification_data)
             
-            # Broadcast via WebSocket
+            # Push to the recipient's open WebSocket connections
             if notification:
                 try:
-                    await manager.broadcast(json.dumps({
-                        "type": "notification",
-                        "data": {
-                            "id": str(notification.id),
-                            "title": notification.title,
-                            "message": notification.message,
-                            "type": notification.type,
-                            "user_id": str(notification.user_id),
-                            "created_at": notification.created_at.isoformat() if notification.created_at else None
-                        }
+                    await manager.send_to_user(notification.user_id, NotificationService._ws_event({
+                        "id": notification.id,
+                        "title": notification.title,
+                        "message": notification.message,
+                        "type": notification.type,
+                        "related_id": notification.related_id,
+                        "user_id": notification.user_id,
+                        "created_at": notification.created_at
                     }))
                 except Exception as ws_err:
-                    logger.warning(f"WebSocket broadcast failed: {ws_err}")
+                    logger.warning(f"WebSocket send failed: {ws_err}")
                     
             return notification
         except Exception as e:
             logger.error(f"Error creating notification: {e}")
             raise e
 
+    @staticmethod
+    def _recipient_ids(db: Session, exclude_user_id: uuid.UUID) -> list:
+        """IDs of every user except the one who performed the action"""
+        return [u.id for u in db.query(core_models.User.id).filter(core_models.User.id != exclude_user_id).all()]
+
+    @staticmethod
+    def _fan_out_tx(db: Session, exclude_user_id: uuid.UUID, title: str, message: str, event_type: str, related_id: uuid.UUID) -> list:
+        user_ids = NotificationService._recipient_ids(db, exclude_user_id)
+        return crud.create_notifications_bulk(db, user_ids, title, message, event_type, related_id)
+
+    @staticmethod
+    def _ws_event(row: dict) -> str:
+        """`notification` WebSocket event for one notification row"""
+        return json.dumps({
+            "type": "notification",
+            "data": {
+                "id": str(row["id"]),
+                "title": row["title"],
+                "message": row["message"],
+                "type": row["type"],
+                "related_id": str(row["related_id"]) if row["related_id"] else None,
+                "user_id": str(row["user_id"]),
+                "created_at": row["created_at"].isoformat() if row["created_at"] else None
+            }
+        })
+
+    @staticmethod
+    async def fan_out(db: Session, exclude_user_id: uuid.UUID, title: str, message: str, event_type: str, related_id: uuid.UUID = None) -> list:
+        """
+        Notify every user except `exclude_user_id` with one bulk insert and one
+        commit, then push each recipient its own event concurrently.
+        """
+        rows = await run_db(db, NotificationService._fan_out_tx, exclude_user_id, title, message, event_type, related_id)
+        if not rows:
+            return []
+
+        try:
+            await manager.send_to_users({row["user_id"]: NotificationService._ws_event(row) for row in rows})
+        except Exception as ws_err:
+            logger.warning(f"WebSocket send failed: {ws_err}")
+
+        return rows
+
     @staticmethod
     def get_user_notifications(db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 50) -> List[core_models.Notification]:
         """Get notifications for a user"""
@@ -114,25 +156,14 @@ class NotificationService:
                 logger.warning(f"Unknown notification event type: {event_type}")
                 return []
 
-            # Get all users except the one who performed the action
-            # Extract user IDs immediately to avoid detached instance issues
-            user_ids = [u.id for u in db.query(core_models.User.id).filter(core_models.User.id != user_id).all()]
-
-            created_notifications = []
-            for uid in user_ids:
-                # Use the user's ID directly to avoid detached instance issues
-                notification_data = schemas.NotificationCreate(
-                    user_id=uid,
-                    title=notifications[event_type]["title"],
-                    message=notifications[event_type]["message"],
-                    type=event_type,
-                    related_id=contract_id
-                )
-                notification = await NotificationService.create_notification(db, notification_data)
-                if notification:
-                    created_notifications.append(notification)
-
-            return created_notifications
+            # Notify all users except the one who performed the action
+            return await NotificationService.fan_out(
+                db, user_id,
+                notifications[event_type]["title"],
+                notifications[event_type]["message"],
+                event_type,
+                contract_id
+            )
 
         except Exception as e:
             logger.error(f"Error creating contract notifications: {e}")
@@ -162,25 +193,14 @@ class NotificationService:
                 logger.warning(f"Unknown inventory notification event type: {event_type}")
                 return []
 
-            # Get all users except the one who performed the action
-            # Extract user IDs immediately to avoid detached instance issues
-            user_ids = [u.id for u in db.query(core_models.User.id).filter(core_models.User.id != user_id).all()]
-
-            created_notifications = []
-            for uid in user_ids:
-                # Use the user's ID directly to avoid detached instance issues
-                notification_data = schemas.NotificationCreate(
-                    user_id=uid,
-                    title=notifications[event_type]["title"],
-                    message=notifications[event_type]["message"],
-                    type=event_type,
-                    related_id=note_id
-                )
-                notification = await NotificationService.create_notification(db, notification_data)
-                if notification:
-                    created_notifications.append(notification)
-
-            return created_notifications
+            # Notify all users except the one who performed the action
+            return await NotificationService.fan_out(
+                db, user_id,
+                notifications[event_type]["title"],
+                notifications[event_type]["message"],
+                event_type,
+                note_id
+            )
 
         except Exception as e:
             logger.error(f"Error creating inventory notifications: {e}")
@@ -0,0 +1,216 @@
+import os
+import time
+import random
+import asyncio
+import datetime
+import logging
+from typing import Dict, List, Optional, Set
+from models import hr_models
+from core.database import SessionLocal
+from services import zk_service
+
+logger = logging.getLogger(__name__)
+
+# Set to false on all but one worker process when running several
+ZK_SYNC_SCHEDULER = os.getenv("ZK_SYNC_SCHEDULER", "true").lower() in ("1", "true", "yes")
+# Seconds between scheduled syncs of a healthy device
+ZK_SYNC_INTERVAL = float(os.getenv("ZK_SYNC_INTERVAL", "300"))
+# Up to this fraction of the interval is added at random, so devices don't all fire together
+ZK_SYNC_JITTER = float(os.getenv("ZK_SYNC_JITTER", "0.1"))
+# Failing devices are retried after interval * 2^failures, capped at this many seconds
+ZK_SYNC_MAX_BACKOFF = float(os.getenv("ZK_SYNC_MAX_BACKOFF", "3600"))
+# Finished job rows older than this many days are deleted
+ZK_SYNC_JOB_RETENTION_DAYS = int(os.getenv("ZK_SYNC_JOB_RETENTION_DAYS", "30"))
+
+def queue_sync_jobs(device_ids: Optional[List[int]], trigger: str = "manual") -> Dict[int, int]:
+    """
+    Record a "queued" attendance_sync_jobs row for each known device (every
+    device when `device_ids` is None). Returns {device id: job id}.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(hr_models.ZkDevice.id)
+        if device_ids is not None:
+            query = query.filter(hr_models.ZkDevice.id.in_(device_ids))
+        known = {d_id for (d_id,) in query.all()}
+        ordered = device_ids if device_ids is not None else sorted(known)
+        jobs = {d_id: hr_models.AttendanceSyncJob(device_id=d_id, trigger=trigger, status="queued") for d_id in ordered if d_id in known}
+        db.add_all(jobs.values())
+        db.commit()
+        return {d_id: job.id for d_id, job in jobs.items()}
+    finally:
+        db.close()
+
+def run_sync_jobs(device_ids: List[int], trigger: str = "scheduled", job_ids: Optional[Dict[int, int]] = None) -> List[dict]:
+    """
+    Sync devices concurrently (see zk_service.sync_devices), recording one
+    attendance_sync_jobs row per device with its outcome and duration.
+    `job_ids` are rows already created by queue_sync_jobs; otherwise new rows
+    are added. Blocking; returns the per-device results.
+    """
+    if not device_ids:
+        return []
+    db = SessionLocal()
+    try:
+        Job = hr_models.AttendanceSyncJob
+        if job_ids is None:
+            known = {d_id for (d_id,) in db.query(hr_models.ZkDevice.id).filter(hr_models.ZkDevice.id.in_(device_ids)).all()}
+            jobs = {d_id: Job(device_id=d_id, trigger=trigger, status="running") for d_id in device_ids if d_id in known}
+            db.add_all(jobs.values())
+        else:
+            jobs = {job.device_id: job for job in db.query(Job).filter(Job.id.in_(job_ids.values())).all()}
+            for job in jobs.values():
+                job.status = "running"
+        db.commit()
+
+        results = zk_service.sync_devices(device_ids)
+
+        now = datetime.datetime.now()
+        for result in results:
+            job = jobs.get(result["device_id"])
+            if job is None:
+                continue
+            job.status = result["status"]
+            job.message = result["message"]
+            job.logs_count = result["logs_count"]
+            job.duration_ms = result["duration_ms"]
+            job.finished_at = now
+        db.query(Job).filter(
+            Job.finished_at != None,
+            Job.started_at < now - datetime.timedelta(days=ZK_SYNC_JOB_RETENTION_DAYS)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return results
+    finally:
+        db.close()
+
+class AttendanceSyncScheduler:
+    """
+    Polls every active ZkDevice in the background, so attendance arrives
+    without anyone pressing sync. Each device has its own due time: the
+    interval plus jitter after a successful sync, and an exponentially
+    growing delay while it keeps failing.
+    """
+
+    FAILED = ("error", "timeout")
+
+    def __init__(self, interval: float = ZK_SYNC_INTERVAL, jitter: float = ZK_SYNC_JITTER,
+                 max_backoff: float = ZK_SYNC_MAX_BACKOFF):
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self._next_due: Dict[int, float] = {}
+        self._failures: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Manual syncs still running; referenced so they aren't garbage collected
+        self._manual: Set[asyncio.Task] = set()
+        self.last_run_at: Optional[datetime.datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start polling on the running event loop"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+        logger.info(f"Attendance sync scheduler started (every {self.interval:g}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _delay(self, device_id: int) -> float:
+        failures = self._failures.get(device_id, 0)
+        delay = min(self.interval * (2 ** failures), self.max_backoff) if failures else self.interval
+        return delay + random.uniform(0, self.interval * self.jitter)
+
+    def _due_devices(self) -> List[int]:
+        db = SessionLocal()
+        try:
+            device_ids = [d_id for (d_id,) in db.query(hr_models.ZkDevice.id).filter(hr_models.ZkDevice.is_active == True).all()]
+        finally:
+            db.close()
+        now = time.monotonic()
+        # Forget devices that were removed or deactivated
+        for d_id in set(self._next_due) - set(device_ids):
+            self._next_due.pop(d_id, None)
+            self._failures.pop(d_id, None)
+        # A worker that timed out may still be talking to its device
+        busy = zk_service.in_flight_devices()
+        return [d_id for d_id in device_ids if self._next_due.get(d_id, 0) <= now and d_id not in busy]
+
+    async def run_once(self) -> List[dict]:
+        """Sync the devices that are due; device I/O runs in worker threads"""
+        due = await asyncio.to_thread(self._due_devices)
+        if not due:
+            return []
+        results = await asyncio.to_thread(run_sync_jobs, due, "scheduled")
+        self.last_run_at = datetime.datetime.now()
+        for result in results:
+            d_id = result["device_id"]
+            if result["status"] == "skipped":
+                # Claimed by a manual sync in the meantime; stays due
+                continue
+            if result["status"] in self.FAILED:
+                self._failures[d_id] = self._failures.get(d_id, 0) + 1
+            else:
+                self._failures.pop(d_id, None)
+            self._next_due[d_id] = time.monotonic() + self._delay(d_id)
+        return results
+
+    async def enqueue(self, device_ids: Optional[List[int]], trigger: str = "manual") -> Dict[int, int]:
+        """
+        Queue a sync of the given devices (all devices when None) and return
+        {device id: job id} straight away; the sync runs in worker threads and
+        its outcome is written to the job rows.
+        """
+        job_ids = await asyncio.to_thread(queue_sync_jobs, device_ids, trigger)
+        if job_ids:
+            task = asyncio.get_running_loop().create_task(self._run_queued(job_ids, trigger))
+            self._manual.add(task)
+            task.add_done_callback(self._manual.discard)
+        return job_ids
+
+    async def _run_queued(self, job_ids: Dict[int, int], trigger: str):
+        try:
+            await asyncio.to_thread(run_sync_jobs, list(job_ids), trigger, job_ids)
+        except Exception as e:
+            logger.error(f"Queued attendance sync of devices {list(job_ids)} failed: {e}", exc_info=True)
+
+    async def _loop(self):
+        # Wake often enough to notice new devices and due times, but not busily
+        tick = max(1.0, min(self.interval, 5.0))
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduled attendance sync failed: {e}")
+            await asyncio.sleep(tick)
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "devices": [
+                {
+                    "device_id": d_id,
+                    "next_sync_in_seconds": round(max(0.0, due - now), 1),
+                    "consecutive_failures": self._failures.get(d_id, 0)
+                }
+                for d_id, due in sorted(self._next_due.items())
+            ]
+        }
+
+# Create a single instance to use everywhere
+sync_scheduler = AttendanceSyncScheduler()
@@ -1,8 +1,16 @@
 import logging
 import datetime
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from models import hr_models, core_models, employee_models
 from core.database import SessionLocal
+from crud import attendance_crud
+from services.attendance_rules import AttendanceRules
 
 # Try importing zk, handle if missing
 try:
@@ -13,6 +21,27 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Devices synced at the same time by sync_devices()
+ZK_SYNC_WORKERS = int(os.getenv("ZK_SYNC_WORKERS", "4"))
+
+# Punches classified and inserted per transaction during a device sync
+ZK_SYNC_CHUNK_SIZE = int(os.getenv("ZK_SYNC_CHUNK_SIZE", "1000"))
+
+# Seconds one device sync may take before sync_devices() stops waiting for it
+ZK_SYNC_DEADLINE = float(os.getenv("ZK_SYNC_DEADLINE", "30"))
+
+# Devices whose sync worker is queued or running, including ones past their deadline
+_in_flight: set = set()
+_in_flight_lock = threading.Lock()
+
+def in_flight_devices() -> FrozenSet[int]:
+    with _in_flight_lock:
+        return frozenset(_in_flight)
+
+def _release_device(device_id: int):
+    with _in_flight_lock:
+        _in_flight.discard(device_id)
+
 class ZkTecoService:
     def __init__(self, db: Session):
         self.db = db
@@ -39,66 +68,29 @@ class ZkTecoService:
             conn = zk.connect()
             logger.info("Connected successfully.")
 
-            # Disable device while reading
+            # Disable device only while its buffer is read, so the terminal is
+            # back in service before any of the database work starts
             conn.disable_device()
+            try:
+                punches = conn.get_attendance()
+            finally:
+                conn.enable_device()
 
-            # Get Attendance Logs
-            logs = conn.get_attendance()
-            new_logs_count = 0
-
-            # Get Employees map for referencing by their device code
-            # Note: We query all active employees to map device user_id to internal PK
-            employees = self.db.query(employee_models.Employee).all()
-            employees_map = {str(e.code): e.id for e in employees}
-
-            for log in logs:
-                # Check if log exists
-                exists = self.db.query(hr_models.AttendanceLog).filter_by(
-                    employee_id=str(log.user_id),
-                    timestamp=log.timestamp
-                ).first()
-
-                if not exists:
-                    # Determine type based on device IP
-                    log_type = self._get_type_by_device(device.ip_address)
-
-                    # Calculate status based on type and time
-                    status = "present"
-                    hour = log.timestamp.hour
-                    minute = log.timestamp.minute
-
-                    if log_type == "check_in":
-                        # Late if after 9:15 AM
-                        if hour > 9 or (hour == 9 and minute > 15):
-                            status = "late"
-                    elif log_type == "check_out":
-                        # Early leave if before 4:00 PM
-                        if hour < 16:
-                            status = "early_leave"
-
-                    new_log = hr_models.AttendanceLog(
-                        employee_pk=employees_map.get(str(log.user_id)),
-                        employee_id=str(log.user_id),
-                        timestamp=log.timestamp,
-                        type=log_type,
-                        device_id=device.id,
-                        verification_mode=str(log.punch),
-                        raw_status=str(log.status),
-                        status=status
-                    )
-                    self.db.add(new_log)
-                    new_logs_count += 1
+            rules = AttendanceRules.load(self.db, device)
+            new_logs_count, newest = self._ingest_punches(device, punches, rules)
 
+            since = device.last_synced_timestamp
+            if newest is not None and (since is None or newest > since):
+                device.last_synced_timestamp = newest
             device.last_sync = datetime.datetime.now()
             device.status = "online"
             self.db.commit()
 
-            # Re-enable device
-            conn.enable_device()
             return {"status": "success", "message": f"Synced {new_logs_count} new logs", "logs_count": new_logs_count}
 
         except Exception as e:
             logger.error(f"ZKTeco Sync Error: {e}")
+            self.db.rollback()
             device.status = "error"
             self.db.commit()
             return {"status": "error", "message": str(e)}
@@ -109,15 +101,51 @@ class ZkTecoService:
                 except:
                     pass
 
-    def _get_type_by_device(self, device_ip):
-        # Determine check-in/check-out based on device IP
-        if device_ip == "10.0.0.234":
-            return "check_in"
-        elif device_ip == "10.0.0.235":
-            return "check_out"
-        else:
-            # Fallback to status if IP not recognized
-            return "unknown"
+    def _new_punches(self, device, punches) -> Iterator:
+        """
+        Punches at or after the device's high-water mark. Equal timestamps are
+        re-offered and dropped by the unique constraint on insert.
+        """
+        since = device.last_synced_timestamp
+        for punch in punches:
+            if since is None or punch.timestamp >= since:
+                yield punch
+
+    def _ingest_punches(self, device, punches, rules: AttendanceRules, chunk_size: int = None) -> Tuple[int, Optional[datetime.datetime]]:
+        """
+        Classify and store new punches in chunks of `chunk_size`, committing
+        each chunk, so the rows and employee lookups held at once stay bounded.
+        Returns (logs inserted, newest punch timestamp seen).
+        """
+        chunk_size = chunk_size or ZK_SYNC_CHUNK_SIZE
+        stream = self._new_punches(device, punches)
+        inserted, newest = 0, None
+        while True:
+            chunk = {}
+            for punch in islice(stream, chunk_size):
+                chunk.setdefault((str(punch.user_id), punch.timestamp), punch)
+            if not chunk:
+                break
+
+            # Resolve this chunk's device user ids to internal employee PKs
+            employees_map = attendance_crud.resolve_employee_pks(self.db, (user_id for user_id, _ in chunk))
+            rows = []
+            for (user_id, timestamp), punch in chunk.items():
+                rows.append({
+                    "user_id": employees_map.get(user_id),
+                    "employee_id": user_id,
+                    "timestamp": timestamp,
+                    "device_id": device.id,
+                    "verification_mode": str(punch.punch),
+                    "raw_status": str(punch.status)
+                })
+                if newest is None or timestamp > newest:
+                    newest = timestamp
+            rules.load_assignments(self.db, employees_map.values())
+            rules.classify(rows)
+            inserted += attendance_crud.insert_attendance_logs(self.db, rows)
+            self.db.commit()
+        return inserted, newest
 
     def _map_status(self, zk_status):
         # Keep original status for reference
@@ -163,15 +191,16 @@ class ZkTecoService:
         if not employees:
             return
 
+        # Same rules as a real sync: the device's direction decides what to generate
+        rules = AttendanceRules.load(self.db, device)
+        if rules.direction == "unknown":
+            return
+
         now = datetime.datetime.now()
+        rows = []
         for emp in employees:
-            # Determine type based on device IP
-            log_type = self._get_type_by_device(device.ip_address)
-            if log_type == "unknown":
-                continue
-
             # Generate appropriate time based on type
-            if log_type == "check_in":
+            if rules.direction == "check_in":
                 # Check-in today at 8-10 AM
                 log_time = now.replace(hour=8, minute=0, second=0) + datetime.timedelta(minutes=random.randint(0, 120))
                 raw_status = "101"
@@ -180,32 +209,93 @@ class ZkTecoService:
                 log_time = now.replace(hour=16, minute=0, second=0) + datetime.timedelta(minutes=random.randint(0, 120))
                 raw_status = "102"
 
-            # Check if log exists
-            exists = self.db.query(hr_models.AttendanceLog).filter_by(
-                employee_id=emp.code,
-                timestamp=log_time
-            ).first()
-            if not exists:
-                status = "present"
-                hour = log_time.hour
-                minute = log_time.minute
-
-                if log_type == "check_in":
-                    if hour > 9 or (hour == 9 and minute > 15):
-                        status = "late"
-                elif log_type == "check_out":
-                    if hour < 16:
-                        status = "early_leave"
-
-                log = hr_models.AttendanceLog(
-                    employee_pk=emp.id,
-                    employee_id=emp.code,
-                    timestamp=log_time,
-                    type=log_type,
-                    device_id=device.id,
-                    raw_status=raw_status,
-                    status=status,
-                    verification_mode="Face"
-                )
-                self.db.add(log)
+            rows.append({
+                "user_id": emp.id,
+                "employee_id": emp.code,
+                "timestamp": log_time,
+                "device_id": device.id,
+                "raw_status": raw_status,
+                "verification_mode": "Face"
+            })
+        rules.load_assignments(self.db, (emp.id for emp in employees))
+        rules.classify(rows)
+        attendance_crud.insert_attendance_logs(self.db, rows)
         self.db.commit()
+
+
+def _sync_in_own_session(device_id: int, started: Dict[int, float]) -> dict:
+    started[device_id] = time.monotonic()
+    db = SessionLocal()
+    try:
+        result = dict(ZkTecoService(db).sync_device(device_id))
+    finally:
+        db.close()
+    result["duration_ms"] = round((time.monotonic() - started[device_id]) * 1000, 1)
+    return result
+
+def sync_devices(device_ids: List[int], max_workers: int = ZK_SYNC_WORKERS, deadline: float = ZK_SYNC_DEADLINE) -> List[dict]:
+    """
+    Sync several devices concurrently, each in its own thread and Session.
+    A device that hasn't finished `deadline` seconds after its sync started
+    is reported as "timeout"; its worker is left to finish in the background
+    and the device is reported as "skipped" until it does.
+    Returns one result per device, in the order given.
+    """
+    if not device_ids:
+        return []
+    started: Dict[int, float] = {}
+    results: Dict[int, dict] = {}
+    with _in_flight_lock:
+        claimed = [d_id for d_id in dict.fromkeys(device_ids) if d_id not in _in_flight]
+        _in_flight.update(claimed)
+    for d_id in set(device_ids) - set(claimed):
+        results[d_id] = {"status": "skipped", "message": "A previous sync of this device is still running"}
+    if not claimed:
+        return _sync_results(device_ids, results)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(claimed))), thread_name_prefix="zk-sync")
+    futures = {}
+    for d_id in claimed:
+        future = pool.submit(_sync_in_own_session, d_id, started)
+        # Released when the worker finishes or is cancelled, not when we stop waiting for it
+        future.add_done_callback(lambda _, d_id=d_id: _release_device(d_id))
+        futures[future] = d_id
+    pending = set(futures)
+    try:
+        while pending:
+            now = time.monotonic()
+            for future in list(pending):
+                d_id = futures[future]
+                if d_id in started and now - started[d_id] >= deadline and not future.done():
+                    pending.discard(future)
+                    results[d_id] = {
+                        "status": "timeout",
+                        "message": f"No response within {deadline:g}s; sync continues in the background",
+                        "duration_ms": round((now - started[d_id]) * 1000, 1)
+                    }
+            if not pending:
+                break
+            # Wake up for the next completion or the earliest deadline among running syncs
+            running = [started[futures[f]] + deadline - now for f in pending if futures[f] in started]
+            done, pending = wait(pending, timeout=max(0.0, min(running)) if running else deadline, return_when=FIRST_COMPLETED)
+            for future in done:
+                d_id = futures[future]
+                try:
+                    results[d_id] = future.result()
+                except Exception as e:
+                    logger.error(f"ZKTeco sync of device {d_id} failed: {e}")
+                    results[d_id] = {"status": "error", "message": str(e)}
+    finally:
+        # Don't hold the caller up on workers that ran past their deadline
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return _sync_results(device_ids, results)
+
+def _sync_results(device_ids: List[int], results: Dict[int, dict]) -> List[dict]:
+    return [{
+        "device_id": d_id,
+        "status": results[d_id].get("status"),
+        "message": results[d_id].get("message"),
+        "logs_count": results[d_id].get("logs_count", 0),
+        "duration_ms": results[d_id].get("duration_ms")
+    } for d_id in device_ids]
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+
+# core.database builds its engine at import time from DATABASE_URL
+_DB_DIR = tempfile.mkdtemp(prefix="jandali-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DB_DIR, 'app.db')}")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-" + "x" * 32)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+
+
+# The models use Postgres column types; give them SQLite spellings
+@compiles(UUID, "sqlite")
+def _uuid_on_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_on_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    """A fresh SQLite database with the full schema, indexes included"""
+    from core.database import Base, create_db_engine
+    import models.core_models, models.hr_models, models.employee_models  # noqa: F401
+    import models.company_models, models.department_models, models.archive_models, models.rbac_models  # noqa: F401
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_session(sqlite_engine):
+    with Session(sqlite_engine) as db:
+        yield db
@@ -0,0 +1,89 @@
+"""
+DATE(timestamp) vs half-open timestamp range filters on attendance_logs.
+
+Opt-in benchmark, skipped unless ATTENDANCE_BENCH_ROWS is set:
+
+    cd server && ATTENDANCE_BENCH_ROWS=100000,1000000 python -m pytest -q -s tests/test_attendance_filter_bench.py
+
+Each size fills a fresh SQLite schema with random punches over three years
+and prints the median time of the "one day" and "7-day lookback" queries in
+both forms. Both forms must return the same rows, and the range form must
+be faster for the one-day query, which DATE() turns into a full table scan.
+"""
+import os
+import time
+import random
+import datetime
+import statistics
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from models.hr_models import AttendanceLog
+from routers.hr import _timestamp_range
+
+BENCH_ROWS = [int(n) for n in os.getenv("ATTENDANCE_BENCH_ROWS", "").split(",") if n.strip()]
+EMPLOYEES = 500
+DAYS = 3 * 365
+REPEAT = 5
+
+pytestmark = pytest.mark.skipif(not BENCH_ROWS, reason="set ATTENDANCE_BENCH_ROWS to run the benchmark")
+
+
+def _fill(engine, rows: int, first_day: datetime.date):
+    rng = random.Random(rows)
+    start = datetime.datetime.combine(first_day, datetime.time.min)
+    with engine.begin() as connection:
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "employee_id": str(1000 + rng.randrange(EMPLOYEES)),
+                "timestamp": start + datetime.timedelta(seconds=rng.randrange(DAYS * 86400), microseconds=i % 1000),
+                "type": "check_in",
+                "status": "present",
+            })
+            if len(batch) == 50_000:
+                connection.execute(insert(AttendanceLog.__table__), batch)
+                batch = []
+        if batch:
+            connection.execute(insert(AttendanceLog.__table__), batch)
+        connection.exec_driver_sql("ANALYZE")
+
+
+def _median_ms(db: Session, statement):
+    timings, result = [], None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = sorted(db.execute(statement).scalars().all())
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+@pytest.mark.parametrize("rows", BENCH_ROWS)
+def test_range_filters_beat_date_function(sqlite_engine, rows):
+    first_day = datetime.date(2023, 1, 1)
+    _fill(sqlite_engine, rows, first_day)
+    day = first_day + datetime.timedelta(days=DAYS // 2)
+    week_ago = day - datetime.timedelta(days=7)
+    ids = select(AttendanceLog.id)
+    cases = {
+        "one day": (
+            ids.where(func.date(AttendanceLog.timestamp) == day.isoformat()),
+            ids.where(*_timestamp_range(day, day)),
+        ),
+        "7-day lookback": (
+            ids.where(AttendanceLog.employee_id == "1001",
+                      func.date(AttendanceLog.timestamp) >= week_ago.isoformat(),
+                      func.date(AttendanceLog.timestamp) < day.isoformat()),
+            ids.where(AttendanceLog.employee_id == "1001",
+                      *_timestamp_range(week_ago, day - datetime.timedelta(days=1))),
+        ),
+    }
+    with Session(sqlite_engine) as db:
+        for name, (by_date, by_range) in cases.items():
+            date_ms, date_rows = _median_ms(db, by_date)
+            range_ms, range_rows = _median_ms(db, by_range)
+            print(f"\n{rows:>9} rows  {name:<15} DATE() {date_ms:8.3f}ms  range {range_ms:8.3f}ms")
+            assert date_rows == range_rows
+            if name == "one day":
+                # The lookback is narrowed by employee_id either way, so only this one is timed strictly
+                assert range_ms < date_ms
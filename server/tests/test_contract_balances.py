@@ -0,0 +1,31 @@
+import uuid
+import datetime
+from crud import balance_crud
+from models.core_models import ContractBalance, FinancialTransaction
+
+
+def _txn(contract_id, amount, created_at, is_credit=False):
+    return FinancialTransaction(contract_id=contract_id, type="Payment" if is_credit else "Invoice",
+                                amount=amount, is_credit=is_credit, created_at=created_at)
+
+
+def test_last_txn_at_follows_the_ledger_rows(sqlite_session):
+    contract_id = uuid.uuid4()
+    first = datetime.datetime(2024, 1, 1, 9, 0)
+    second = datetime.datetime(2024, 2, 1, 9, 0)
+    older = _txn(contract_id, 100, first)
+    newer = _txn(contract_id, 40, second, is_credit=True)
+    sqlite_session.add_all([older, newer])
+    sqlite_session.commit()
+
+    balance = balance_crud.get_contract_balance(sqlite_session, contract_id)
+    assert (balance["total_debit"], balance["total_credit"], balance["outstanding_balance"]) == (100, 40, 60)
+    assert balance["last_txn_at"] == second
+
+    sqlite_session.delete(newer)
+    sqlite_session.commit()
+    balance = balance_crud.get_contract_balance(sqlite_session, contract_id)
+    assert (balance["total_credit"], balance["outstanding_balance"]) == (0, 100)
+    # Moves back to the newest remaining row instead of pointing at the deleted one
+    assert balance["last_txn_at"] == first
+    assert sqlite_session.get(ContractBalance, contract_id) is not None
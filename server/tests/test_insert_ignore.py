@@ -0,0 +1,23 @@
+from core.database import insert_ignore
+from models.core_models import EntityCounter
+from models.hr_models import AttendanceLog, ZkDevice
+from crud import attendance_crud
+import datetime
+
+
+def test_insert_ignore_skips_rows_that_already_exist(sqlite_session):
+    for value in (1, 2):
+        sqlite_session.execute(insert_ignore(sqlite_session, EntityCounter).values(name="contracts", value=value))
+    assert sqlite_session.query(EntityCounter.value).all() == [(1,)]
+    # Connections resolve the dialect the same way
+    assert insert_ignore(sqlite_session.connection(), EntityCounter.__table__) is not None
+
+
+def test_attendance_logs_are_inserted_once(sqlite_session):
+    sqlite_session.add(ZkDevice(id=1, name="A", ip_address="10.0.0.1"))
+    sqlite_session.flush()
+    at = datetime.datetime(2024, 5, 1, 8, 0)
+    rows = [{"employee_id": "1001", "timestamp": at, "device_id": 1, "type": "check_in", "status": "present"}]
+    assert attendance_crud.insert_attendance_logs(sqlite_session, rows) == 1
+    assert attendance_crud.insert_attendance_logs(sqlite_session, rows) == 0
+    assert sqlite_session.query(AttendanceLog).count() == 1
@@ -0,0 +1,25 @@
+import uuid
+import datetime
+from types import SimpleNamespace
+import pytest
+from crud import crud, balance_crud
+
+
+def test_contract_cursor_round_trip():
+    contract = SimpleNamespace(id=uuid.uuid4(), modified_date=datetime.datetime(2024, 3, 1, 12, 30))
+    cursor = crud.encode_contract_cursor(contract, 3)
+    assert "=" not in cursor
+    assert crud.decode_contract_cursor(cursor) == (contract.modified_date, contract.id, 3)
+
+
+def test_ledger_cursor_round_trip():
+    row_id = uuid.uuid4()
+    assert balance_crud.decode_ledger_cursor(balance_crud.encode_ledger_cursor(SimpleNamespace(id=row_id))) == row_id
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "e30", "eyJpIjoieCJ9"])  # "{}", {"i": "x"}
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError, match="Invalid pagination cursor"):
+        crud.decode_contract_cursor(cursor)
+    with pytest.raises(ValueError, match="Invalid pagination cursor"):
+        balance_crud.decode_ledger_cursor(cursor)
@@ -0,0 +1,16 @@
+"""Query plan regressions: run with `python -m pytest -q tests` from server/"""
+
+import pytest
+from core.query_plans import check_query_plans, _hot_queries
+
+
+def test_every_hot_query_is_checked(sqlite_session):
+    plans = check_query_plans(sqlite_session)
+    assert [p["query"] for p in plans] == [name for name, _, _ in _hot_queries()]
+    assert all(p["plan"] for p in plans)
+
+
+@pytest.mark.parametrize("name", [name for name, _, _ in _hot_queries()])
+def test_hot_query_uses_index(sqlite_session, name):
+    plan = next(p for p in check_query_plans(sqlite_session) if p["query"] == name)
+    assert plan["uses_index"], f"{name} scans {plan['table']}: {plan['plan']}"
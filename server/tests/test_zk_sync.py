@@ -0,0 +1,64 @@
+import time
+import threading
+from services import zk_service
+from services.sync_scheduler import AttendanceSyncScheduler
+
+
+def test_timed_out_device_is_not_synced_again_until_its_worker_finishes(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_sync(self, device_id):
+        calls.append(device_id)
+        release.wait(5)
+        return {"status": "success", "message": "ok", "logs_count": 0}
+
+    monkeypatch.setattr(zk_service.ZkTecoService, "sync_device", slow_sync)
+    try:
+        first = zk_service.sync_devices([1], deadline=0.2)
+        assert first[0]["status"] == "timeout"
+        assert 1 in zk_service.in_flight_devices()
+
+        second = zk_service.sync_devices([1], deadline=0.2)
+        assert second[0]["status"] == "skipped"
+        assert calls == [1]
+    finally:
+        release.set()
+
+    for _ in range(50):
+        if 1 not in zk_service.in_flight_devices():
+            break
+        time.sleep(0.1)
+    assert 1 not in zk_service.in_flight_devices()
+
+
+def test_scheduler_skips_devices_still_in_flight(monkeypatch, sqlite_session):
+    from models.hr_models import ZkDevice
+    sqlite_session.add_all([ZkDevice(id=1, name="A", ip_address="10.0.0.1", is_active=True),
+                            ZkDevice(id=2, name="B", ip_address="10.0.0.2", is_active=True)])
+    sqlite_session.commit()
+    monkeypatch.setattr("services.sync_scheduler.SessionLocal", lambda: type(sqlite_session)(sqlite_session.get_bind()))
+    monkeypatch.setattr(zk_service, "in_flight_devices", lambda: frozenset({1}))
+    assert AttendanceSyncScheduler()._due_devices() == [2]
+
+
+def test_queued_manual_sync_is_recorded_on_its_job_rows(monkeypatch, sqlite_session):
+    from models.hr_models import AttendanceSyncJob, ZkDevice
+    from services import sync_scheduler
+    sqlite_session.add(ZkDevice(id=1, name="A", ip_address="10.0.0.1", is_active=True))
+    sqlite_session.commit()
+    monkeypatch.setattr(sync_scheduler, "SessionLocal", lambda: type(sqlite_session)(sqlite_session.get_bind()))
+    monkeypatch.setattr(zk_service, "sync_devices", lambda ids: [
+        {"device_id": d_id, "status": "success", "message": "ok", "logs_count": 3, "duration_ms": 1.0} for d_id in ids
+    ])
+
+    job_ids = sync_scheduler.queue_sync_jobs([1, 99], "manual")
+    assert list(job_ids) == [1]
+    assert sqlite_session.get(AttendanceSyncJob, job_ids[1]).status == "queued"
+
+    sync_scheduler.run_sync_jobs(list(job_ids), "manual", job_ids)
+    sqlite_session.expire_all()
+    job = sqlite_session.get(AttendanceSyncJob, job_ids[1])
+    assert (job.status, job.trigger, job.logs_count) == ("success", "manual", 3)
+    assert job.finished_at is not None
+    assert sqlite_session.query(AttendanceSyncJob).count() == 1
@@ -1,22 +1,80 @@
 # --- START OF FILE server/ws_manager.py ---
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from fastapi import WebSocket
 import asyncio
 import logging
+import json
+import os
+from core.pubsub import Broker, InMemoryBroker
 
 logger = logging.getLogger(__name__)
 
+# Topics a client can subscribe to; new connections get all of them by default
+TOPICS = ("contracts", "inventory", "hr.attendance", "archive")
+
+# Seconds a single send may take before the socket is treated as dead
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+
+# Seconds entity change events are collected before one combined message is sent
+WS_COALESCE_WINDOW = float(os.getenv("WS_COALESCE_WINDOW", "0.5"))
+
+# Per-user messages are relayed to other workers in envelopes of this many users
+RELAY_BATCH_SIZE = 20
+
 class ConnectionManager:
     def __init__(self):
         # List to store connected browsers
         self.active_connections: List[WebSocket] = []
+        # Connections indexed by authenticated user id and by subscribed topic
+        self._user_connections: Dict[str, Set[WebSocket]] = {}
+        self._topic_connections: Dict[str, Set[WebSocket]] = {}
+        self._connection_user: Dict[WebSocket, str] = {}
+        self._connection_topics: Dict[WebSocket, Set[str]] = {}
         # Lock for thread-safe operations
         self._lock = asyncio.Lock()
+        # Relays fan-out to the other worker processes
+        self.broker: Broker = InMemoryBroker()
+
+    async def start_broker(self, broker: Broker):
+        """Replace the broker and start receiving events relayed from other workers"""
+        await self.broker.stop()
+        self.broker = broker
+        await broker.start(self._deliver)
+
+    async def stop_broker(self):
+        await self.broker.stop()
 
-    async def connect(self, websocket: WebSocket):
+    async def _relay(self, kind: str, message=None, target=None):
+        envelope = {"origin": self.broker.worker_id, "kind": kind, "target": target, "message": message}
+        try:
+            await self.broker.publish(envelope)
+        except Exception as e:
+            logger.warning(f"Failed to relay WebSocket event to other workers: {e}")
+
+    async def _deliver(self, envelope: dict) -> int:
+        """Send an envelope relayed from another worker to the local sockets"""
+        kind = envelope.get("kind")
+        if kind == "broadcast":
+            return await self._broadcast_local(envelope["message"])
+        if kind == "user":
+            return await self._send_to_user_local(envelope["target"], envelope["message"])
+        if kind == "users":
+            return await self._send_to_users_local(envelope["message"])
+        if kind == "topic":
+            return await self._publish_local(envelope["target"], envelope["message"])
+        logger.warning(f"Ignoring relayed WebSocket event of unknown kind: {kind}")
+        return 0
+
+    async def connect(self, websocket: WebSocket, user_id=None, topics: Optional[Iterable[str]] = None):
         await websocket.accept()
         async with self._lock:
             self.active_connections.append(websocket)
+            if user_id is not None:
+                key = str(user_id)
+                self._connection_user[websocket] = key
+                self._user_connections.setdefault(key, set()).add(websocket)
+            self._connection_topics[websocket] = set()
+            self._subscribe_locked(websocket, TOPICS if topics is None else topics)
             logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
 
     async def disconnect(self, websocket: WebSocket):
@@ -27,28 +85,177 @@ class ConnectionManager:
                     logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
             except ValueError:
                 pass
+            user_key = self._connection_user.pop(websocket, None)
+            if user_key is not None:
+                sockets = self._user_connections.get(user_key)
+                if sockets is not None:
+                    sockets.discard(websocket)
+                    if not sockets:
+                        del self._user_connections[user_key]
+            self._unsubscribe_locked(websocket, self._connection_topics.pop(websocket, set()))
 
-    async def broadcast(self, message: str):
-        """Send message to all connected clients"""
+    def _subscribe_locked(self, websocket: WebSocket, topics: Iterable[str]):
+        for topic in topics:
+            if topic not in TOPICS:
+                logger.warning(f"Ignoring subscription to unknown topic: {topic}")
+                continue
+            self._connection_topics.setdefault(websocket, set()).add(topic)
+            self._topic_connections.setdefault(topic, set()).add(websocket)
+
+    def _unsubscribe_locked(self, websocket: WebSocket, topics: Iterable[str]):
+        for topic in list(topics):
+            self._connection_topics.get(websocket, set()).discard(topic)
+            sockets = self._topic_connections.get(topic)
+            if sockets is not None:
+                sockets.discard(websocket)
+                if not sockets:
+                    del self._topic_connections[topic]
+
+    async def subscribe(self, websocket: WebSocket, topics: Iterable[str]):
         async with self._lock:
-            connections = self.active_connections[:]
-        
-        disconnected = []
-        for connection in connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.warning(f"Failed to send message to WebSocket: {e}")
-                disconnected.append(connection)
-        
+            if websocket in self._connection_topics:
+                self._subscribe_locked(websocket, topics)
+
+    async def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        async with self._lock:
+            if websocket in self._connection_topics:
+                self._unsubscribe_locked(websocket, topics)
+
+    async def _send_one(self, connection: WebSocket, message: str) -> bool:
+        try:
+            await asyncio.wait_for(connection.send_text(message), timeout=WS_SEND_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to send message to WebSocket: {e!r}")
+            return False
+
+    async def _send_pairs(self, targets: List[Tuple[WebSocket, str]]) -> int:
+        """Send concurrently; a slow or dead socket only costs its own timeout"""
+        if not targets:
+            return 0
+        results = await asyncio.gather(*(self._send_one(conn, message) for conn, message in targets))
+
         # Clean up disconnected clients
-        for conn in disconnected:
-            await self.disconnect(conn)
+        for (conn, _), ok in zip(targets, results):
+            if not ok:
+                await self.disconnect(conn)
+        return sum(results)
+
+    async def _send_many(self, connections: Iterable[WebSocket], message: str) -> int:
+        return await self._send_pairs([(conn, message) for conn in connections])
+
+    async def _broadcast_local(self, message: str) -> int:
+        async with self._lock:
+            connections = self.active_connections[:]
+        return await self._send_many(connections, message)
+
+    async def _send_to_user_local(self, user_id, message: str) -> int:
+        async with self._lock:
+            connections = list(self._user_connections.get(str(user_id), ()))
+        return await self._send_many(connections, message)
+
+    async def _send_to_users_local(self, messages: Dict[str, str]) -> int:
+        async with self._lock:
+            targets = [
+                (conn, message)
+                for user_id, message in messages.items()
+                for conn in self._user_connections.get(str(user_id), ())
+            ]
+        return await self._send_pairs(targets)
+
+    async def _publish_local(self, topic: str, message: str) -> int:
+        async with self._lock:
+            connections = list(self._topic_connections.get(topic, ()))
+        return await self._send_many(connections, message)
+
+    # The public senders deliver to this worker's sockets and relay to the
+    # others; they return the number of local sockets reached
+
+    async def broadcast(self, message: str):
+        """Send message to all connected clients"""
+        await self._relay("broadcast", message)
+        return await self._broadcast_local(message)
+
+    async def send_to_user(self, user_id, message: str):
+        """Send message to every open connection of one user"""
+        await self._relay("user", message, str(user_id))
+        return await self._send_to_user_local(user_id, message)
+
+    async def send_to_users(self, messages: Dict[str, str]):
+        """Send a per-user message to many users at once ({user_id: message})"""
+        messages = {str(user_id): message for user_id, message in messages.items()}
+        items = list(messages.items())
+        for i in range(0, len(items), RELAY_BATCH_SIZE):
+            await self._relay("users", dict(items[i:i + RELAY_BATCH_SIZE]))
+        return await self._send_to_users_local(messages)
+
+    async def publish(self, topic: str, message: str):
+        """Send message to connections subscribed to `topic`"""
+        await self._relay("topic", message, topic)
+        return await self._publish_local(topic, message)
 
     @property
     def connection_count(self) -> int:
         """Get current number of active connections"""
         return len(self.active_connections)
 
+    @property
+    def user_count(self) -> int:
+        """Number of distinct users with at least one open connection"""
+        return len(self._user_connections)
+
+class EventCoalescer:
+    """
+    Debounces change events for one entity type.
+    Ids reported within `window` seconds are published on `topic` as a single
+    {"type": "<entity>_changed", "data": {"created": [...], "updated": [...], "deleted": [...]}}
+    message, so clients refetch just those rows once per burst.
+    """
+
+    CHANGES = ("created", "updated", "deleted")
+
+    def __init__(self, manager: "ConnectionManager", topic: str, entity: str, window: float = WS_COALESCE_WINDOW):
+        self.manager = manager
+        self.topic = topic
+        self.entity = entity
+        self.window = window
+        self._pending: Dict[str, Set[str]] = {change: set() for change in self.CHANGES}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def add(self, change: str, entity_id):
+        if change not in self._pending:
+            raise ValueError(f"Unknown change type: {change}")
+        key = str(entity_id)
+        if change == "deleted":
+            self._pending["created"].discard(key)
+            self._pending["updated"].discard(key)
+        elif change == "updated" and key in self._pending["created"]:
+            # Still new to clients that haven't seen it yet
+            return
+        self._pending[change].add(key)
+
+        if self.window <= 0:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def flush(self):
+        """Publish whatever has been collected so far"""
+        pending, self._pending = self._pending, {change: set() for change in self.CHANGES}
+        if not any(pending.values()):
+            return
+        try:
+            await self.manager.publish(self.topic, json.dumps({
+                "type": f"{self.entity}_changed",
+                "data": {change: sorted(ids) for change, ids in pending.items()}
+            }))
+        except Exception as e:
+            logger.warning(f"Failed to publish {self.entity} changes: {e}")
+
 # Create a single instance to use everywhere
 manager = ConnectionManager()
+contract_events = EventCoalescer(manager, "contracts", "contracts")